@@ -1,105 +1,91 @@
+import logging
 import streamlit as st
-import matplotlib.pyplot as plt 
 import pandas as pd
-import nfl_data_py as nfl
-import plotly.express as px
 from src.features.nfl_data import (
-    get_combined_data,
-    get_seasonal_data,
-    get_weekly_data,
     get_play_by_play_data,
-    get_weekly_roster_data,
-    get_ngs_data,
-    get_ftn_data,
-    filter_qbs_early_career,
-    calculate_roi,
-    get_wr_data  # Added here
+    get_wr_data
 )
 from src.features.contracts import (
     get_current_contracts,
     get_salary_cap_data,
     get_selected_players_contract_history
 )
-from src.features.acquisition_value import analyze_acquisition_value
-from src.analysis.wr_projection import evaluate_wr_projections
-from src.analysis.player_quality import assess_player_quality
+from src.features.shared_frames import SharedDatasets
+from src.features.trajectories import get_trajectories
 from src.analysis.offensive_tendencies import analyze_3x1_bunch_formation
 from src.analysis.fourth_down_analysis import analyze_fourth_down_decisions
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import Lasso
-from sklearn.ensemble import RandomForestRegressor
-from xgboost import XGBRegressor
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler
-import seaborn as sns
-
-# Import custom functions
-from src.features.nfl_data import get_wr_data
-from src.analysis.wr_projection import evaluate_wr_projections
-from src.analysis.player_quality import assess_player_quality
-
-def calculate_advanced_metrics(df):
-    df['receiving_yards_per_game'] = df['receiving_yards'] / df['games']
-    df['receptions_per_game'] = df['receptions'] / df['games']
-    df['touchdowns_per_game'] = df['receiving_tds'] / df['games']
-    df['targets_per_game'] = df['targets'] / df['games']
-    return df
-
-def prepare_for_regression(df):
-    features = [
-        'receiving_yards_per_game', 'receptions_per_game', 'touchdowns_per_game', 
-        'targets_per_game', 'age', 'weight', 'height', 'availability'
-    ]
-    target = 'apy'
-    
-    df_clean = df.dropna(subset=features + [target])
-    
-    X = df_clean[features]
-    y = df_clean[target]
-
-    # Normalize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled = pd.DataFrame(X_scaled, columns=X.columns)
-
-    return train_test_split(X_scaled, y, test_size=0.2, random_state=42), scaler, features
-
-def run_regression_models(X_train, X_test, y_train, y_test):
-    models = {
-        'Lasso': Lasso(alpha=0.1, random_state=42),
-        'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-        'XGBoost': XGBRegressor(n_estimators=100, random_state=42)
-    }
-    
-    results = {}
-    
-    for name, model in models.items():
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        mse = mean_squared_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        results[name] = {'model': model, 'MSE': mse, 'R2': r2}
-    
-    return results
+from src.analysis.drive_simulator import DriveModel, simulate_decisions
+from src.models.apy_model import (
+    calculate_advanced_metrics,
+    fit_best_model,
+    evaluate_player
+)
+from src.models.apy_comps import ApyComps
+from src.models.attributions import AttributionCache
+from src.utils import profiling
 
-def evaluate_player(player_name, player_data, best_model, scaler, selected_features):
-    player = player_data[player_data['name'] == player_name].iloc[-1]  # Get the most recent season data
-    
-    player_features = player[selected_features].values.reshape(1, -1)
-    player_features_scaled = scaler.transform(player_features)
-    predicted_apy = best_model.predict(player_features_scaled)[0]
-    
-    actual_apy = player['apy']
-    
-    return {
-        'player': player_name,
-        'actual_apy': actual_apy,
-        'predicted_apy': predicted_apy,
-        'difference': predicted_apy - actual_apy,
-        'features': {feature: player[feature] for feature in selected_features}
-    }
+logger = logging.getLogger(__name__)
+
+# matplotlib, plotly, sklearn and xgboost are imported on first use so the
+# app starts without paying for libraries the selected page never touches.
+
+# Datasets published with `python -m src.features.shared_frames` are mapped
+# from shared memory, so app processes behind a proxy share one copy and pick
+# up a republished version on their next rerun. Without them each process
+# loads its own.
+SHARED = SharedDatasets()
+
+def shared_version(name):
+    return SHARED.version(name) if name in SHARED else None
+
+def load_apy_model(years=range(2013, 2024)):
+    if 'wr_data' in SHARED and 'apy_model' in SHARED:
+        return (SHARED.get('wr_data'), *SHARED.get('apy_model'))
+    return train_apy_model(years)
+
+# Loaded and trained once per server process instead of on every rerun
+@st.cache_resource(show_spinner="Loading WR data and training APY models...")
+def train_apy_model(years=range(2013, 2024)):
+    wr_data = get_wr_data(years)
+    wr_data = calculate_advanced_metrics(wr_data)
+    best_model, scaler, selected_features = fit_best_model(wr_data)
+    return wr_data, best_model, scaler, selected_features
+
+# Neighbour index over every historical WR season, built once per process
+# (and per shared model version)
+@st.cache_resource(show_spinner="Indexing contract comparables...")
+def load_apy_comps(years=range(2013, 2024), version=None):
+    wr_data, _, scaler, selected_features = load_apy_model(years)
+    return ApyComps(wr_data, scaler, selected_features)
+
+# Per-feature contributions for every player, stored per model version
+@st.cache_resource(show_spinner="Computing APY explanations...")
+def load_attributions(years=range(2013, 2024), version=None):
+    wr_data, best_model, scaler, selected_features = load_apy_model(years)
+    return AttributionCache.build(best_model, scaler, wr_data, selected_features)
+
+# Rolling rates, year-over-year changes and age-curve adjustments per
+# player-season; built per season and cached on disk
+@st.cache_resource(show_spinner="Building player trajectories...")
+def load_trajectories(years=range(2013, 2024)):
+    return get_trajectories(years)
+
+def load_pbp_data(path='data/raw/pbp_data.csv'):
+    return SHARED.get('pbp') if 'pbp' in SHARED else pd.read_csv(path)
+
+# Play outcome distributions for the 4th-down simulator
+@st.cache_resource(show_spinner="Fitting the drive simulator...")
+def load_drive_model(version=None):
+    return DriveModel.fit(load_pbp_data())
+
+def show_attributions(player):
+    attributions = load_attributions(version=shared_version('apy_model'))
+    if player in attributions:
+        st.write("Contribution of each feature to the predicted APY ($M):")
+        st.bar_chart(attributions.explain(player))
 
 def plot_player_comparison(players_data, feature):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 6))
     names = [player['player'] for player in players_data]
     values = [player['features'][feature] for player in players_data]
@@ -113,11 +99,13 @@ def plot_player_comparison(players_data, feature):
 
 # Function to create a plotly line chart
 def create_line_chart(data, x, y, title):
+    import plotly.express as px
     fig = px.line(data, x=x, y=y, title=title)
     return fig
 
 # Function to create a plotly scatter plot
 def create_scatter_plot(data, x, y, title):
+    import plotly.express as px
     fig = px.scatter(data, x=x, y=y, title=title)
     return fig
 
@@ -125,7 +113,7 @@ def create_scatter_plot(data, x, y, title):
 def display_dataframe(df, title):
     st.subheader(title)
     st.write(df.head())
-    print(df.head())  # Debugging line
+    logger.debug("%s:\n%s", title, df.head())
 
 # Main app
 def main():
@@ -139,16 +127,7 @@ def main():
         "Contracts Data"])
     
     # Load data
-    years = range(2013, 2024)
-    wr_data = get_wr_data(years)
-    wr_data = calculate_advanced_metrics(wr_data)
-    (X_train, X_test, y_train, y_test), scaler, selected_features = prepare_for_regression(wr_data)
-    regression_results = run_regression_models(X_train, X_test, y_train, y_test)
-
-    # Determine best model
-    best_model_name = max(regression_results, key=lambda x: regression_results[x]['R2'])
-    best_model = regression_results[best_model_name]['model']
-
+    wr_data, best_model, scaler, selected_features = load_apy_model()
 
     if page == "Question 1: Player Acquisition Value":
         st.header("Player Acquisition Value Analysis")
@@ -249,6 +228,7 @@ Comparative Analysis:
             st.write(f"  Actual APY: ${evaluation['actual_apy']:,.2f}M")
             st.write(f"  Predicted APY: ${evaluation['predicted_apy']:,.2f}M")
             st.write(f"  Difference: ${evaluation['difference']:,.2f}M")
+            show_attributions(player)
         
         st.write("Comparison Plots:")
         for feature in selected_features:
@@ -267,10 +247,23 @@ Comparative Analysis:
             st.write(f"  Actual APY: ${evaluation['actual_apy']:,.2f}M")
             st.write(f"  Predicted APY: ${evaluation['predicted_apy']:,.2f}M")
             st.write(f"  Difference: ${evaluation['difference']:,.2f}M")
+            show_attributions(player_name)
 
             st.write("\nPlayer Stats and Percentiles:")
             for feature in selected_features:
                 st.write(f"{feature}: {evaluation['features'][feature]:.2f}")
+
+            latest = wr_data[wr_data['name'] == player_name].iloc[[-1]]
+            trajectory = load_trajectories()
+            trajectory = trajectory[trajectory['player_id'] == latest['player_id'].iloc[0]]
+            if not trajectory.empty:
+                st.write("Receiving yards per game by season (3-year rate, change, age-adjusted projection):")
+                st.dataframe(trajectory[['season', 'age', 'receiving_yards_per_game', 'receiving_yards_per_game_3y',
+                                         'receiving_yards_per_game_yoy', 'receiving_yards_per_game_age_adjusted']])
+            comps = load_apy_comps(version=shared_version('apy_model')).query(latest, k=5, age_window=2)
+            if not comps.empty:
+                st.write(f"Contract comps (median APY ${comps['comp_apy'].median():,.2f}M):")
+                st.dataframe(comps[['rank', 'comp_name', 'comp_season', 'comp_age', 'comp_team', 'comp_apy', 'distance']])
         st.write("""
                  Question: Choose any active player in the NFL. How do you assess the quality of this player relative to their position group, and why? How would you value this player in terms of dollars, and how does this compare to their current contract?
                  
@@ -331,7 +324,12 @@ Comparative Analysis:
         years = st.sidebar.multiselect("Select years", range(1999, 2024))
         #teams = st.sidebar.selectbox("Select player", wr_data['team'].unique())
         if years:
-            play_data = nfl.import_pbp_data(years)
+            import matplotlib.pyplot as plt
+            if 'pbp' in SHARED:
+                pbp = SHARED.get('pbp')
+                play_data = pbp[pbp['season'].isin(years)]
+            else:
+                play_data = pd.concat([get_play_by_play_data(year) for year in years], ignore_index=True)
             #play_data = play_data[play_data['posteam'].isin([teams])]  # Filter by selected teams
             
             tendencies, down_tendencies, situational_tendencies = analyze_3x1_bunch_formation(play_data)
@@ -466,7 +464,7 @@ Comparative Analysis:
         years = st.sidebar.slider("Select years", 2014, 2024, (2014, 2024))
         
         try:
-            pbp_data = pd.read_csv('data/raw/pbp_data.csv')
+            pbp_data = load_pbp_data()
             decisions, success_rates = analyze_fourth_down_decisions(pbp_data)
             
             st.write("Success Rates Data:", success_rates)
@@ -482,6 +480,18 @@ Comparative Analysis:
             
             success_rate_chart = create_line_chart(success_rates, x='Season', y=success_rates.columns[1:], title='4th Down Success Rates Over Seasons')
             st.plotly_chart(success_rate_chart)
+
+            st.subheader("Simulate a 4th down")
+            col1, col2 = st.columns(2)
+            with col1:
+                score_differential = st.number_input("Score differential", -28, 28, 0)
+                minutes_remaining = st.slider("Minutes remaining", 0.0, 60.0, 10.0, 0.5)
+            with col2:
+                yardline = st.slider("Yards from the end zone", 1, 99, 40)
+                ydstogo = st.slider("Yards to go", 1, 20, 2)
+            situation = {'score_differential': score_differential, 'yardline_100': yardline,
+                         'ydstogo': ydstogo, 'game_seconds_remaining': minutes_remaining * 60}
+            st.dataframe(simulate_decisions(load_drive_model(shared_version('pbp')), situation))
             
         except Exception as e:
             st.error(f"Error loading data: {e}")
@@ -599,6 +609,10 @@ Comparative Analysis:
             else:
                 st.write("Failed to retrieve salary cap data")
 
+    if profiling.is_enabled():
+        with st.sidebar.expander("Stage timings"):
+            st.text(profiling.summary_table())
+
 
 if __name__ == "__main__":
     main()
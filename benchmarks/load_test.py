@@ -0,0 +1,154 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from src.testing import builders
+
+# Load test for the JSON service (src/service/server.py).
+#
+# Without --url it starts the service in-process on fixture data, so it runs
+# offline like the benchmark suite. Each distinct request is first sent
+# once (cold: computed), then --requests requests are drawn from the same
+# set and sent from --concurrency threads over keep-alive connections
+# (cached: served from the response LRU). Latency percentiles are printed
+# per phase and per endpoint.
+#
+#   python -m benchmarks.load_test
+#   python -m benchmarks.load_test --url http://127.0.0.1:8765 --requests 20000 --concurrency 16
+
+
+def _fixture_service(workers):
+    from src.analysis.drive_simulator import DriveModel
+    from src.features.dtypes import optimize_dtypes
+    from src.features.nfl_data import get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics, fit_best_model
+    from src.service.server import AnalyticsService
+
+    pbp = optimize_dtypes(builders.make_pbp(3, first_season=2021), 'pbp')
+    ids = builders.make_player_ids(1000)
+    years = range(2013, 2024)
+    sources = builders.nfl_sources(seasonal=builders.make_seasonal(ids, years), ids=ids,
+                                   contracts=builders.make_contracts(ids, 4000, years))
+    with sources:
+        wr_data = calculate_advanced_metrics(get_wr_data(years, cache=False))
+    service = AnalyticsService(pbp, wr_data, fit_best_model(wr_data), DriveModel.fit(pbp), workers=workers)
+    return service, sorted(wr_data.dropna(subset=['apy'])['name'].unique())
+
+
+def request_paths(players, simulations=4, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = ['/health']
+    for personnel in builders.PERSONNEL:
+        paths.append('/tendencies?' + urlencode({'personnel': personnel}))
+        for season in (2021, 2022, 2023):
+            paths.append('/tendencies?' + urlencode({'personnel': personnel, 'season': season}))
+    for team in builders.TEAMS:
+        paths.append('/tendencies?' + urlencode({'team': team}))
+    for first in (2021, 2022, 2023):
+        paths.append('/fourth-down?' + urlencode({'first_season': first}))
+    for name in rng.choice(players, min(100, len(players)), replace=False):
+        paths.append('/player-quality?' + urlencode({'name': name}))
+        paths.append('/apy?' + urlencode({'name': name}))
+    for _ in range(simulations):
+        paths.append('/fourth-down/simulate?' + urlencode({
+            'score_differential': int(rng.integers(-10, 11)), 'yardline_100': int(rng.integers(20, 70)),
+            'ydstogo': int(rng.integers(1, 6)), 'game_seconds_remaining': int(rng.integers(60, 1800)),
+        }))
+    return paths
+
+
+def _send(paths, host, port):
+    # (path, status, seconds) for each path, over one keep-alive connection
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        results.append((path, response.status, time.perf_counter() - start))
+    connection.close()
+    return results
+
+
+def _summary(results, wall):
+    seconds = np.array([r[2] for r in results]) * 1000
+    return {
+        'requests': len(results),
+        'errors': sum(r[1] != 200 for r in results),
+        'requests_per_s': len(results) / wall if wall > 0 else None,
+        'p50_ms': float(np.percentile(seconds, 50)),
+        'p90_ms': float(np.percentile(seconds, 90)),
+        'p99_ms': float(np.percentile(seconds, 99)),
+        'max_ms': float(seconds.max()),
+    }
+
+
+def run_load_test(host, port, paths, requests=5000, concurrency=8, seed=0):
+    start = time.perf_counter()
+    cold = _send(paths, host, port)
+    report = {'cold': _summary(cold, time.perf_counter() - start)}
+
+    rng = np.random.default_rng(seed)
+    batches = np.array_split(rng.choice(paths, requests), concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        cached = [r for batch in pool.map(lambda b: _send(list(b), host, port), batches) for r in batch]
+    report['cached'] = _summary(cached, time.perf_counter() - start)
+
+    by_endpoint = {}
+    for result in cold + cached:
+        by_endpoint.setdefault(result[0].split('?')[0], []).append(result)
+    report['endpoints'] = {name: _summary(results, 0) for name, results in sorted(by_endpoint.items())}
+    return report
+
+
+def format_report(report):
+    lines = [f"{'':<24}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+    rows = [('cold', report['cold']), ('cached', report['cached'])] + list(report['endpoints'].items())
+    for name, s in rows:
+        rate = f"{s['requests_per_s']:,.0f}" if s['requests_per_s'] else ''
+        lines.append(f"{name:<24}{s['requests']:>10}{s['errors']:>8}{rate:>10}"
+                     f"{s['p50_ms']:>9.2f}{s['p90_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the JSON service.")
+    parser.add_argument('--url', default=None, help="running service; default: start one on fixture data")
+    parser.add_argument('--players', nargs='+', default=None, help="player names for --url targets")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2, help="simulator processes of the in-process service")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    server = service = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        players = args.players or []
+    else:
+        from src.service.server import make_server
+        service, players = _fixture_service(args.workers)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+    try:
+        report = run_load_test(host, port, request_paths(players), args.requests, args.concurrency)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.close()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,670 @@
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import pickle
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+
+# Benchmark suite for the data-loading and analysis hot paths.
+#
+#   python -m benchmarks.run_benchmarks                  # all cases, default scale
+#   python -m benchmarks.run_benchmarks --scale small    # quick smoke run
+#   python -m benchmarks.run_benchmarks --cases fourth_down bunch_formation
+#
+# Every case runs in a fresh process so peak RSS is per case. Results are
+# written to benchmarks/results/<timestamp>_<commit>.json and compared with
+# the previous results file, so regressions across commits stay visible.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SCALES = {
+    'small': {'pbp_seasons': 1, 'players': 500, 'contract_rows': 2000, 'charts': 3, 'route_points': 200_000},
+    'default': {'pbp_seasons': 3, 'players': 2500, 'contract_rows': 10000, 'charts': 10, 'route_points': 2_000_000},
+    'large': {'pbp_seasons': 10, 'players': 5000, 'contract_rows': 40000, 'charts': 40, 'route_points': 20_000_000},
+}
+
+
+def _setup_wr_data(scale, workdir):
+    ids = builders.make_player_ids(scale['players'])
+    years = range(2013, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    contracts = builders.make_contracts(ids, scale['contract_rows'], years)
+    # left patched for the lifetime of the (single-case) benchmark process;
+    # the context manager is kept in the state so it is not collected early
+    sources = builders.nfl_sources(seasonal=seasonal, ids=ids, contracts=contracts)
+    sources.__enter__()
+    from src.features.nfl_data import get_wr_data
+    return {'func': get_wr_data, 'years': years, 'sources': sources}, len(seasonal)
+
+
+def _run_wr_data(state):
+    state['func'](state['years'], cache=False)
+
+
+def _setup_draft_value(scale, workdir):
+    ids = builders.make_player_ids(scale['players'])
+    years = range(2013, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    sources = builders.nfl_sources(seasonal=seasonal, ids=ids, draft_picks=builders.make_draft_picks(ids),
+                                   contracts=builders.make_contracts(ids, scale['contract_rows'], years))
+    sources.__enter__()
+    from src.features.acquisition_value import draft_value_curves
+    return {'func': draft_value_curves, 'years': years, 'workdir': workdir, 'sources': sources}, len(seasonal)
+
+
+def _run_draft_value(state):
+    state['func'](state['years'], by=['position', 'pick'], refresh=True, cache_dir=state['workdir'])
+
+
+def _setup_trajectories(scale, workdir):
+    ids = builders.make_player_ids(scale['players'])
+    years = range(2005, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    sources = builders.nfl_sources(seasonal=seasonal, ids=ids)
+    sources.__enter__()
+    from src.features.trajectories import get_trajectories
+    # the full history is cached once; the case times appending the last season
+    get_trajectories(range(2013, 2023), cache_dir=workdir)
+    return {'func': get_trajectories, 'workdir': workdir, 'sources': sources}, len(seasonal)
+
+
+def _run_trajectories(state):
+    path = os.path.join(state['workdir'], 'trajectories', '2023.parquet')
+    if os.path.exists(path):
+        os.remove(path)
+    state['func'](range(2013, 2024), cache_dir=state['workdir'])
+
+
+def _setup_qb_roi_panel(scale, workdir):
+    from src.features import cache
+    ids = builders.make_player_ids(scale['players'])
+    years = range(2000, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    sources = builders.nfl_sources(seasonal=seasonal, ids=ids,
+                                   contracts=builders.make_contracts(ids, scale['contract_rows'], years))
+    sources.__enter__()
+    cache.CACHE_DIR = workdir
+    from src.features.nfl_data import build_qb_roi_panel
+    # first build fills the per-season cache; the case times the warm rebuild
+    build_qb_roi_panel(years)
+    return {'func': build_qb_roi_panel, 'years': years, 'sources': sources}, len(seasonal)
+
+
+def _run_qb_roi_panel(state):
+    state['func'](state['years'])
+
+
+def _setup_player_weeks(scale, workdir):
+    from src.features import cache
+    ids = builders.make_player_ids(scale['players'])
+    years = range(2014, 2024)
+    weekly = builders.make_weekly(ids, years)
+    ngs = {stat_type: builders.make_ngs(ids, years, stat_type) for stat_type in builders.NGS_COLUMNS}
+    sources = builders.nfl_sources(weekly=weekly, ngs=ngs, rosters=builders.make_weekly_rosters(ids, years))
+    sources.__enter__()
+    cache.CACHE_DIR = os.path.join(workdir, 'cache')
+    from src.features.player_weeks import build_player_weeks
+    return {'func': build_player_weeks, 'years': years, 'out': os.path.join(workdir, 'player_weeks'),
+            'sources': sources}, len(weekly)
+
+
+def _run_player_weeks(state):
+    state['func'](state['years'], state['out'])
+
+
+def _setup_ftn_tendencies(scale, workdir):
+    from src.analysis.offensive_tendencies import formation_tendencies
+    from src.features.dtypes import optimize_dtypes
+    from src.features.ftn_index import join_ftn
+    # FTN charting starts in 2022; five seasons regardless of scale
+    pbp = optimize_dtypes(builders.make_pbp(max(scale['pbp_seasons'], 5), first_season=2022), 'pbp')
+    sources = builders.nfl_sources(ftn=builders.make_ftn(pbp))
+    sources.__enter__()
+    # the first join builds and saves the per-season indexes; the case times
+    # joining from the saved indexes plus a few formation queries
+    join_ftn(pbp, index_dir=workdir)
+    return {'join': join_ftn, 'query': formation_tendencies, 'pbp': pbp, 'workdir': workdir,
+            'sources': sources}, len(pbp)
+
+
+def _run_ftn_tendencies(state):
+    plays = state['join'](state['pbp'], index_dir=state['workdir'])
+    for filters in ({'qb_location': 'S', 'is_motion': True}, {'n_offense_backfield': 0},
+                    {'offense_personnel': '1 RB, 1 TE, 3 WR', 'is_play_action': True, 'starting_hash': ['L', 'R']}):
+        state['query'](plays, **filters)
+
+
+def _setup_situational_queries(scale, workdir):
+    from src.analysis.situational_query import SituationalQuery
+    from src.features.dtypes import optimize_dtypes
+    pbp = optimize_dtypes(builders.make_pbp(scale['pbp_seasons']), 'pbp')
+    return {'engine': SituationalQuery, 'pbp': pbp}, len(pbp)
+
+
+def _run_situational_queries(state):
+    # a fresh engine per run: the shared predicates are built once and reused
+    # by the later queries, the repeated queries are result-cache hits
+    engine = state['engine'](state['pbp'])
+    for _ in range(2):
+        for down in (1, 2, 3, 4):
+            for situations in ([], ['red_zone'], ['red_zone', 'one_score'], ['two_minute']):
+                engine.query({'down': down, 'ydstogo': ('>=', 7)}, situations=situations, by='posteam',
+                             metrics=['plays', 'success_rate', 'epa', 'pass_rate'])
+                engine.query({'ydstogo': ('>=', 7), 'down': down}, situations=situations, by=['posteam', 'season'],
+                             metrics=['plays', 'epa'])
+
+
+def _setup_drive_simulator(scale, workdir):
+    from src.analysis.drive_simulator import DriveModel, simulate_decisions
+    from src.features.dtypes import optimize_dtypes
+    model = DriveModel.fit(optimize_dtypes(builders.make_pbp(scale['pbp_seasons']), 'pbp'))
+    # an early 4th quarter situation: most of a quarter left to play out
+    situation = {'score_differential': -3, 'yardline_100': 42, 'ydstogo': 2, 'game_seconds_remaining': 840}
+    return {'func': simulate_decisions, 'model': model, 'situation': situation, 'games': 20000}, 20000 * 3
+
+
+def _run_drive_simulator(state):
+    state['func'](state['model'], state['situation'], n=state['games'])
+
+
+def _touch_frame(frame):
+    # read every column so its pages are mapped or loaded
+    for column in frame.columns:
+        values = frame[column]
+        values = values.cat.codes if isinstance(values.dtype, pd.CategoricalDtype) else values
+        values.isna().sum()
+
+
+def _shared_worker(mode, path, queue):
+    from src.features.shared_frames import attach
+    before = _read_status_kb('RssAnon') or 0
+    frame = pd.read_parquet(path) if mode == 'parquet' else attach('pbp', path)[0]
+    _touch_frame(frame)
+    queue.put((_read_status_kb('RssAnon') or 0) - before)
+
+
+def _worker_private_mb(mode, path, workers=4):
+    # private (anonymous) memory each worker adds when holding the frame
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_shared_worker, args=(mode, path, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    added = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return statistics.mean(added) / 1024
+
+
+def _setup_shared_frames(scale, workdir):
+    from src.features.dtypes import optimize_dtypes
+    from src.features.shared_frames import attach, publish_frame
+    pbp = optimize_dtypes(builders.make_pbp(scale['pbp_seasons']), 'pbp')
+    parquet_path = os.path.join(workdir, 'pbp.parquet')
+    pbp.to_parquet(parquet_path, index=False)
+    root = os.path.join(workdir, 'shared')
+    publish_frame('pbp', pbp, root)
+    report = {
+        'frame_mb': pbp.memory_usage(deep=True).sum() / 2**20,
+        'worker_private_mb_parquet': _worker_private_mb('parquet', parquet_path),
+        'worker_private_mb_shared': _worker_private_mb('shared', root),
+    }
+    # the case times a worker attaching and scanning every column
+    return {'attach': attach, 'root': root, 'report': report}, len(pbp)
+
+
+def _run_shared_frames(state):
+    _touch_frame(state['attach']('pbp', state['root'])[0])
+
+
+def _setup_fourth_down(scale, workdir):
+    from src.analysis.fourth_down_analysis import analyze_fourth_down_decisions
+    pbp = builders.make_pbp(scale['pbp_seasons'])
+    return {'func': analyze_fourth_down_decisions, 'pbp': pbp}, len(pbp)
+
+
+def _run_fourth_down(state):
+    state['func'](state['pbp'])
+
+
+def _setup_bunch_formation(scale, workdir):
+    from src.analysis.offensive_tendencies import analyze_3x1_bunch_formation
+    pbp = builders.make_pbp(scale['pbp_seasons'])
+    return {'func': analyze_3x1_bunch_formation, 'pbp': pbp}, len(pbp)
+
+
+def _run_bunch_formation(state):
+    state['func'](state['pbp'])
+
+
+def _setup_map_route_locations(scale, workdir):
+    from src.features.next_gen_data import map_route_locations
+    charts = builders.write_chart_images(workdir, scale['charts'])
+    paths = [
+        os.path.join(workdir, 'Cleaned_Route_Charts', c['team'], c['season'], c['week'], 'images',
+                     f"{c['lastName']}_{c['firstName']}_{c['position']}.jpeg")
+        for c in charts
+    ]
+    return {'func': map_route_locations, 'paths': paths}, len(paths)
+
+
+def _run_map_route_locations(state):
+    for path in state['paths']:
+        state['func'](path, 0)
+
+
+def _chart_masks(img):
+    import cv2
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    return [
+        cv2.inRange(img, np.array([230, 230, 230]), np.array([255, 255, 255])),
+        cv2.inRange(hsv, np.array([40, 100, 100]), np.array([80, 255, 255])),
+        cv2.inRange(img, np.array([126, 126, 126]), np.array([132, 132, 132])),
+    ]
+
+
+def _setup_skeletonize(scale, workdir):
+    import cv2
+    from skimage.morphology import skeletonize
+    from src.features.next_gen_data import skeletonize_regions
+    charts = builders.write_chart_images(workdir, scale['charts'])
+    masks = [
+        _chart_masks(cv2.imread(os.path.join(workdir, 'Cleaned_Route_Charts', c['team'], c['season'], c['week'], 'images',
+                                             f"{c['lastName']}_{c['firstName']}_{c['position']}.jpeg")))
+        for c in charts
+    ]
+    # full-image skeletonize of the same masks, for the per-chart speedup
+    start = time.perf_counter()
+    for chart_masks in masks:
+        for mask in chart_masks:
+            skeletonize(mask != 0)
+    full_ms = (time.perf_counter() - start) / len(masks) * 1000
+    return {'func': skeletonize_regions, 'masks': masks, 'report': {'full_image_ms_per_chart': full_ms}}, len(masks)
+
+
+def _run_skeletonize(state):
+    for chart_masks in state['masks']:
+        state['func'](chart_masks)
+
+
+def _legacy_chart_classes(img):
+    # the per-image cv2 passes map_route_locations used before the colour LUT
+    import cv2
+    masks = _chart_masks(img)
+    complete = cv2.bitwise_and(img, img, mask=masks[0]).clip(0, 1)
+    yac = cv2.cvtColor(cv2.bitwise_and(img, img, mask=masks[1]), cv2.COLOR_HSV2BGR).clip(0, 1)
+    incomplete = cv2.bitwise_and(img, img, mask=masks[2]).clip(0, 1)
+    return complete[:, :, 1], yac[:, :, 2], incomplete[:, :, 1]
+
+
+def _setup_classify_pixels(scale, workdir):
+    import cv2
+    from src.features.chart_colors import build_color_lut, classify_pixels
+    charts = builders.write_chart_images(workdir, scale['charts'])
+    images = [
+        cv2.imread(os.path.join(workdir, 'Cleaned_Route_Charts', c['team'], c['season'], c['week'], 'images',
+                                f"{c['lastName']}_{c['firstName']}_{c['position']}.jpeg"))
+        for c in charts
+    ]
+    start = time.perf_counter()
+    build_color_lut()
+    lut_build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for img in images:
+        _legacy_chart_classes(img)
+    legacy_ms = (time.perf_counter() - start) / len(images) * 1000
+    report = {'legacy_ms_per_chart': legacy_ms, 'lut_build_s': lut_build_s}
+    return {'func': classify_pixels, 'images': images, 'report': report}, len(images)
+
+
+def _run_classify_pixels(state):
+    for img in state['images']:
+        state['func'](img)
+
+
+def _setup_process_next_gen(scale, workdir):
+    from src.features.next_gen_data import process_next_gen_data
+    charts = builders.write_chart_images(workdir, scale['charts'])
+    # process_next_gen_data resolves the chart trees relative to the working directory
+    os.chdir(workdir)
+    return {'func': process_next_gen_data, 'charts': charts}, len(charts)
+
+
+def _run_process_next_gen(state):
+    state['func'](state['charts'])
+
+
+def _setup_chart_store(scale, workdir):
+    # a re-scrape of every chart plus re-encoded copies under new game ids;
+    # processing the copies should reuse the stored routes
+    import cv2
+    from src.features.chart_store import ChartStore
+    from src.features.next_gen_data import process_next_gen_data
+    charts = builders.write_chart_images(workdir, scale['charts'])
+    store = ChartStore(os.path.join(workdir, 'chart_store'))
+    tree_bytes = 0
+    copies = []
+    for c in charts:
+        path = os.path.join(workdir, 'Cleaned_Route_Charts', c['team'], c['season'], c['week'], 'images',
+                            f"{c['lastName']}_{c['firstName']}_{c['position']}.jpeg")
+        for _ in range(2):
+            store.put_file(c, path)
+            tree_bytes += os.path.getsize(path)
+        copy = dict(c, gameId=c['gameId'] + 100000)
+        data = cv2.imencode('.jpeg', cv2.imread(path), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        store.put(copy, data)
+        tree_bytes += len(data)
+        copies.append(copy)
+    process_next_gen_data(charts, store=store)
+    report = {'tree_mb': tree_bytes / 2**20, 'store_mb': store.disk_usage() / 2**20}
+    return {'func': process_next_gen_data, 'charts': copies, 'store': store, 'report': report}, len(copies)
+
+
+def _run_chart_store(state):
+    state['func'](state['charts'], store=state['store'])
+
+
+def _setup_dtype_optimize(scale, workdir):
+    from src.features.dtypes import optimize_dtypes, memory_report
+    pbp = builders.make_pbp(scale['pbp_seasons'])
+    report = memory_report(pbp, optimize_dtypes(pbp, 'pbp', report=False))
+    return {'func': optimize_dtypes, 'pbp': pbp, 'report': {'memory_ratio': report['ratio'], 'saved_mb': report['saved_bytes'] / 2**20}}, len(pbp)
+
+
+def _run_dtype_optimize(state):
+    state['func'](state['pbp'], 'pbp', report=False)
+
+
+def _setup_route_store_lookup(scale, workdir):
+    from src.features.route_store import RouteStore, build_route_store
+    points = builders.make_route_points(scale['route_points'])
+    path = build_route_store(points, os.path.join(workdir, 'route_store'))
+    names = points['name'].drop_duplicates().head(100).tolist()
+    del points
+    return {'store': RouteStore(path), 'names': names}, len(names)
+
+
+def _run_route_store_lookup(state):
+    for name in state['names']:
+        state['store'].player(name)
+
+
+def _setup_route_heatmaps(scale, workdir):
+    from src.features.route_heatmaps import build_route_heatmaps
+    points = builders.make_route_points(scale['route_points'])
+    heatmaps = build_route_heatmaps(points)
+    names = points['name'].drop_duplicates().head(100).tolist()
+    del points
+    return {'heatmaps': heatmaps, 'names': names}, len(names)
+
+
+def _run_route_heatmaps(state):
+    # per-receiver season grids plus a team roll-up, all from the binned counts
+    heatmaps = state['heatmaps']
+    for name in state['names']:
+        heatmaps.grid(name=name)
+    heatmaps.rollup('team', route_type='COMPLETE')
+
+
+def _setup_route_similarity(scale, workdir):
+    from src.features.route_heatmaps import build_route_heatmaps
+    from src.features.route_similarity import RouteSimilarityIndex
+    points = builders.make_route_points(scale['route_points'])
+    index = RouteSimilarityIndex.from_heatmaps(build_route_heatmaps(points))
+    keys = index.labels[index.by].head(100).itertuples(index=False, name=None)
+    del points
+    keys = list(keys)
+    return {'index': index, 'keys': keys}, len(keys)
+
+
+def _run_route_similarity(state):
+    for key in state['keys']:
+        state['index'].query(*key, k=10)
+
+
+def _setup_apy_comps(scale, workdir):
+    from sklearn.preprocessing import StandardScaler
+    from src.models.apy_comps import ApyComps
+    from src.models.apy_model import FEATURES, calculate_advanced_metrics
+    state, _ = _setup_wr_data(scale, workdir)
+    wr_data = calculate_advanced_metrics(state['func'](state['years'], cache=False))
+    clean = wr_data.dropna(subset=FEATURES + ['apy'])
+    engine = ApyComps(clean, StandardScaler().fit(clean[FEATURES]))
+    # comps for every receiver in the latest season, as the nightly run does
+    players = clean[clean['season'] == clean['season'].max()]
+    return {'engine': engine, 'players': players, 'report': {'index_rows': len(engine)}}, len(players)
+
+
+def _run_apy_comps(state):
+    state['engine'].query(state['players'], k=10, age_window=2)
+
+
+def _setup_online_apy(scale, workdir):
+    from src.models.apy_model import calculate_advanced_metrics, fit_best_model
+    from src.models.online_apy import OnlineApyModel, season_players
+    state, _ = _setup_wr_data(scale, workdir)
+    wr_data = calculate_advanced_metrics(state['func'](state['years'], cache=False))
+    start = time.perf_counter()
+    fit_best_model(wr_data)
+    retrain = time.perf_counter() - start
+    model = OnlineApyModel.fit(wr_data, 'xgboost').start_season(2024, season_players(2024))
+    weekly = builders.make_weekly(builders.make_player_ids(scale['players']), [2024])
+    model.update(weekly[weekly['week'] < 18])
+    # each run ingests week 18 into a copy of the week-17 state
+    return {'blob': pickle.dumps(model), 'weekly': weekly, 'sources': state['sources'],
+            'report': {'full_retrain_s': retrain}}, int((weekly['week'] == 18).sum())
+
+
+def _run_online_apy(state):
+    model = pickle.loads(state['blob'])
+    model.update(state['weekly'])
+    model.predictions()
+
+
+def _setup_play_call(scale, workdir):
+    from src.features import cache
+    from src.models.play_call import season_partition, train_play_call_model
+    seasons = list(range(2013, 2013 + max(scale['pbp_seasons'], 2)))
+    cache.CACHE_DIR = workdir
+    # partitions are built (and the PBP dropped) one season at a time, so
+    # the training run never sees more than one season's frame
+    for season in seasons:
+        with builders.nfl_sources(pbp=builders.make_pbp(1, first_season=season, seed=season)):
+            season_partition(season)
+    rows = sum(len(season_partition(season)) for season in seasons)
+    return {'func': train_play_call_model, 'seasons': seasons, 'workdir': workdir}, rows
+
+
+def _run_play_call(state):
+    state['func'](state['seasons'][:-1], state['seasons'][-1:], rounds=50, workdir=state['workdir'])
+
+
+# name -> (setup, run, unit); setup returns (state, number of input rows/items)
+CASES = {
+    'wr_data_merges': (_setup_wr_data, _run_wr_data, 'seasonal rows'),
+    'draft_value_curves': (_setup_draft_value, _run_draft_value, 'seasonal rows'),
+    'qb_roi_panel': (_setup_qb_roi_panel, _run_qb_roi_panel, 'seasonal rows'),
+    'trajectories_append': (_setup_trajectories, _run_trajectories, 'seasonal rows'),
+    'player_weeks': (_setup_player_weeks, _run_player_weeks, 'player-weeks'),
+    'ftn_tendencies': (_setup_ftn_tendencies, _run_ftn_tendencies, 'plays'),
+    'situational_queries': (_setup_situational_queries, _run_situational_queries, 'plays'),
+    'drive_simulator': (_setup_drive_simulator, _run_drive_simulator, 'games'),
+    'shared_frames': (_setup_shared_frames, _run_shared_frames, 'plays'),
+    'fourth_down': (_setup_fourth_down, _run_fourth_down, 'plays'),
+    'bunch_formation': (_setup_bunch_formation, _run_bunch_formation, 'plays'),
+    'map_route_locations': (_setup_map_route_locations, _run_map_route_locations, 'charts'),
+    'classify_chart_pixels': (_setup_classify_pixels, _run_classify_pixels, 'charts'),
+    'skeletonize_charts': (_setup_skeletonize, _run_skeletonize, 'charts'),
+    'process_next_gen_data': (_setup_process_next_gen, _run_process_next_gen, 'charts'),
+    'chart_store_reprocess': (_setup_chart_store, _run_chart_store, 'charts'),
+    'dtype_optimize_pbp': (_setup_dtype_optimize, _run_dtype_optimize, 'plays'),
+    'route_store_lookup': (_setup_route_store_lookup, _run_route_store_lookup, 'player lookups'),
+    'route_heatmaps': (_setup_route_heatmaps, _run_route_heatmaps, 'player grids'),
+    'route_similarity_topk': (_setup_route_similarity, _run_route_similarity, 'queries'),
+    'apy_comps_nightly': (_setup_apy_comps, _run_apy_comps, 'players'),
+    'online_apy_week': (_setup_online_apy, _run_online_apy, 'weekly rows'),
+    'play_call_training': (_setup_play_call, _run_play_call, 'plays'),
+}
+
+
+def _read_status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    # Linux >= 4.0 resets VmHWM when "5" is written to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb():
+    peak = _read_status_kb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak //= 1024
+    return peak
+
+
+def _run_case(name, scale, repeats, queue):
+    setup, run, unit = CASES[name]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            # keep the loaders' parquet cache out of the repository
+            os.environ['NFL_QUANT_CACHE_DIR'] = os.path.join(workdir, 'cache')
+            state, rows = setup(scale, workdir)
+            # warm-up run so one-off import and cache costs are not timed
+            run(state)
+            _reset_peak_rss()
+            baseline_kb = _read_status_kb('VmRSS') or 0
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                run(state)
+                timings.append(time.perf_counter() - start)
+            peak_kb = _peak_rss_kb()
+        best = min(timings)
+        result = {
+            'case': name,
+            'unit': unit,
+            'rows': rows,
+            'repeats': repeats,
+            'wall_s_best': best,
+            'wall_s_median': statistics.median(timings),
+            'rows_per_s': rows / best if best > 0 else None,
+            'peak_rss_mb': peak_kb / 1024,
+            'rss_increase_mb': max(0, peak_kb - baseline_kb) / 1024,
+        }
+        # case-specific figures, e.g. the memory ratio of the dtype optimizer
+        result.update(state.get('report', {}))
+        queue.put(result)
+    except Exception as e:
+        queue.put({'case': name, 'error': f"{type(e).__name__}: {e}"})
+
+
+def run_benchmarks(case_names, scale_name='default', repeats=3):
+    scale = SCALES[scale_name]
+    ctx = mp.get_context('spawn')
+    results = []
+    for name in case_names:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_case, args=(name, scale, repeats, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        results.append(result)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results, scale_name, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    commit = _git_commit()
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    payload = {
+        'commit': commit,
+        'timestamp': stamp,
+        'scale': scale_name,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    path = os.path.join(results_dir, f"{stamp}_{commit}.json")
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def load_previous_results(results_dir=RESULTS_DIR, exclude=None, scale_name=None):
+    for path in sorted(glob.glob(os.path.join(results_dir, '*.json')), reverse=True):
+        if exclude and os.path.abspath(path) == os.path.abspath(exclude):
+            continue
+        with open(path) as f:
+            payload = json.load(f)
+        if scale_name is None or payload.get('scale') == scale_name:
+            return payload
+    return None
+
+
+def format_results(results, previous=None):
+    prev = {r['case']: r for r in (previous or {}).get('results', []) if 'error' not in r}
+    lines = [f"{'case':<24}{'wall best (s)':>14}{'rows/s':>14}{'peak RSS (MB)':>15}{'vs prev':>10}"]
+    for r in results:
+        if 'error' in r:
+            lines.append(f"{r['case']:<24}  ERROR {r['error']}")
+            continue
+        change = ''
+        if r['case'] in prev and prev[r['case']]['wall_s_best'] > 0:
+            change = f"{r['wall_s_best'] / prev[r['case']]['wall_s_best']:.2f}x"
+        lines.append(f"{r['case']:<24}{r['wall_s_best']:>14.4f}{r['rows_per_s']:>14,.0f}{r['peak_rss_mb']:>15.1f}{change:>10}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data-loading and analysis hot paths.")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--scale', choices=sorted(SCALES), default='default')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--no-save', action='store_true', help="print results without writing a JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cases, args.scale, args.repeats)
+    path = None if args.no_save else save_results(results, args.scale, args.results_dir)
+    previous = load_previous_results(args.results_dir, exclude=path, scale_name=args.scale)
+    print(format_results(results, previous))
+    if path:
+        print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
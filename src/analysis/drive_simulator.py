@@ -0,0 +1,279 @@
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Monte Carlo 4th-down decisions: go, punt or kick from a game state, each
+# played out to the end of the game many times.
+#
+# Play outcomes come from PBP (DriveModel.fit): scrimmage yards are sampled
+# from the empirical distribution for the down and distance bucket,
+# turnovers, field goal make probability by distance and punt net yards are
+# fitted from the play rows when nflverse's columns are present, otherwise
+# they use league-typical defaults. Every simulated game is one slot in a
+# set of NumPy arrays (margin, possession, down, distance, yardline,
+# clock), and each loop iteration plays one snap for all of them at once.
+# After the forced first play, both teams follow a simple 4th-down policy.
+# There are no timeouts, halves or overtime; a tie counts as half a win.
+#
+# Games are split into fixed-size shards, each with its own RNG stream
+# spawned from the seed, so results depend only on (seed, n) and not on how
+# many workers ran them. With workers > 1 the shards of all decisions run
+# in one process pool. All decisions share the same streams (common
+# random numbers), which makes the differences between them less noisy.
+#
+#   model = DriveModel.fit(pbp)
+#   simulate_decisions(model, {'score_differential': -3, 'yardline_100': 38,
+#                              'ydstogo': 2, 'game_seconds_remaining': 420})
+
+DECISIONS = ['go', 'punt', 'field_goal']
+GO, PUNT, FIELD_GOAL = range(3)
+# ydstogo buckets (0, 2], (2, 5], (5, 10], (10, 99], per down
+DISTANCE_EDGES = [2, 5, 10]
+N_BUCKETS = 4 * (len(DISTANCE_EDGES) + 1)
+MIN_SAMPLES = 200
+DEFAULT_TURNOVER_RATE = 0.025
+# logit(make) = a + b * kick distance
+DEFAULT_FG_COEF = (5.9, -0.105)
+DEFAULT_PUNT_NET = (41.0, 9.0)
+# yardline_100 of the receiving team after a kickoff or free kick
+KICKOFF_YARDLINE = 70
+SCRIMMAGE_SECONDS = 27.0
+KICK_SECONDS = 8.0
+SHARD_SIZE = 10000
+
+
+# bucket of every (down, ydstogo) with down 1-4 and ydstogo 0-99
+_BUCKETS = (np.arange(4)[:, None] * (len(DISTANCE_EDGES) + 1)
+            + np.searchsorted(DISTANCE_EDGES, np.arange(100), side='left')[None, :])
+_BUCKETS = np.vstack([_BUCKETS[:1], _BUCKETS])
+
+
+def _fit_logistic(x, y, coef, iterations=25):
+    X = np.column_stack([np.ones_like(x), x])
+    coef = np.asarray(coef, dtype=np.float64)
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-X @ coef))
+        hessian = X.T @ (X * (p * (1 - p))[:, None]) + 1e-6 * np.eye(2)
+        coef = coef + np.linalg.solve(hessian, X.T @ (y - p))
+    return tuple(coef)
+
+
+def _float(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class DriveModel:
+    def __init__(self, yards, offsets, counts, turnover_rate=DEFAULT_TURNOVER_RATE, fg_coef=DEFAULT_FG_COEF,
+                 punt_net=DEFAULT_PUNT_NET):
+        self.yards = yards
+        self.offsets = offsets
+        self.counts = counts
+        self.turnover_rate = turnover_rate
+        self.fg_coef = fg_coef
+        self.punt_net = punt_net
+
+    @classmethod
+    @profiling.timed('simulate.fit')
+    def fit(cls, pbp):
+        plays = pbp[pbp['play_type'].isin(['pass', 'run'])]
+        down, ydstogo, yards = _float(plays['down']), _float(plays['ydstogo']), _float(plays['yards_gained'])
+        valid = np.isfinite(down) & np.isfinite(ydstogo) & np.isfinite(yards)
+        buckets = _BUCKETS[np.clip(down[valid], 1, 4).astype(np.int64), np.clip(ydstogo[valid], 0, 99).astype(np.int64)]
+        order = np.argsort(buckets, kind='stable')
+        yards = yards[valid][order].astype(np.int16)
+        counts = np.bincount(buckets, minlength=N_BUCKETS)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # thin buckets sample from all scrimmage plays
+        thin = counts < MIN_SAMPLES
+        offsets[thin], counts[thin] = 0, len(yards)
+
+        turnover_rate = DEFAULT_TURNOVER_RATE
+        if 'interception' in plays and 'fumble_lost' in plays and len(plays):
+            lost = np.nan_to_num(_float(plays['interception'])) + np.nan_to_num(_float(plays['fumble_lost']))
+            turnover_rate = float((lost > 0).mean())
+
+        fg_coef = DEFAULT_FG_COEF
+        if 'field_goal_result' in pbp and 'kick_distance' in pbp:
+            kicks = pbp[(pbp['play_type'] == 'field_goal') & pbp['kick_distance'].notna()]
+            made = (kicks['field_goal_result'] == 'made').to_numpy(dtype=np.float64)
+            if len(kicks) >= MIN_SAMPLES and 0 < made.mean() < 1:
+                fg_coef = _fit_logistic(_float(kicks['kick_distance']), made, DEFAULT_FG_COEF)
+
+        punt_net = DEFAULT_PUNT_NET
+        if 'kick_distance' in pbp and 'return_yards' in pbp:
+            punts = pbp[(pbp['play_type'] == 'punt') & pbp['kick_distance'].notna()]
+            if len(punts) >= MIN_SAMPLES:
+                net = _float(punts['kick_distance']) - np.nan_to_num(_float(punts['return_yards']))
+                punt_net = (float(net.mean()), float(net.std()))
+
+        logger.info("Fitted drive model on %d scrimmage plays", len(yards))
+        return cls(yards, offsets, counts, turnover_rate, fg_coef, punt_net)
+
+    @classmethod
+    def from_seasons(cls, seasons):
+        from src.features.nfl_data import get_play_by_play_data
+        return cls.fit(pd.concat([get_play_by_play_data(season) for season in seasons], ignore_index=True))
+
+    def sample_yards(self, u, down, ydstogo):
+        # u: uniform draws in [0, 1), one per play; down and ydstogo are
+        # integer arrays within 1-4 and 0-99
+        buckets = _BUCKETS[down, ydstogo]
+        positions = self.offsets[buckets] + (u * self.counts[buckets]).astype(np.int64)
+        return self.yards[positions].astype(np.int64)
+
+    def fg_probability(self, distance):
+        a, b = self.fg_coef
+        return 1.0 / (1.0 + np.exp(-(a + b * distance)))
+
+
+def _policy(down, ydstogo, yardline, clock, lead):
+    # 4th-down choice of the team with the ball in simulated continuations
+    action = np.full(len(down), GO, dtype=np.int8)
+    fourth = down == 4
+    in_range = yardline <= 37
+    # trailing late, keep the ball unless a field goal ties or takes the lead
+    desperate = (lead < 0) & (clock < 300) & ~(in_range & (lead >= -3))
+    short = (ydstogo <= 1) & (yardline <= 50)
+    action[fourth & ~desperate & in_range] = FIELD_GOAL
+    action[fourth & ~desperate & ~in_range & ~short] = PUNT
+    return action
+
+
+def _simulate_shard(model, situation, decision, n, seed):
+    rng = np.random.default_rng(seed)
+    margin = np.full(n, int(situation['score_differential']))
+    offense = np.ones(n, dtype=bool)    # the deciding team has the ball
+    down = np.full(n, int(situation.get('down', 4)))
+    ydstogo = np.full(n, int(situation['ydstogo']))
+    yardline = np.full(n, int(situation['yardline_100']))
+    clock = np.full(n, float(situation['game_seconds_remaining']))
+    slots = np.arange(n)
+    final = np.empty(n, dtype=np.int64)
+    action = np.full(n, DECISIONS.index(decision), dtype=np.int8)
+
+    while len(slots):
+        m = len(slots)
+        u = rng.random((2, m), dtype=np.float32)
+        gain = model.sample_yards(u[0], down, ydstogo)
+        turnover = u[1] < model.turnover_rate
+        # kicks are rare per snap, so their draws only cover the kicking slots
+        kicking = np.flatnonzero(action == FIELD_GOAL)
+        made = np.zeros(m, dtype=bool)
+        made[kicking] = rng.random(len(kicking)) < model.fg_probability(yardline[kicking] + 17)
+        missed = np.zeros(m, dtype=bool)
+        missed[kicking] = ~made[kicking]
+        punting = np.flatnonzero(action == PUNT)
+        landing = yardline[punting] - rng.normal(*model.punt_net, len(punting)).round().astype(np.int64)
+
+        scrimmage = action == GO
+        after = yardline - gain
+        kept = scrimmage & ~turnover
+        touchdown = kept & (after <= 0)
+        safety = kept & (after >= 100)
+        moved = kept & ~touchdown & ~safety
+        converted = moved & (gain >= ydstogo)
+        keep_ball = converted | (moved & (down < 4))
+
+        points = 7 * touchdown + 3 * made - 2 * safety
+        margin += np.where(offense, points, -points)
+
+        # the next snap, seen from whichever team has the ball; turnovers and
+        # failed 4th downs give the ball over at the spot
+        next_yardline = np.where(keep_ball, after, 100 - np.minimum(np.maximum(after, 1), 99))
+        next_yardline[touchdown | made | safety] = KICKOFF_YARDLINE
+        next_yardline[missed] = np.minimum(93 - yardline[missed], 80)
+        next_yardline[punting] = np.where(landing <= 0, 80, np.minimum(100 - landing, 99))
+        down = np.where(converted | ~keep_ball, 1, down + 1)
+        ydstogo = np.where(keep_ball & ~converted, np.minimum(ydstogo - gain, 99), np.minimum(10, next_yardline))
+        yardline = next_yardline
+        offense ^= ~keep_ball
+        clock -= np.where(scrimmage, SCRIMMAGE_SECONDS, KICK_SECONDS)
+
+        # finished games leave the arrays
+        over = clock <= 0
+        if over.any():
+            final[slots[over]] = margin[over]
+            live = ~over
+            slots, margin, offense, down, ydstogo, yardline, clock = (
+                a[live] for a in (slots, margin, offense, down, ydstogo, yardline, clock))
+        action = _policy(down, ydstogo, yardline, clock, np.where(offense, margin, -margin))
+    return final
+
+
+_WORKER_MODEL = None
+
+
+def _init_worker(model):
+    global _WORKER_MODEL
+    _WORKER_MODEL = model
+
+
+def _run_shard(situation, decision, n, seed):
+    return _simulate_shard(_WORKER_MODEL, situation, decision, n, seed)
+
+
+def _shards(n, seed):
+    sizes = [SHARD_SIZE] * (n // SHARD_SIZE) + ([n % SHARD_SIZE] if n % SHARD_SIZE else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def _run_tasks(model, tasks, workers):
+    # tasks: (situation, decision, n, seed); one result per task, in order
+    if workers and workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,)) as pool:
+            return list(pool.map(_run_shard, *zip(*tasks)))
+    return [_simulate_shard(model, *task) for task in tasks]
+
+
+@profiling.timed('simulate.decisions')
+def simulate_decisions(model, situation, decisions=None, n=20000, seed=0, workers=None, margins=False):
+    # one row per decision: win probability with its standard error and the
+    # distribution of final margins (deciding team minus opponent); with
+    # margins=True also {decision: margin per simulated game}
+    decisions = list(decisions or DECISIONS)
+    shards = _shards(n, seed)
+    parts = _run_tasks(model, [(situation, d, size, s) for d in decisions for size, s in shards], workers)
+    profiling.count('games_simulated', n * len(decisions))
+
+    rows, outcomes = [], {}
+    for i, decision in enumerate(decisions):
+        final = outcomes[decision] = np.concatenate(parts[i * len(shards):(i + 1) * len(shards)])
+        wins = (final > 0) + 0.5 * (final == 0)
+        rows.append({
+            'decision': decision,
+            'win_probability': wins.mean(),
+            'std_error': wins.std() / np.sqrt(len(wins)),
+            'margin_mean': final.mean(),
+            'margin_p10': np.percentile(final, 10),
+            'margin_p50': np.percentile(final, 50),
+            'margin_p90': np.percentile(final, 90),
+        })
+    table = pd.DataFrame(rows)
+    return (table, outcomes) if margins else table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate go / punt / field goal from a 4th-down game state.")
+    parser.add_argument('--seasons', type=int, nargs=2, default=[2019, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--score-differential', type=float, default=0)
+    parser.add_argument('--yardline', type=float, default=40, help="yards from the opponent's end zone")
+    parser.add_argument('--ydstogo', type=float, default=2)
+    parser.add_argument('--seconds', type=float, default=600, help="game seconds remaining")
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    model = DriveModel.from_seasons(range(args.seasons[0], args.seasons[1] + 1))
+    situation = {'score_differential': args.score_differential, 'yardline_100': args.yardline,
+                 'ydstogo': args.ydstogo, 'game_seconds_remaining': args.seconds}
+    print(simulate_decisions(model, situation, n=args.games, seed=args.seed, workers=args.workers).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
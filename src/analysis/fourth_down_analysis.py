@@ -1,10 +1,32 @@
+import numpy as np
 import pandas as pd
+from src.utils import profiling
 
+@profiling.timed('analysis.fourth_down')
 def analyze_fourth_down_decisions(pbp_data):
+    return fourth_down_tables(fourth_down_counts(pbp_data))
+
+# Additive (season, play_type) counts behind the 4th-down tables, so an
+# incremental refresh can add a new week's counts instead of rescanning PBP.
+def fourth_down_counts(pbp_data):
     fourth_down_plays = pbp_data[pbp_data['down'] == 4]
-    decisions = fourth_down_plays.groupby(['season', 'play_type']).size().unstack(fill_value=0).reset_index()
+    grouped = fourth_down_plays.groupby(['season', 'play_type'], observed=True)
+    counts = pd.DataFrame({
+        'plays': grouped.size(),
+        'success_sum': grouped['success'].sum().astype('float64'),
+        'success_n': grouped['success'].count(),
+    })
+    return counts.reset_index()
+
+def fourth_down_tables(counts):
+    counts = counts.set_index(['season', 'play_type'])
+    decisions = counts['plays'].unstack(fill_value=0).sort_index(axis=1).reset_index()
     decisions['total'] = decisions.sum(axis=1)
-    success_rates = fourth_down_plays.groupby(['season', 'play_type'])['success'].mean().unstack(fill_value=0).reset_index()
+    rates = pd.Series(
+        np.where(counts['success_n'] > 0, counts['success_sum'] / counts['success_n'].where(counts['success_n'] > 0), np.nan),
+        index=counts.index,
+    )
+    success_rates = rates.unstack(fill_value=0).sort_index(axis=1).reset_index()
     decisions.columns = ['Season'] + [f"{col.capitalize()} (%)" for col in decisions.columns[1:]]
     success_rates.columns = ['Season'] + [f"{col.capitalize()} (%)" for col in success_rates.columns[1:]]
     return decisions, success_rates
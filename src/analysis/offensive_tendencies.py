@@ -1,27 +1,95 @@
+import logging
+import numpy as np
 import pandas as pd
+from src.utils import profiling
 
+logger = logging.getLogger(__name__)
 
+
+@profiling.timed('analysis.bunch_formation')
 def analyze_3x1_bunch_formation(play_data):
     # Filter plays for '3x1 bunch' inferred formation: 1 RB, 1 TE, 3 WR
     bunch_formation_plays = play_data[play_data['offense_personnel'] == '1 RB, 1 TE, 3 WR']
-    
-    # Debug: Check the number of plays in the 3x1 bunch formation
-    print("Number of plays in 3x1 bunch formation:", bunch_formation_plays.shape[0])
-    
+    logger.debug("Number of plays in 3x1 bunch formation: %d", bunch_formation_plays.shape[0])
+    return _tendencies(bunch_formation_plays)
+
+def _tendencies(plays):
     tendencies = {
-        'run_percentage': (bunch_formation_plays['play_type'] == 'run').mean() * 100,
-        'pass_percentage': (bunch_formation_plays['play_type'] == 'pass').mean() * 100,
-        'avg_yards_gained': bunch_formation_plays['yards_gained'].mean(),
-        'success_rate': (bunch_formation_plays['success'] == 1).mean() * 100
+        'run_percentage': (plays['play_type'] == 'run').mean() * 100,
+        'pass_percentage': (plays['play_type'] == 'pass').mean() * 100,
+        'avg_yards_gained': plays['yards_gained'].mean(),
+        'success_rate': (plays['success'] == 1).mean() * 100
     }
     
     # Additional analyses
-    down_tendencies = bunch_formation_plays.groupby('down')['play_type'].value_counts(normalize=True).unstack()
+    down_tendencies = plays.groupby('down', observed=True)['play_type'].value_counts(normalize=True).unstack()
     
-    situational_tendencies = bunch_formation_plays.groupby(['down', 'yardline_100'])['play_type'].value_counts(normalize=True).unstack()
+    situational_tendencies = plays.groupby(['down', 'yardline_100'], observed=True)['play_type'].value_counts(normalize=True).unstack()
     
     return tendencies, down_tendencies, situational_tendencies
 
+def formation_mask(plays, **filters):
+    # column=value or column=[values]; FTN columns (see src/features/ftn_index.py)
+    # may be given without their ftn_ prefix, e.g. qb_location='S', is_motion=True
+    mask = np.ones(len(plays), dtype=bool)
+    for column, wanted in filters.items():
+        values = plays[column if column in plays else f"ftn_{column}"]
+        hit = values.isin(list(wanted)) if isinstance(wanted, (list, tuple, set)) else values == wanted
+        mask &= hit.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+@profiling.timed('analysis.formation_tendencies')
+def formation_tendencies(plays, **filters):
+    # the 3x1 bunch tables for any charted formation, e.g. on join_ftn output:
+    # formation_tendencies(plays, offense_personnel='1 RB, 1 TE, 3 WR', qb_location='S', is_motion=True)
+    return _tendencies(plays[formation_mask(plays, **filters)])
+
+TENDENCY_KEYS = ['season', 'posteam', 'offense_personnel', 'down', 'yardline_100', 'play_type']
+
+# Additive play counts per (season, team, personnel, down, yardline, play type).
+# Incremental refreshes add a new week's counts to the stored table, and
+# tendencies_from_counts rebuilds the 3x1 bunch tables from it without PBP.
+def tendency_counts(play_data):
+    # categorical keys are grouped on their codes: groupby drops NaN
+    # categories even with dropna=False, and codes are cheaper to hash
+    keys = []
+    for key in TENDENCY_KEYS:
+        column = play_data[key]
+        keys.append(column.cat.codes.rename(key) if isinstance(column.dtype, pd.CategoricalDtype) else column)
+    grouped = play_data.groupby(keys, dropna=False)
+    counts = pd.DataFrame({
+        'plays': grouped.size(),
+        'yards_sum': grouped['yards_gained'].sum().astype('float64'),
+        'yards_n': grouped['yards_gained'].count(),
+        'success_hits': (play_data['success'] == 1).groupby(keys, dropna=False).sum(),
+    }).reset_index()
+    for key in TENDENCY_KEYS:
+        column = play_data[key]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            counts[key] = pd.Categorical.from_codes(counts[key].astype('int64'), dtype=column.dtype)
+    return counts
+
+def tendencies_from_counts(counts, personnel='1 RB, 1 TE, 3 WR'):
+    bunch = counts[counts['offense_personnel'] == personnel]
+    total = bunch['plays'].sum()
+    yards_n = bunch['yards_n'].sum()
+    tendencies = {
+        'run_percentage': bunch.loc[bunch['play_type'] == 'run', 'plays'].sum() / total * 100 if total else np.nan,
+        'pass_percentage': bunch.loc[bunch['play_type'] == 'pass', 'plays'].sum() / total * 100 if total else np.nan,
+        'avg_yards_gained': bunch['yards_sum'].sum() / yards_n if yards_n else np.nan,
+        'success_rate': bunch['success_hits'].sum() / total * 100 if total else np.nan,
+    }
+
+    typed = bunch[bunch['play_type'].notna() & bunch['down'].notna()]
+    by_down = typed.groupby(['down', 'play_type'], observed=True)['plays'].sum().unstack().sort_index(axis=1)
+    down_tendencies = by_down.div(by_down.sum(axis=1), axis=0)
+
+    typed = typed[typed['yardline_100'].notna()]
+    by_situation = typed.groupby(['down', 'yardline_100', 'play_type'], observed=True)['plays'].sum().unstack().sort_index(axis=1)
+    situational_tendencies = by_situation.div(by_situation.sum(axis=1), axis=0)
+
+    return tendencies, down_tendencies, situational_tendencies
+
 # Example usage
 # years = [2020, 2021, 2022]
 # play_data = pd.concat([nfl.import_pbp_data([year]) for year in years])
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+# Declarative situational queries over play-by-play.
+#
+# A query is a set of filters, optional group-by columns and metrics:
+#
+#   engine = SituationalQuery(pbp)
+#   engine.query({'down': 3, 'ydstogo': ('>=', 7)}, situations=['red_zone'],
+#                by='posteam', metrics=['plays', 'success_rate', 'epa'])
+#
+# Filter values are a scalar (equality), a list/set (membership), or an
+# (op, value) tuple with op one of == != < <= > >= in between. Each
+# predicate is evaluated once into a packed bitmap (one bit per play) and
+# kept in an LRU cache, so queries sharing predicates only AND the cached
+# bitmaps. Whole results are cached by their normalized query, so filter
+# order and list order do not matter.
+
+OPS = {
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(list(v)),
+    'between': lambda s, v: s.between(*v),
+}
+
+# named situations -> filters
+SITUATIONS = {
+    'red_zone': {'yardline_100': ('<=', 20)},
+    'goal_to_go': {'yardline_100': ('<=', 10), 'ydstogo': ('>=', 'yardline_100')},
+    'two_minute': {'half_seconds_remaining': ('<=', 120)},
+    'one_score': {'score_differential': ('between', (-8, 8))},
+    'short_yardage': {'ydstogo': ('<=', 2)},
+}
+
+# metric name -> (column, aggregation); '_pass' and '_run' are play_type masks
+METRICS = {
+    'plays': (None, 'size'),
+    'success_rate': ('success', 'mean'),
+    'epa': ('epa', 'mean'),
+    'yards': ('yards_gained', 'mean'),
+    'pass_rate': ('_pass', 'mean'),
+    'run_rate': ('_run', 'mean'),
+}
+
+
+def _normalize_predicate(column, value):
+    if isinstance(value, tuple) and len(value) == 2 and value[0] in OPS:
+        op, operand = value
+    elif isinstance(value, (list, set, frozenset)):
+        op, operand = 'in', value
+    else:
+        op, operand = '==', value
+    if op == 'in':
+        operand = tuple(sorted(set(operand), key=repr))
+    elif op == 'between':
+        operand = tuple(operand)
+    return column, op, operand
+
+
+def normalize_query(filters=None, situations=(), by=(), metrics=('plays',)):
+    predicates = set()
+    for situation in situations:
+        for column, value in SITUATIONS[situation].items():
+            predicates.add(_normalize_predicate(column, value))
+    for column, value in (filters or {}).items():
+        predicates.add(_normalize_predicate(column, value))
+    by = (by,) if isinstance(by, str) else tuple(by)
+    metrics = tuple(metrics)
+    return tuple(sorted(predicates, key=repr)), by, metrics
+
+
+class SituationalQuery:
+    def __init__(self, pbp, max_bitmaps=256, max_results=512):
+        self.pbp = pbp.reset_index(drop=True)
+        self.n = len(self.pbp)
+        self.max_bitmaps = max_bitmaps
+        self.max_results = max_results
+        self._bitmaps = OrderedDict()
+        self._results = OrderedDict()
+        self._derived = {}
+
+    @classmethod
+    def from_seasons(cls, seasons, incremental=False, **kwargs):
+        from src.features.nfl_data import get_play_by_play_data
+        return cls(pd.concat([get_play_by_play_data(season, incremental=incremental) for season in seasons],
+                             ignore_index=True), **kwargs)
+
+    def _column(self, column):
+        if column in ('_pass', '_run'):
+            if column not in self._derived:
+                self._derived[column] = (self.pbp['play_type'] == column[1:]).astype('float64')
+            return self._derived[column]
+        return self.pbp[column]
+
+    def bitmap(self, predicate):
+        # packed uint8 bitmap of the plays matching one normalized predicate
+        if predicate in self._bitmaps:
+            self._bitmaps.move_to_end(predicate)
+            profiling.count('query_bitmap_hits')
+            return self._bitmaps[predicate]
+        column, op, operand = predicate
+        # an operand naming another column compares the two columns
+        if isinstance(operand, str) and op not in ('==', '!=', 'in') and operand in self.pbp:
+            operand = self.pbp[operand]
+        matches = OPS[op](self._column(column), operand)
+        bits = np.packbits(matches.fillna(False).to_numpy(dtype=bool))
+        self._bitmaps[predicate] = bits
+        if len(self._bitmaps) > self.max_bitmaps:
+            self._bitmaps.popitem(last=False)
+        profiling.count('query_bitmaps_built')
+        return bits
+
+    def mask(self, predicates):
+        bits = np.full((self.n + 7) // 8, 0xFF, dtype=np.uint8)
+        for predicate in predicates:
+            bits &= self.bitmap(predicate)
+        return np.unpackbits(bits, count=self.n).view(bool)
+
+    @profiling.timed('analysis.situational_query')
+    def query(self, filters=None, situations=(), by=(), metrics=('plays',)):
+        key = normalize_query(filters, situations, by, metrics)
+        if key in self._results:
+            self._results.move_to_end(key)
+            profiling.count('query_result_hits')
+            return self._results[key].copy()
+        predicates, by, metrics = key
+
+        rows = np.flatnonzero(self.mask(predicates))
+        columns = {}
+        for name in metrics:
+            column, agg = METRICS[name] if isinstance(name, str) else name
+            if column is not None:
+                columns[repr(name) if not isinstance(name, str) else name] = (column, agg)
+        # by-columns keep their dtype, so categoricals group on codes
+        selected = pd.DataFrame({name: self._column(column).to_numpy()[rows] for name, (column, _) in columns.items()})
+        for column in by:
+            selected[column] = self.pbp[column].iloc[rows].reset_index(drop=True)
+
+        if by:
+            grouped = selected.groupby(list(by), observed=True, sort=True)
+            result = pd.DataFrame({'plays': grouped.size()})
+            for name, (_, agg) in columns.items():
+                result[name] = grouped[name].agg(agg)
+            result = result.reset_index()
+        else:
+            values = {'plays': len(rows)}
+            values.update({name: selected[name].agg(agg) for name, (_, agg) in columns.items()})
+            result = pd.DataFrame([values])
+        result = result[list(by) + [m if isinstance(m, str) else repr(m) for m in metrics]]
+
+        self._results[key] = result
+        if len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return result.copy()
@@ -1,17 +1,20 @@
+import logging
 import pandas as pd
-from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
+from src.utils import profiling
 
+logger = logging.getLogger(__name__)
+
+@profiling.timed('analysis.wr_projections')
 def evaluate_wr_projections(projections, actual_stats):
-    # Debug: Print columns of projections and actual_stats DataFrames
-    print("Projections columns:", projections.columns)
-    print("Actual stats columns:", actual_stats.columns)
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+    logger.debug("Projections columns: %s", list(projections.columns))
+    logger.debug("Actual stats columns: %s", list(actual_stats.columns))
     
     # Perform merge
     merged_data = pd.merge(projections, actual_stats, on=['player_id', 'season'], suffixes=('_proj', '_actual'))
-    
-    # Debug: Print columns of the merged DataFrame
-    print("Merged data columns:", merged_data.columns)
+    profiling.count('rows_merged', len(merged_data))
+    logger.debug("Merged data columns: %s", list(merged_data.columns))
     
     metrics = ['receptions', 'receiving_yards', 'receiving_tds']  # Updated here
     results = {}
@@ -20,7 +23,7 @@ def evaluate_wr_projections(projections, actual_stats):
         actual_col = f'{metric}_actual'
         proj_col = f'{metric}_proj'
         if actual_col not in merged_data.columns or proj_col not in merged_data.columns:
-            print(f"Column {actual_col} or {proj_col} not found in merged_data")
+            logger.warning("Column %s or %s not found in merged_data", actual_col, proj_col)
             continue
 
         mae = mean_absolute_error(merged_data[actual_col], merged_data[proj_col])
@@ -1,31 +1,122 @@
+import logging
+import numpy as np
 import pandas as pd
-import nfl_data_py as nfl
+from src.features.cache import cached_frame, read_cached, write_cached
+from src.features.contracts import contracts_in_force
+from src.utils import profiling
 
+logger = logging.getLogger(__name__)
+
+# Draft-slot value curves.
+#
+# Every regular-season player-season is joined by gsis_id to the player's
+# draft pick (import_draft_picks) and to the contract in force that season
+# (the latest one signed at or before it, within its length). The
+# per-season tables are cached one parquet file per season, so extending
+# the year range only builds the new seasons. Curves are grouped sums over
+# those rows, smoothed with a centered rolling window along pick number:
+#
+#   value_per_dollar    production per $M of APY
+#   surplus_per_season  production priced at the league-wide $M per point,
+#                       minus APY
+#
+#   curves = draft_value_curves(range(2013, 2024), by=['position', 'pick'])
+
+METRIC = 'fantasy_points_ppr'
+DRAFT_COLUMNS = ['gsis_id', 'season', 'round', 'pick', 'team', 'position']
+
+
+def _load_sources():
+    import nfl_data_py as nfl
+    picks = nfl.import_draft_picks()
+    picks = picks.dropna(subset=['gsis_id'])[DRAFT_COLUMNS].drop_duplicates('gsis_id')
+    picks = picks.rename(columns={'season': 'draft_season', 'team': 'draft_team'})
+    return picks, nfl.import_contracts()
+
+
+def _season_value(year, picks, contracts, metric):
+    import nfl_data_py as nfl
+    seasonal = nfl.import_seasonal_data([int(year)], s_type='REG')
+    seasons = seasonal[['player_id', 'season', metric]].rename(columns={'player_id': 'gsis_id', metric: 'production'})
+    seasons = contracts_in_force(seasons.merge(picks, on='gsis_id', how='left'), contracts)
+    seasons['drafted'] = seasons['pick'].notna()
+    seasons['value_per_dollar'] = seasons['production'] / seasons['apy']
+    profiling.count('rows_merged', len(seasons))
+    return seasons.sort_values(['gsis_id']).reset_index(drop=True)
+
+
+@profiling.timed('analysis.draft_value_seasons')
+def draft_value_seasons(years, metric=METRIC, refresh=False, cache_dir=None):
+    # one row per player-season with production, draft slot and APY in force
+    sources = None
+    frames = []
+    for year in years:
+        key = f"{metric}_{int(year)}"
+        seasons = None if refresh else read_cached('draft_value', key, cache_dir)
+        if seasons is None:
+            if sources is None:
+                sources = _load_sources()
+            seasons = _season_value(year, *sources, metric)
+            write_cached(seasons, 'draft_value', key, cache_dir)
+        frames.append(seasons)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _smooth(sums, keys, window):
+    # centered rolling sums along the last key, within each group of the others
+    if len(keys) == 1:
+        return sums.rolling(window, center=True, min_periods=1).sum()
+    rolled = sums.groupby(level=keys[:-1], observed=True).rolling(window, center=True, min_periods=1).sum()
+    return rolled.droplevel(list(range(len(keys) - 1)))
+
+
+@profiling.timed('analysis.draft_value_curves')
+def draft_value_curves(years, by='pick', window=9, metric=METRIC, refresh=False, cache_dir=None):
+    # curves are cached per (metric, by, window, year range); a miss is built
+    # from the per-season tables, which are cached on their own
+    keys = [by] if isinstance(by, str) else list(by)
+    years = sorted(int(y) for y in years)
+    curve_key = f"{metric}_{'-'.join(keys)}_w{window}_{years[0]}-{years[-1]}_{len(years)}"
+
+    def build():
+        seasons = draft_value_seasons(years, metric, refresh, cache_dir)
+        priced = seasons['apy'].notna()
+        dollars_per_point = seasons.loc[priced, 'apy'].sum() / seasons.loc[priced, 'production'].sum()
+        seasons = seasons.assign(
+            priced_production=seasons['production'].where(priced),
+            surplus=seasons['production'] * dollars_per_point - seasons['apy'],
+        )
+
+        drafted = seasons[seasons['drafted']]
+        sums = drafted.groupby(keys, observed=True).agg(
+            player_seasons=('production', 'size'),
+            production=('production', 'sum'),
+            priced_seasons=('apy', 'count'),
+            priced_production=('priced_production', 'sum'),
+            apy=('apy', 'sum'),
+            surplus=('surplus', 'sum'),
+        ).sort_index()
+        if window > 1 and keys[-1] == 'pick':
+            sums = _smooth(sums, keys, window)
+
+        curves = pd.DataFrame(index=sums.index)
+        curves['player_seasons'] = sums['player_seasons']
+        curves['production_per_season'] = sums['production'] / sums['player_seasons']
+        curves['apy_per_season'] = sums['apy'] / sums['priced_seasons']
+        curves['value_per_dollar'] = sums['priced_production'] / sums['apy']
+        curves['surplus_per_season'] = sums['surplus'] / sums['priced_seasons']
+        return curves.replace([np.inf, -np.inf], np.nan).reset_index()
+
+    return cached_frame('draft_value_curves', curve_key, build, refresh=refresh, cache_dir=cache_dir)
+
+
+@profiling.timed('analysis.acquisition_value')
 def analyze_acquisition_value(years):
     if not isinstance(years, (list, range)):
         raise ValueError("years variable must be list or range.")
-    
-    draft_data = nfl.import_draft_picks(years)
-    seasonal_data = nfl.import_seasonal_data(years, s_type='REG')
-
-    try:
-        salary_df = nfl.import_contracts()
-        if 'year_signed' not in salary_df.columns:
-            print("Warning: 'year_signed' column not found in salary data. Skipping salary analysis.")
-            return draft_data, seasonal_data
-
-        required_cols = ['player', 'year_signed', 'value']
-        if not all(col in salary_df.columns for col in required_cols):
-            print(f"Warning: Missing required columns in salary data. Expected {required_cols}. Found {salary_df.columns.tolist()}. Skipping salary analysis.")
-            return draft_data, seasonal_data
-
-        seasonal_data = pd.merge(seasonal_data, salary_df[required_cols], left_on=['player', 'season'], right_on=['player', 'year_signed'], how='left')
-        seasonal_data['value_per_dollar'] = seasonal_data['approximate_value'] / seasonal_data['value']
-    except Exception as e:
-        print(f"Error processing salary data: {str(e)}. Skipping salary analysis.")
-        return draft_data, seasonal_data
-
-    drafted_players = seasonal_data[seasonal_data['draft_number'].notnull()]
-    undrafted_players = seasonal_data[seasonal_data['draft_number'].isnull()]
+
+    seasons = draft_value_seasons(years)
+    drafted_players = seasons[seasons['drafted']]
+    undrafted_players = seasons[~seasons['drafted']]
 
     return drafted_players, undrafted_players
@@ -0,0 +1,60 @@
+import logging
+import os
+import time
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Local parquet cache for loaded frames. Parquet keeps the compact dtypes
+# from src.features.dtypes (categoricals, nullable small ints, float32), so a
+# cached frame comes back exactly as it was optimized.
+#
+# Entries built from sources that keep changing (contracts, the current
+# season's stats) can be read with max_age in seconds: an older file counts
+# as a miss and is rebuilt.
+
+CACHE_DIR = os.environ.get('NFL_QUANT_CACHE_DIR', os.path.join('data', 'cache'))
+
+
+def cache_path(dataset, key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, dataset, f"{key}.parquet")
+
+
+def read_cached(dataset, key, cache_dir=None, max_age=None):
+    path = cache_path(dataset, key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+        profiling.count('cache_expired')
+        return None
+    with profiling.stage(f'cache.read.{dataset}'):
+        df = pd.read_parquet(path)
+    profiling.count('cache_hits')
+    return df
+
+
+def write_cached(df, dataset, key, cache_dir=None):
+    path = cache_path(dataset, key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with profiling.stage(f'cache.write.{dataset}'):
+        df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def cached_frame(dataset, key, loader, refresh=False, cache_dir=None, max_age=None):
+    # Return the cached frame for (dataset, key), building it with loader()
+    # on a miss, when refresh=True or when the entry is older than max_age.
+    if not refresh:
+        df = read_cached(dataset, key, cache_dir, max_age)
+        if df is not None:
+            return df
+    profiling.count('cache_misses')
+    df = loader()
+    try:
+        write_cached(df, dataset, key, cache_dir)
+    except (OSError, ValueError, ImportError) as e:
+        logger.warning("Could not cache %s/%s: %s", dataset, key, e)
+    return df
@@ -0,0 +1,137 @@
+import numpy as np
+from src.utils import profiling
+
+# Pixel classification for Next Gen route charts through a 3-D colour
+# lookup table.
+#
+# A palette lists, for each route class, the colour test the chart
+# pipeline has always applied: cv2.inRange in BGR or HSV space, keep the
+# masked pixels, optionally run them through COLOR_HSV2BGR (the legacy YAC
+# path does), and test one channel for non-zero. build_color_lut applies
+# exactly those cv2 operations once to all 2**24 colours, so classifying a
+# chart is a table lookup that matches the per-image operations pixel for
+# pixel.
+#
+# The full table (16 MB) is only built transiently. What is kept is two
+# levels: a coarse table over the top COARSE_BITS bits of each channel
+# (32**3 uint16 entries, 64 KB) that holds the labels directly for the
+# colour cells where all 512 colours agree, and for the few cells on a
+# class boundary an index into a table of distinct 8x8x8 blocks (about
+# 200 KB for the default palette). Charts are classified in bands of
+# BAND_ROWS rows so the index temporaries stay cache sized.
+#
+#   labels = classify_pixels(image)           # uint8, one bit per class
+#   complete = labels & COMPLETE
+
+COMPLETE = 1
+YAC = 2
+INCOMPLETE = 4
+CLASSES = {'complete': COMPLETE, 'yac': YAC, 'incomplete': INCOMPLETE}
+
+# chart vintage -> class -> colour test
+PALETTES = {
+    'default': {
+        'complete': {'space': 'bgr', 'lower': (230, 230, 230), 'upper': (255, 255, 255), 'channel': 1},
+        'yac': {'space': 'hsv', 'lower': (40, 100, 100), 'upper': (80, 255, 255), 'channel': 2, 'hsv2bgr': True},
+        'incomplete': {'space': 'bgr', 'lower': (126, 126, 126), 'upper': (132, 132, 132), 'channel': 1},
+    },
+}
+
+COARSE_BITS = 5
+FINE_BITS = 8 - COARSE_BITS
+# coarse entries below this are labels; the rest are MIXED + block number
+MIXED = 1 << len(CLASSES)
+BAND_ROWS = 64
+
+_LUTS = {}
+
+
+def _class_mask(image, hsv, spec):
+    import cv2
+    source = hsv if spec['space'] == 'hsv' else image
+    mask = cv2.inRange(source, np.array(spec['lower']), np.array(spec['upper']))
+    pixels = cv2.bitwise_and(image, image, mask=mask)
+    if spec.get('hsv2bgr'):
+        pixels = cv2.cvtColor(pixels, cv2.COLOR_HSV2BGR)
+    return pixels[..., spec['channel']] != 0
+
+
+def classify_pixels_direct(image, palette='default'):
+    # per-image cv2 operations; the reference the lookup table is built from
+    import cv2
+    palette = PALETTES[palette] if isinstance(palette, str) else palette
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    labels = np.zeros(image.shape[:2], dtype=np.uint8)
+    for name, spec in palette.items():
+        labels[_class_mask(image, hsv, spec)] |= CLASSES[name]
+    return labels
+
+
+def _palette_key(palette):
+    if isinstance(palette, str):
+        return palette
+    return repr(sorted((name, sorted(spec.items())) for name, spec in palette.items()))
+
+
+def _full_color_lut(palette):
+    # (256, 256, 256) uint8 table indexed by [b, g, r]
+    values = np.arange(256, dtype=np.uint8)
+    b, g, r = np.meshgrid(values, values, values, indexing='ij')
+    # every BGR colour laid out as one 4096 x 4096 image
+    colours = np.stack([b, g, r], axis=-1).reshape(4096, 4096, 3)
+    del b, g, r
+    return classify_pixels_direct(colours, palette).reshape(256, 256, 256)
+
+
+@profiling.timed('image.build_color_lut')
+def build_color_lut(palette='default'):
+    # (coarse, blocks) tables, cached per palette: coarse is indexed by the
+    # packed top bits of (b, g, r), blocks by block * 512 + the packed low bits
+    key = _palette_key(palette)
+    if key not in _LUTS:
+        n, size = 1 << COARSE_BITS, 1 << FINE_BITS
+        # one row per coarse cell holding its 512 labels
+        cells = _full_color_lut(palette).reshape(n, size, n, size, n, size)
+        cells = cells.transpose(0, 2, 4, 1, 3, 5).reshape(n ** 3, size ** 3)
+        mixed = (cells != cells[:, :1]).any(axis=1)
+        blocks, block_of_cell = np.unique(cells[mixed], axis=0, return_inverse=True)
+        coarse = cells[:, 0].astype(np.uint16)
+        coarse[mixed] = MIXED + block_of_cell.ravel()
+        _LUTS[key] = coarse, np.ascontiguousarray(blocks).ravel()
+    return _LUTS[key]
+
+
+def _coarse_index(b, g, r):
+    # packed top COARSE_BITS bits of each channel
+    index = np.left_shift(b >> FINE_BITS, 2 * COARSE_BITS, dtype=np.uint16)
+    index |= np.left_shift(g >> FINE_BITS, COARSE_BITS, dtype=np.uint16)
+    index |= r >> FINE_BITS
+    return index
+
+
+def _fine_index(entries, b, g, r):
+    # block * 512 + packed low FINE_BITS bits of each channel
+    low = (1 << FINE_BITS) - 1
+    index = np.left_shift(entries - MIXED, 3 * FINE_BITS, dtype=np.int32)
+    index |= np.left_shift(b & low, 2 * FINE_BITS, dtype=np.int32)
+    index |= np.left_shift(g & low, FINE_BITS, dtype=np.int32)
+    index |= r & low
+    return index
+
+
+def classify_pixels(image, palette='default'):
+    # one coarse gather per pixel, and a second one into the blocks for the
+    # pixels whose colour cell straddles a class boundary
+    import cv2
+    coarse, blocks = build_color_lut(palette)
+    labels = np.empty(image.shape[:2], dtype=np.uint8)
+    for start in range(0, image.shape[0], BAND_ROWS):
+        # contiguous channel planes are much faster to shift than strided views
+        b, g, r = cv2.split(image[start:start + BAND_ROWS])
+        entries = coarse.take(_coarse_index(b, g, r))
+        out = labels[start:start + BAND_ROWS]
+        out[...] = entries
+        mixed = entries >= MIXED
+        if mixed.any():
+            out[mixed] = blocks.take(_fine_index(entries[mixed], b[mixed], g[mixed], r[mixed]))
+    return labels
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from src.features.chart_colors import CLASSES, classify_pixels
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed store for Next Gen route chart images.
+#
+#   root/blobs/<sha[:2]>/<sha256>.<ext>    image bytes, written once per content
+#   root/cleaned/<sha256>.jpeg             cleaned copy of 1200x1200 charts
+#   root/results/<sha256>_td<n>.parquet    map_route_locations output
+#   root/manifest.json                     chart key -> sha, blob sizes/shapes
+#   root/signatures.npy + signatures.json  route signatures, one row per blob
+#
+# Charts are keyed by season/week/team/gameId/player, so two charts for the
+# same player in one week no longer overwrite each other, and a re-scrape
+# that returns the same bytes writes nothing new. The route signature is a
+# perceptual hash: which 10x10-pixel blocks contain complete, YAC or
+# incomplete route pixels. A re-encoded or re-served copy of a chart has
+# (nearly) the same signature, so its processed routes can be reused
+# instead of re-running the image pipeline.
+#
+#   store = ChartStore('data/next_gen/chart_store')
+#   store.put(chart, image_bytes)
+#   store.save()
+
+STORE_VERSION = 1
+SIGNATURE_BLOCK = 10
+# blocks that may differ, as a fraction of occupied blocks, for two charts
+# to count as visually identical
+SIMILAR_TOLERANCE = 0.02
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int32)
+
+
+def chart_key(chart):
+    name = f"{chart['lastName']}_{chart['firstName']}_{chart['position']}"
+    return f"{chart['season']}/{chart['week']}/{chart['team']}/{chart['gameId']}/{name}"
+
+
+def route_signature(image, palette='default', block=SIGNATURE_BLOCK):
+    # packed bits: per route class, whether each block holds any of its pixels
+    labels = classify_pixels(image, palette)
+    rows, cols = labels.shape[0] // block, labels.shape[1] // block
+    blocks = labels[:rows * block, :cols * block].reshape(rows, block, cols, block)
+    occupied = np.bitwise_or.reduce(np.bitwise_or.reduce(blocks, axis=3), axis=1)
+    planes = [(occupied & bit) != 0 for bit in CLASSES.values()]
+    return np.packbits(np.stack(planes))
+
+
+def _write_bytes(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ChartStore:
+    def __init__(self, root, palette='default'):
+        self.root = root
+        self.palette = palette
+        manifest_path = os.path.join(root, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['version'] != STORE_VERSION:
+                raise ValueError(f"Chart store at {root} has version {manifest['version']}, expected {STORE_VERSION}")
+        else:
+            manifest = {'version': STORE_VERSION, 'charts': {}, 'blobs': {}}
+        self.charts = manifest['charts']
+        self.blobs = manifest['blobs']
+
+        # signatures live in one growing array so a lookup is a single
+        # vectorized XOR/popcount over the candidate rows
+        self._signature_shas = []
+        self._signatures = None
+        self._occupied = np.zeros(0, dtype=np.int32)
+        signatures_path = os.path.join(root, 'signatures.npy')
+        if os.path.exists(signatures_path):
+            with open(os.path.join(root, 'signatures.json')) as f:
+                self._signature_shas = json.load(f)
+            self._signatures = np.load(signatures_path)
+            self._occupied = _POPCOUNT[self._signatures].sum(axis=1)
+        self._signature_row = {sha: i for i, sha in enumerate(self._signature_shas)}
+
+    def __len__(self):
+        return len(self.charts)
+
+    def blob_path(self, sha):
+        return os.path.join(self.root, 'blobs', sha[:2], sha + self.blobs[sha]['ext'])
+
+    def cleaned_path(self, sha):
+        return os.path.join(self.root, 'cleaned', f"{sha}.jpeg")
+
+    def results_path(self, sha, touchdowns=0):
+        return os.path.join(self.root, 'results', f"{sha}_td{int(touchdowns)}.parquet")
+
+    def sha_for(self, chart):
+        entry = self.charts.get(chart_key(chart))
+        return entry['sha'] if entry else None
+
+    def shape(self, sha):
+        return tuple(self.blobs[sha]['shape'])
+
+    @profiling.timed('chart_store.put')
+    def put(self, chart, data, ext='.jpeg'):
+        import cv2
+        sha = hashlib.sha256(data).hexdigest()
+        if sha in self.blobs:
+            profiling.count('chart_blobs_deduplicated')
+        else:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode chart image for {chart_key(chart)}")
+            self.blobs[sha] = {'size': len(data), 'ext': ext, 'shape': list(image.shape[:2])}
+            _write_bytes(data, self.blob_path(sha))
+            self._add_signature(sha, route_signature(image, self.palette))
+            profiling.count('chart_blobs_written')
+        self.charts[chart_key(chart)] = {
+            'sha': sha,
+            'gameId': chart['gameId'],
+            'team': chart['team'],
+            'season': chart['season'],
+            'week': chart['week'],
+            'name': f"{chart['firstName']} {chart['lastName']}",
+            'position': chart['position'],
+        }
+        return sha
+
+    def put_file(self, chart, path):
+        with open(path, 'rb') as f:
+            return self.put(chart, f.read(), os.path.splitext(path)[1] or '.jpeg')
+
+    def _add_signature(self, sha, signature):
+        row = len(self._signature_shas)
+        if self._signatures is None or row == len(self._signatures):
+            capacity = max(64, 2 * row)
+            signatures = np.zeros((capacity, signature.size), dtype=np.uint8)
+            occupied = np.zeros(capacity, dtype=np.int32)
+            if row:
+                signatures[:row] = self._signatures[:row]
+                occupied[:row] = self._occupied[:row]
+            self._signatures, self._occupied = signatures, occupied
+        self._signatures[row] = signature
+        self._occupied[row] = _POPCOUNT[signature].sum()
+        self._signature_row[sha] = row
+        self._signature_shas.append(sha)
+
+    def similar(self, sha, tolerance=SIMILAR_TOLERANCE):
+        # other blobs whose route signature is within tolerance, closest first
+        row = self._signature_row.get(sha)
+        if row is None:
+            return []
+        n = len(self._signature_shas)
+        signature = self._signatures[row]
+        # the bit distance is at least the difference in occupied blocks, so
+        # rows whose counts are too far apart are skipped before the XOR
+        occupied = self._occupied[:n]
+        candidates = np.flatnonzero(np.abs(occupied - occupied[row]) <= tolerance * (occupied + occupied[row]))
+        candidates = candidates[candidates != row]
+        distance = _POPCOUNT[np.bitwise_xor(self._signatures[candidates], signature)].sum(axis=1)
+        union = np.maximum(_POPCOUNT[np.bitwise_or(self._signatures[candidates], signature)].sum(axis=1), 1)
+        keep = distance <= tolerance * union
+        matches = candidates[keep][np.argsort(distance[keep], kind='stable')]
+        return [self._signature_shas[i] for i in matches]
+
+    def load_results(self, sha, touchdowns=0, tolerance=SIMILAR_TOLERANCE):
+        # processed routes for this blob, or for a visually identical one
+        for candidate in [sha] + self.similar(sha, tolerance):
+            path = self.results_path(candidate, touchdowns)
+            if os.path.exists(path):
+                profiling.count('chart_results_reused')
+                return pd.read_parquet(path)
+        return None
+
+    def save_results(self, sha, route_data, touchdowns=0):
+        path = self.results_path(sha, touchdowns)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        route_data.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def disk_usage(self):
+        return sum(blob['size'] for blob in self.blobs.values())
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        manifest = {'version': STORE_VERSION, 'charts': self.charts, 'blobs': self.blobs}
+        _write_bytes(json.dumps(manifest).encode(), os.path.join(self.root, 'manifest.json'))
+        if self._signature_shas:
+            tmp_path = os.path.join(self.root, 'signatures.tmp.npy')
+            np.save(tmp_path, self._signatures[:len(self._signature_shas)])
+            os.replace(tmp_path, os.path.join(self.root, 'signatures.npy'))
+            _write_bytes(json.dumps(self._signature_shas).encode(), os.path.join(self.root, 'signatures.json'))
+        return self.root
@@ -1,10 +1,41 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
+import numpy as np
 import time
-
+import logging
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# League salary cap per season, $M. 2010 was uncapped.
+LEAGUE_SALARY_CAP = {
+    2000: 62.172, 2001: 67.405, 2002: 71.101, 2003: 75.007, 2004: 80.582,
+    2005: 85.5, 2006: 102.0, 2007: 109.0, 2008: 116.0, 2009: 123.0,
+    2010: np.nan, 2011: 120.0, 2012: 120.6, 2013: 123.0, 2014: 133.0,
+    2015: 143.28, 2016: 155.27, 2017: 167.0, 2018: 177.2, 2019: 188.2,
+    2020: 198.2, 2021: 182.5, 2022: 208.2, 2023: 224.8, 2024: 255.4,
+    2025: 279.2,
+}
+
+CONTRACT_COLUMNS = ['gsis_id', 'year_signed', 'years', 'apy']
+
+def contracts_in_force(seasons, contracts, season_column='season'):
+    # attach to each (gsis_id, season) row the latest contract signed at or
+    # before that season, blanked out once its length has run
+    contracts = contracts.dropna(subset=['gsis_id', 'year_signed', 'apy'])[CONTRACT_COLUMNS]
+    contracts = contracts.astype({'year_signed': 'int64'}).sort_values('year_signed')
+    seasons = seasons.astype({season_column: 'int64'}).sort_values(season_column)
+    merged = pd.merge_asof(seasons, contracts, left_on=season_column, right_on='year_signed',
+                           by='gsis_id', direction='backward')
+    expired = merged[season_column] >= merged['year_signed'] + merged['years']
+    merged.loc[expired, ['year_signed', 'years', 'apy']] = np.nan
+    return merged
+
+@profiling.timed('scrape.contract_history')
 def get_player_contract_history(player_url):
+    import requests
+    from bs4 import BeautifulSoup
     response = requests.get(player_url)
+    profiling.count('pages_fetched')
     soup = BeautifulSoup(response.content, 'html.parser')
     tables = soup.find_all('table')
 
@@ -29,9 +60,13 @@ def get_player_contract_history(player_url):
 
     return None
 
+@profiling.timed('scrape.current_contracts')
 def get_current_contracts():
+    import requests
+    from bs4 import BeautifulSoup
     url = 'https://overthecap.com/cash-flows'
     response = requests.get(url)
+    profiling.count('pages_fetched')
     soup = BeautifulSoup(response.content, 'html.parser')
     tables = soup.find_all('table')
 
@@ -55,9 +90,13 @@ def get_current_contracts():
 
     return None
 
+@profiling.timed('scrape.salary_cap')
 def get_salary_cap_data():
+    import requests
+    from bs4 import BeautifulSoup
     url = 'https://overthecap.com/salary-cap-space'
     response = requests.get(url)
+    profiling.count('pages_fetched')
     soup = BeautifulSoup(response.content, 'html.parser')
     tables = soup.find_all('table')
 
@@ -93,13 +132,13 @@ def get_selected_players_contract_history(player_urls):
                 all_player_data.append(player_df)
             time.sleep(1)
         except Exception as e:
-            print(f"Error processing {url}: {str(e)}")
+            logger.warning("Error processing %s: %s", url, e)
 
     if all_player_data:
         try:
             return pd.concat(all_player_data, ignore_index=True)
         except Exception as e:
-            print(f"Error concatenating player data: {str(e)}")
+            logger.warning("Error concatenating player data: %s", e)
             return None
     else:
         return None
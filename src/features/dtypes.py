@@ -0,0 +1,164 @@
+import logging
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Schema-driven downcasting for the frames coming out of nfl_data_py.
+# Explicit schemas pin the situational columns (down, quarter, yardline, ...)
+# to small integer types and the low-cardinality strings to categoricals;
+# every other column falls back to the generic rules in optimize_dtypes:
+# float64 -> float32, int64 -> smallest integer that fits, and object
+# columns with few distinct values -> category.
+
+PBP_SCHEMA = {
+    'season': 'int16',
+    'week': 'int8',
+    'play_id': 'int32',
+    'down': 'int8',
+    'qtr': 'int8',
+    'quarter_seconds_remaining': 'int16',
+    'half_seconds_remaining': 'int16',
+    'game_seconds_remaining': 'int16',
+    'ydstogo': 'int8',
+    'yardline_100': 'int8',
+    'goal_to_go': 'int8',
+    'yards_gained': 'int16',
+    'posteam_timeouts_remaining': 'int8',
+    'defteam_timeouts_remaining': 'int8',
+    'score_differential': 'int16',
+    'posteam_score': 'int16',
+    'defteam_score': 'int16',
+    'game_id': 'category',
+    'season_type': 'category',
+    'home_team': 'category',
+    'away_team': 'category',
+    'posteam': 'category',
+    'defteam': 'category',
+    'posteam_type': 'category',
+    'side_of_field': 'category',
+    'play_type': 'category',
+    'offense_personnel': 'category',
+    'defense_personnel': 'category',
+    'offense_formation': 'category',
+    'pass_length': 'category',
+    'pass_location': 'category',
+    'run_location': 'category',
+    'run_gap': 'category',
+}
+
+WEEKLY_SCHEMA = {
+    'season': 'int16',
+    'week': 'int8',
+    'player_id': 'category',
+    'player_name': 'category',
+    'player_display_name': 'category',
+    'position': 'category',
+    'position_group': 'category',
+    'recent_team': 'category',
+    'opponent_team': 'category',
+    'season_type': 'category',
+}
+
+WR_SCHEMA = {
+    'season': 'int16',
+    'games': 'int8',
+    'year_signed': 'int16',
+    'season_type': 'category',
+    'team': 'category',
+    'position': 'category',
+}
+
+SCHEMAS = {'pbp': PBP_SCHEMA, 'weekly': WEEKLY_SCHEMA, 'wr': WR_SCHEMA}
+
+# object columns whose distinct/total ratio is below this become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+_INT_RANGES = {
+    'int8': (np.iinfo(np.int8).min, np.iinfo(np.int8).max),
+    'int16': (np.iinfo(np.int16).min, np.iinfo(np.int16).max),
+    'int32': (np.iinfo(np.int32).min, np.iinfo(np.int32).max),
+}
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _to_int(series, dtype):
+    values = pd.to_numeric(series, errors='coerce')
+    low, high = _INT_RANGES[dtype]
+    finite = values.dropna()
+    if len(finite) and (finite.min() < low or finite.max() > high or not (finite % 1 == 0).all()):
+        # out of range or fractional: leave numeric but compact
+        return values.astype('float32') if values.dtype == 'float64' else values
+    if values.isna().any():
+        # nullable integer keeps missing downs/yardlines without a float fallback
+        return values.astype(dtype.capitalize())
+    return values.astype(dtype)
+
+
+def _convert(series, dtype):
+    if dtype == 'category':
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if dtype in _INT_RANGES:
+        if str(series.dtype).lower() == dtype:
+            return series
+        return _to_int(series, dtype)
+    return series.astype(dtype)
+
+
+def _generic(series):
+    dtype = series.dtype
+    if dtype == 'float64':
+        return series.astype('float32')
+    if dtype == 'int64':
+        return pd.to_numeric(series, downcast='integer')
+    if dtype == 'object' and len(series):
+        n_unique = series.nunique(dropna=True)
+        if n_unique / len(series) < CATEGORY_MAX_RATIO:
+            return series.astype('category')
+    return series
+
+
+def optimize_dtypes(df, schema=None, name=None, report=None):
+    # schema: dict of column -> dtype, or a key of SCHEMAS
+    if isinstance(schema, str):
+        name = name or schema
+        schema = SCHEMAS[schema]
+    schema = schema or {}
+    if report is None:
+        report = profiling.is_enabled() or logger.isEnabledFor(logging.INFO)
+    before = frame_nbytes(df) if report else None
+
+    with profiling.stage('dtypes.optimize'):
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            if col in schema:
+                columns[col] = _convert(series, schema[col])
+            else:
+                columns[col] = _generic(series)
+        optimized = pd.DataFrame(columns, index=df.index)
+
+    if report:
+        after = frame_nbytes(optimized)
+        profiling.count('dtype_bytes_saved', before - after)
+        profiling.log_event(
+            'dtypes_optimized', dataset=name, rows=len(df),
+            before_mb=round(before / 2**20, 2), after_mb=round(after / 2**20, 2),
+            ratio=round(before / after, 2) if after else None,
+        )
+    return optimized
+
+
+def memory_report(before_df, after_df):
+    before = frame_nbytes(before_df)
+    after = frame_nbytes(after_df)
+    return {
+        'before_bytes': before,
+        'after_bytes': after,
+        'saved_bytes': before - after,
+        'ratio': before / after if after else None,
+    }
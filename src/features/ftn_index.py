@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Play-level join between play-by-play and FTN charting data.
+#
+# Each play gets one int64 key derived from (game_id, play_id):
+#
+#   ((season * 100 + week) * 10000 + away * 100 + home) * 100000 + play_id
+#
+# with away/home numbered by TEAM_CODES, so PBP and FTN compute the same
+# key without a lookup table. The index for a season is the FTN attribute
+# table sorted by key plus the sorted key array, saved under
+# FTN_INDEX_DIR/<season>/. Joining PBP is then one vectorized searchsorted
+# of the play keys. Charted attributes come back as categoricals and
+# nullable booleans, so formation, motion and alignment filters are cheap
+# masks.
+#
+# FTN charting starts in FTN_FIRST_SEASON; plays of earlier seasons get
+# all-missing ftn_ columns.
+#
+#   plays = join_ftn(pbp)                    # PBP + FTN columns
+#   plays[(plays['ftn_qb_location'] == 'S') & plays['ftn_is_motion']]
+
+FTN_INDEX_DIR = os.environ.get('NFL_QUANT_FTN_DIR', os.path.join('data', 'ftn'))
+INDEX_VERSION = 1
+FTN_FIRST_SEASON = 2022
+
+TEAM_CODES = [
+    'ARI', 'ATL', 'BAL', 'BUF', 'CAR', 'CHI', 'CIN', 'CLE', 'DAL', 'DEN', 'DET',
+    'GB', 'HOU', 'IND', 'JAX', 'KC', 'LA', 'LAC', 'LV', 'MIA', 'MIN', 'NE', 'NO',
+    'NYG', 'NYJ', 'PHI', 'PIT', 'SEA', 'SF', 'TB', 'TEN', 'WAS',
+    # older abbreviations still found in historical game_ids
+    'OAK', 'SD', 'STL', 'LAR', 'JAC',
+]
+_TEAM_INDEX = {team: i for i, team in enumerate(TEAM_CODES)}
+PLAY_ID_RANGE = 100_000
+
+# FTN columns kept on the index -> dtype
+FTN_COLUMNS = {
+    'starting_hash': 'category',
+    'qb_location': 'category',
+    'n_offense_backfield': 'Int8',
+    'n_defense_box': 'Int8',
+    'is_no_huddle': 'boolean',
+    'is_motion': 'boolean',
+    'is_play_action': 'boolean',
+    'is_screen_pass': 'boolean',
+    'is_rpo': 'boolean',
+    'is_trick_play': 'boolean',
+    'is_qb_out_of_pocket': 'boolean',
+    'read_thrown': 'category',
+    'n_blitzers': 'Int8',
+    'n_pass_rushers': 'Int8',
+}
+
+
+def _game_code(game_id):
+    # 'YYYY_WW_AWAY_HOME' -> int; -1 when it does not parse
+    parts = str(game_id).split('_')
+    if len(parts) != 4 or parts[2] not in _TEAM_INDEX or parts[3] not in _TEAM_INDEX:
+        return -1
+    try:
+        season, week = int(parts[0]), int(parts[1])
+    except ValueError:
+        return -1
+    return (season * 100 + week) * 10000 + _TEAM_INDEX[parts[2]] * 100 + _TEAM_INDEX[parts[3]]
+
+
+def play_keys(game_ids, play_ids):
+    # game_ids are parsed once per distinct game, not per play
+    games = pd.Categorical(game_ids)
+    codes = np.array([_game_code(g) for g in games.categories], dtype=np.int64)
+    game_codes = np.where(games.codes >= 0, codes[games.codes], -1)
+    play_ids = pd.to_numeric(pd.Series(play_ids), errors='coerce').to_numpy(dtype=np.float64)
+    valid = (game_codes >= 0) & np.isfinite(play_ids) & (play_ids >= 0) & (play_ids < PLAY_ID_RANGE)
+    return np.where(valid, game_codes * PLAY_ID_RANGE + np.nan_to_num(play_ids).astype(np.int64), -1)
+
+
+class FtnIndex:
+    def __init__(self, keys, attributes):
+        self.keys = keys
+        self.attributes = attributes.reset_index(drop=True)
+
+    @classmethod
+    def empty(cls):
+        # an index with no charted plays, e.g. for a season before FTN
+        return cls(np.empty(0, dtype=np.int64),
+                   pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in FTN_COLUMNS.items()}))
+
+    @classmethod
+    @profiling.timed('ftn.build_index')
+    def from_ftn(cls, ftn):
+        if ftn.empty:
+            return cls.empty()
+        keys = play_keys(ftn['nflverse_game_id'], ftn['nflverse_play_id'])
+        attributes = pd.DataFrame({
+            column: ftn[column].astype(dtype) for column, dtype in FTN_COLUMNS.items() if column in ftn
+        })
+        valid = keys >= 0
+        keys, attributes = keys[valid], attributes[valid]
+        order = np.argsort(keys, kind='stable')
+        keys, attributes = keys[order], attributes.iloc[order]
+        # a play charted twice keeps its last row
+        last = np.append(keys[1:] != keys[:-1], True)
+        return cls(keys[last], attributes[last])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys):
+        # row positions for keys, -1 where the play is not charted
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self.keys):
+            return np.full(len(keys), -1)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where((self.keys[positions] == keys) & (keys >= 0), positions, -1)
+
+    def attributes_for(self, keys, columns=None):
+        # FTN attributes aligned to keys; uncharted plays get missing values
+        columns = list(columns or self.attributes.columns)
+        positions = self.lookup(keys)
+        found = positions >= 0
+        if not found.any():
+            return pd.DataFrame({c: pd.Series(pd.NA, index=range(len(positions)), dtype=self.attributes[c].dtype)
+                                 for c in columns})
+        result = self.attributes[columns].iloc[np.where(found, positions, 0)].reset_index(drop=True)
+        result.loc[~found] = pd.NA
+        return result
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'keys.npy'), self.keys)
+        self.attributes.to_parquet(os.path.join(path, 'attributes.parquet'), index=False)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'plays': len(self.keys)}, f)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != INDEX_VERSION:
+            raise ValueError(f"FTN index at {path} has version {meta['version']}, expected {INDEX_VERSION}")
+        return cls(np.load(os.path.join(path, 'keys.npy')), pd.read_parquet(os.path.join(path, 'attributes.parquet')))
+
+
+def load_ftn_index(season, refresh=False, index_dir=None):
+    # the season's persisted index, built from get_ftn_data when missing
+    from src.features.nfl_data import get_ftn_data
+    if int(season) < FTN_FIRST_SEASON:
+        return FtnIndex.empty()
+    path = os.path.join(index_dir or FTN_INDEX_DIR, str(int(season)))
+    if not refresh and os.path.exists(os.path.join(path, 'meta.json')):
+        return FtnIndex.load(path)
+    index = FtnIndex.from_ftn(get_ftn_data(season))
+    index.save(path)
+    logger.info("Indexed %d FTN plays for %s", len(index), season)
+    return index
+
+
+def _concat_parts(parts):
+    # categoricals of different seasons (or of an empty index) would concat
+    # to object; align them on the union of their categories first
+    for column in parts[0].columns:
+        dtypes = [part[column].dtype for part in parts]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            categories = pd.api.types.union_categoricals([part[column] for part in parts]).categories
+            for part in parts:
+                part[column] = part[column].cat.set_categories(categories)
+    return pd.concat(parts)
+
+
+@profiling.timed('ftn.join')
+def join_ftn(pbp, columns=None, index_dir=None, indexes=None):
+    # PBP with ftn_<column> attributes attached; indexes maps season ->
+    # FtnIndex for data already in memory (seasons missing from it are
+    # treated as uncharted)
+    keys = play_keys(pbp['game_id'], pbp['play_id'])
+    seasons = pbp['season'].to_numpy()
+    parts = []
+    for season in pd.unique(seasons):
+        rows = np.flatnonzero(seasons == season)
+        if indexes is None:
+            index = load_ftn_index(season, index_dir=index_dir)
+        else:
+            index = indexes.get(season)
+            index = FtnIndex.empty() if index is None else index
+        part = index.attributes_for(keys[rows], columns)
+        part.index = rows
+        parts.append(part)
+    attributes = _concat_parts(parts).sort_index().add_prefix('ftn_')
+    attributes.index = pbp.index
+    profiling.count('rows_merged', len(attributes))
+    return pd.concat([pbp, attributes], axis=1)
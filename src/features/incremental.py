@@ -0,0 +1,269 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+from src.analysis.fourth_down_analysis import fourth_down_counts
+from src.analysis.offensive_tendencies import tendency_counts
+from src.features.dtypes import optimize_dtypes
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Weekly incremental refresh for the in-season datasets.
+#
+# Each dataset is stored as one parquet partition per (season, week) under
+# STORE_DIR/<dataset>/<season>/week_<nn>.parquet, with state.json recording
+# which weeks (and, for PBP, which game_ids) have been ingested and a
+# content hash of each. A refresh writes only weeks that are new or whose
+# hash changed since the last run, so a week ingested mid-week and stat
+# corrections to any earlier week are both picked up. nflverse publishes one
+# file per season, so the season file is still downloaded and hashed, but
+# partition writes and the downstream aggregates only touch changed weeks.
+#
+# Aggregates (4th-down counts, tendency counts, per-player season totals)
+# are additive tables: a changed week adds its new counts and subtracts the
+# counts of the partition it replaces, so they never rescan the season.
+#
+# A week's partition, aggregate tables and state are committed together:
+# each is written to a .pending file, then a journal listing the renames
+# is written and replayed. A refresh that dies before the journal leaves
+# the store as it was; one that dies during the renames is completed by the
+# next refresh of the dataset, so no delta is applied twice or lost.
+#
+#   python -m src.features.incremental 2024
+#   python -m src.features.incremental 2024 --datasets pbp
+
+STORE_DIR = os.environ.get('NFL_QUANT_STORE_DIR', os.path.join('data', 'store'))
+
+def _fetch(importer, schema=None):
+    # nfl_data_py is imported on first fetch, not when the module loads
+    def fetch(year):
+        import nfl_data_py as nfl
+        return optimize_dtypes(getattr(nfl, importer)([int(year)]), schema)
+    return fetch
+
+
+FETCHERS = {
+    'weekly': _fetch('import_weekly_data', 'weekly'),
+    'pbp': _fetch('import_pbp_data', 'pbp'),
+    'rosters': _fetch('import_weekly_rosters'),
+}
+
+
+def player_season_totals(weekly):
+    keys = ['player_id', 'season', 'season_type']
+    stats = [col for col in weekly.select_dtypes('number').columns if col not in ('season', 'week')]
+    grouped = weekly.groupby(keys, observed=True)
+    totals = grouped[stats].sum().astype('float64')
+    totals['games'] = grouped.size()
+    return totals.reset_index()
+
+
+# name -> dataset it is built from, additive builder, key columns, count column
+AGGREGATES = {
+    'fourth_down': {'dataset': 'pbp', 'build': fourth_down_counts, 'keys': ['season', 'play_type'], 'count': 'plays'},
+    'tendencies': {
+        'dataset': 'pbp', 'build': tendency_counts,
+        'keys': ['season', 'posteam', 'offense_personnel', 'down', 'yardline_100', 'play_type'], 'count': 'plays',
+    },
+    'player_season_totals': {
+        'dataset': 'weekly', 'build': player_season_totals,
+        'keys': ['player_id', 'season', 'season_type'], 'count': 'games',
+    },
+}
+
+
+def _dataset_dir(dataset, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, dataset)
+
+
+def _partition_path(dataset, year, week, store_dir=None):
+    return os.path.join(_dataset_dir(dataset, store_dir), str(int(year)), f"week_{int(week):02d}.parquet")
+
+
+def _aggregate_path(name, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, 'aggregates', f"{name}.parquet")
+
+
+def read_state(dataset, store_dir=None):
+    path = os.path.join(_dataset_dir(dataset, store_dir), 'state.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def latest_week(dataset, year, store_dir=None):
+    season_state = read_state(dataset, store_dir).get(str(int(year)), {})
+    return season_state.get('last_week')
+
+
+def load_store(dataset, year, weeks=None, store_dir=None):
+    paths = sorted(glob.glob(os.path.join(_dataset_dir(dataset, store_dir), str(int(year)), 'week_*.parquet')))
+    if weeks is not None:
+        wanted = {int(w) for w in weeks}
+        paths = [p for p in paths if int(os.path.basename(p)[5:7]) in wanted]
+    if not paths:
+        return None
+    with profiling.stage(f'store.read.{dataset}'):
+        frames = [pd.read_parquet(p) for p in paths]
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def load_aggregate(name, store_dir=None):
+    path = _aggregate_path(name, store_dir)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def _apply_delta(table, added, removed, keys, count_col):
+    parts = [t for t in (table, added) if t is not None and len(t)]
+    if removed is not None and len(removed):
+        negated = removed.copy()
+        values = [c for c in negated.columns if c not in keys]
+        negated[values] = -negated[values]
+        parts.append(negated)
+    if not parts:
+        return table
+    combined = pd.concat(parts, ignore_index=True)
+    for key in keys:
+        if isinstance(combined[key].dtype, pd.CategoricalDtype):
+            combined[key] = combined[key].astype(object)
+    totals = combined.groupby(keys, dropna=False, sort=True).sum().reset_index()
+    return totals[totals[count_col] != 0].reset_index(drop=True)
+
+
+def _aggregate_tables(dataset, added, removed, store_dir=None):
+    # name -> updated table for the aggregates built from dataset
+    tables = {}
+    for name, spec in AGGREGATES.items():
+        if spec['dataset'] != dataset:
+            continue
+        with profiling.stage(f'aggregate.{name}'):
+            table = load_aggregate(name, store_dir)
+            add = spec['build'](added) if added is not None and len(added) else None
+            remove = spec['build'](removed) if removed is not None and len(removed) else None
+            table = _apply_delta(table, add, remove, spec['keys'], spec['count'])
+            if table is not None:
+                tables[name] = table
+    return tables
+
+
+def _journal_path(dataset, store_dir=None):
+    return os.path.join(_dataset_dir(dataset, store_dir), 'journal.json')
+
+
+def _replay_journal(dataset, store_dir=None):
+    # finish the renames of a commit whose journal was written
+    path = _journal_path(dataset, store_dir)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        renames = json.load(f)
+    for pending, target in renames:
+        if os.path.exists(pending):
+            os.replace(pending, target)
+    os.remove(path)
+
+
+def _commit(dataset, files, store_dir=None):
+    # files: target path -> DataFrame (parquet) or dict (json)
+    renames = []
+    for target, content in files.items():
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        pending = target + '.pending'
+        if isinstance(content, pd.DataFrame):
+            content.to_parquet(pending, index=False)
+        else:
+            with open(pending, 'w') as f:
+                json.dump(content, f, indent=2)
+        renames.append([pending, target])
+    _write_json(renames, _journal_path(dataset, store_dir))
+    _replay_journal(dataset, store_dir)
+
+
+def _season_summary(season_state):
+    if season_state['weeks']:
+        weeks = sorted(int(w) for w in season_state['weeks'])
+        season_state['last_week'] = weeks[-1]
+        game_ids = season_state['weeks'][str(weeks[-1])].get('game_ids')
+        if game_ids:
+            season_state['last_game_id'] = game_ids[-1]
+    return season_state
+
+
+def _partition_hash(rows):
+    # content hash of a week's rows: any changed value, added or dropped row
+    # or column changes it
+    digest = hashlib.sha1(json.dumps([str(c) for c in rows.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@profiling.timed('refresh.dataset')
+def refresh_dataset(dataset, year, store_dir=None, season_data=None):
+    # season_data lets callers pass an already-fetched season frame
+    year = int(year)
+    if season_data is None:
+        with profiling.stage(f'refresh.fetch.{dataset}'):
+            season_data = FETCHERS[dataset](year)
+
+    _replay_journal(dataset, store_dir)
+    state = read_state(dataset, store_dir)
+    season_state = state.get(str(year), {'weeks': {}})
+    state[str(year)] = season_state
+    state_path = os.path.join(_dataset_dir(dataset, store_dir), 'state.json')
+
+    new_rows = []
+    for week in sorted(int(w) for w in season_data['week'].dropna().unique()):
+        rows = season_data[season_data['week'] == week].reset_index(drop=True)
+        digest = _partition_hash(rows)
+        if season_state['weeks'].get(str(week), {}).get('hash') == digest:
+            continue
+        path = _partition_path(dataset, year, week, store_dir)
+        old = pd.read_parquet(path) if str(week) in season_state['weeks'] and os.path.exists(path) else None
+        files = {path: rows}
+        for name, table in _aggregate_tables(dataset, rows, old, store_dir).items():
+            files[_aggregate_path(name, store_dir)] = table
+        entry = {'rows': len(rows), 'hash': digest}
+        if 'game_id' in rows.columns:
+            entry['game_ids'] = sorted(rows['game_id'].astype(str).unique().tolist())
+        season_state['weeks'][str(week)] = entry
+        _season_summary(season_state)
+        files[state_path] = state
+        _commit(dataset, files, store_dir)
+        new_rows.append(rows)
+        profiling.count('weeks_ingested')
+        profiling.count('rows_ingested', len(rows))
+
+    profiling.log_event('refresh', dataset=dataset, season=year, new_weeks=len(new_rows), last_week=season_state.get('last_week'))
+    return pd.concat(new_rows, ignore_index=True) if new_rows else season_data.iloc[0:0]
+
+
+def refresh(year, datasets=('weekly', 'pbp', 'rosters'), store_dir=None):
+    return {dataset: refresh_dataset(dataset, year, store_dir) for dataset in datasets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new weeks of in-season data into the local store.")
+    parser.add_argument('season', type=int)
+    parser.add_argument('--datasets', nargs='+', choices=sorted(FETCHERS), default=['weekly', 'pbp', 'rosters'])
+    parser.add_argument('--store-dir', default=None)
+    args = parser.parse_args()
+
+    for dataset, rows in refresh(args.season, args.datasets, args.store_dir).items():
+        print(f"{dataset}: {len(rows)} new rows, latest week {latest_week(dataset, args.season, args.store_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,88 @@
 # File: src/features/next_gen_data.py
 
+import logging
 import pandas as pd
-import requests 
-from bs4 import BeautifulSoup 
 import re
 import json
 import os
-import urllib.request
-import cv2
 import numpy as np
-from skimage.morphology import skeletonize
-from scipy.spatial.distance import cdist
-from scipy.optimize import linear_sum_assignment
+from src.features.chart_store import ChartStore, chart_key
+from src.features.chart_colors import COMPLETE, INCOMPLETE, YAC, classify_pixels
+from src.features.route_heatmaps import RouteHeatmaps, build_route_heatmaps
+from src.features.route_similarity import RouteSimilarityIndex
+from src.features.route_store import RouteStore, build_route_store
+from src.utils import profiling
 
+logger = logging.getLogger(__name__)
+
+ROUTE_STORE_PATH = '../data/next_gen/route_store'
+HEATMAP_PATH = '../data/next_gen/route_heatmaps'
+CHART_STORE_PATH = '../data/next_gen/chart_store'
+SIMILARITY_PATH = '../data/next_gen/route_similarity.npz'
+
+@profiling.timed('scrape.next_gen')
 def scrape_next_gen_data(teams, seasons, weeks):
+    import requests
+    from bs4 import BeautifulSoup
     pattern = re.compile("charts")
     all_charts = []
 
-    print("Scraping images and html data...")
+    logger.info("Scraping images and html data...")
 
     for team in teams:
         for season in seasons:
-            print(f"Processing {team} for season {season}")
+            logger.debug("Processing %s for season %s", team, season)
             for week in weeks:
                 URL = f"https://nextgenstats.nfl.com/charts/list/route/{team}/{season}/{week}"
                 try:
-                    r = requests.get(URL)
-                    soup = BeautifulSoup(r.content, "html.parser")
-                    script = soup.find_all("script", string=pattern)  # Use 'string' instead of 'text'
+                    with profiling.stage('scrape.next_gen.fetch'):
+                        r = requests.get(URL)
+                    profiling.count('pages_fetched')
+                    with profiling.stage('scrape.next_gen.parse'):
+                        soup = BeautifulSoup(r.content, "html.parser")
+                        script = soup.find_all("script", string=pattern)  # Use 'string' instead of 'text'
                     
                     if len(script) == 0:
-                        print(f"No chart data found for {team} in {season} week {week}")
+                        logger.debug("No chart data found for %s in %s week %s", team, season, week)
                         continue
                     
-                    # Print the first 200 characters of the script content for debugging
-                    print(f"Script content preview for {team} {season} week {week}: {script[0].string[:200]}")
-                    
                     contains_charts = json.loads(str(script[0].string)[33:-131])
 
                     if len(contains_charts["charts"]["charts"]) != 0:
-                        print(f"Found {len(contains_charts['charts']['charts'])} charts for {team} in {season} week {week}")
+                        profiling.count('charts_found', len(contains_charts["charts"]["charts"]))
                         for chart in contains_charts["charts"]["charts"]:
                             chart["team"] = team
                             chart["season"] = season
                             chart["week"] = week
                             all_charts.append(chart)
                     else:
-                        print(f"No charts found for {team} in {season} week {week}")
+                        logger.debug("No charts found for %s in %s week %s", team, season, week)
 
                 except Exception as e:
-                    print(f"Error processing {URL}: {str(e)}")
+                    logger.warning("Error processing %s: %s", URL, e)
                     continue
 
-    print(f"Done scraping. Total charts found: {len(all_charts)}")
+    profiling.log_event('scrape_done', charts=len(all_charts))
     return all_charts
 
-def save_chart_images(charts, base_folder="Route_Charts"):
-    print("Saving chart images...")
+# With a ChartStore, images are saved by content hash (see
+# src/features/chart_store.py) instead of into the base_folder tree.
+@profiling.timed('scrape.save_images')
+def save_chart_images(charts, base_folder="Route_Charts", store=None):
+    import urllib.request
+    logger.info("Saving chart images...")
+    if store is not None:
+        for chart in charts:
+            url = "https:" + chart["extraLargeImg"]
+            try:
+                with urllib.request.urlopen(url) as response:
+                    store.put(chart, response.read())
+                profiling.count('images_saved')
+            except Exception as e:
+                logger.warning("Error saving image for %s: %s", chart_key(chart), e)
+        store.save()
+        logger.info("Done saving images.")
+        return
     for chart in charts:
         team = chart["team"]
         season = chart["season"]
@@ -72,12 +98,15 @@ def save_chart_images(charts, base_folder="Route_Charts"):
         
         try:
             urllib.request.urlretrieve(url, img_file)
+            profiling.count('images_saved')
         except Exception as e:
-            print(f"Error saving image for {name}: {str(e)}")
+            logger.warning("Error saving image for %s: %s", name, e)
     
-    print("Done saving images.")
+    logger.info("Done saving images.")
 
-def clean_chart_image(image_path, clean_path="Cleaned_Route_Charts"):
+@profiling.timed('image.clean')
+def clean_chart_image(image_path, clean_path="Cleaned_Route_Charts", write_name=None):
+    import cv2
     img_name = os.path.basename(image_path).split(".")[0]
     img = cv2.imread(image_path)
 
@@ -89,51 +118,57 @@ def clean_chart_image(image_path, clean_path="Cleaned_Route_Charts"):
         # Assume clean_field function is defined elsewhere
         clean_img = clean_field(temp_name)
         
-        write_path = os.path.join(clean_path, *image_path.split(os.sep)[1:-1])
-        os.makedirs(write_path, exist_ok=True)
+        if write_name is None:
+            write_path = os.path.join(clean_path, *image_path.split(os.sep)[1:-1])
+            write_name = os.path.join(write_path, f"{img_name}.jpeg")
+        os.makedirs(os.path.dirname(write_name), exist_ok=True)
 
         if clean_img is not None:
-            write_name = os.path.join(write_path, f"{img_name}.jpeg")
             cv2.imwrite(write_name, clean_img)
         
         os.remove(temp_name)
     else:
-        print(f"Image {image_path} must be of size (1200, 1200)")
-
-def map_route_locations(image,td):
-    lower_green = np.array([40,100, 100])
-    upper_green = np.array([80, 255, 255])
-
-    lower_white = np.array([230, 230, 230])
-    upper_white = np.array([255, 255, 255])
-
-    lower_gray = np.array([126, 126, 126])
-    upper_gray = np.array([132, 132, 132])
+        logger.warning("Image %s must be of size (1200, 1200)", image_path)
+
+# Skeletonize each mask only inside the bounding boxes of the route strokes.
+# Components come from one 8-connected labelling of the union of the masks;
+# skeletonize only looks at 8-neighbours, so separate components never
+# interact and the result equals skeletonizing the full image.
+def skeletonize_regions(masks, pad=1):
+    import cv2
+    from skimage.morphology import skeletonize
+    masks = [np.asarray(m) != 0 for m in masks]
+    skeletons = [np.zeros(m.shape, dtype=np.uint8) for m in masks]
+    union = np.logical_or.reduce(masks).astype(np.uint8)
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(union, connectivity=8)
+    rows, cols = union.shape
+    for label in range(1, n_labels):
+        x, y, w, h = stats[label, :4]
+        r0, r1 = max(y - pad, 0), min(y + h + pad, rows)
+        c0, c1 = max(x - pad, 0), min(x + w + pad, cols)
+        component = labels[r0:r1, c0:c1] == label
+        for mask, skeleton in zip(masks, skeletons):
+            region = mask[r0:r1, c0:c1] & component
+            if region.any():
+                skeleton[r0:r1, c0:c1] |= skeletonize(region).astype(np.uint8)
+    profiling.count('skeleton_regions', n_labels - 1)
+    return skeletons
+
+@profiling.timed('image.map_route_locations')
+def map_route_locations(image,td,palette='default'):
+    import cv2
+    from scipy.spatial.distance import cdist
+    from scipy.optimize import linear_sum_assignment
     col_names = ["route_type", "x", "y"]
     route_locations = pd.DataFrame(columns = col_names)
 
     image = cv2.imread(image)
     row, col = image.shape[0:2]
-    # Convert BGR to HSV
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-    # Threshold the HSV image to get only green colors
-    mask = cv2.inRange(hsv, lower_green, upper_green)
-    mask2 = cv2.inRange(image, lower_white, upper_white)
-    mask3 = cv2.inRange(image, lower_gray, upper_gray)
-
-    # Bitwise-AND mask and original image
-    c_pixels = cv2.bitwise_and(image, image, mask=mask2)
-    c_pixels = c_pixels.clip(0,1)
-    ske_c = skeletonize(c_pixels[:,:,1]).astype(np.uint8)
-    
-    yac_pixels = cv2.bitwise_and(image, image, mask=mask)
-    yac_pixels = cv2.cvtColor(yac_pixels, cv2.COLOR_HSV2BGR).clip(0,1)
-    ske_yac = skeletonize(yac_pixels[:,:,2]).astype(np.uint8)
-    
-    inc_pixels = cv2.bitwise_and(image, image, mask=mask3)
-    inc_pixels = inc_pixels.clip(0,1)
-    ske_inc = skeletonize(inc_pixels[:,:,1]).astype(np.uint8)
+
+    # One lookup-table pass labels complete / YAC / incomplete pixels
+    # (see src/features/chart_colors.py for the colour ranges per palette)
+    labels = classify_pixels(image, palette)
+    ske_c, ske_yac, ske_inc = skeletonize_regions([labels & COMPLETE, labels & YAC, labels & INCOMPLETE])
     
 
     x,y = np.where(ske_c != 0)
@@ -197,7 +232,7 @@ def map_route_locations(image,td):
             td_row
 
         except:
-            print('couldn''t find TD')
+            logger.warning('couldn''t find TD')
             break
 
         td_rows =list(td_row)
@@ -233,9 +268,33 @@ def map_route_locations(image,td):
     
     return route_locations
 
-def process_next_gen_data(charts, base_folder="Route_Charts", clean_folder="Cleaned_Route_Charts"):
-    print("Processing Next Gen data...")
-    routes = pd.DataFrame(columns=["game_id", "team", "week", "name", "position", "route_type", "x", "y"])
+def _store_route_data(store, chart, palette):
+    # processed routes for a stored chart, reusing the results of the same
+    # or a visually identical image when there are any
+    sha = store.sha_for(chart)
+    if sha is None:
+        logger.warning("Chart %s is not in the chart store", chart_key(chart))
+        return None
+    route_data = store.load_results(sha, chart["touchdowns"])
+    if route_data is not None:
+        return route_data
+    image_path = store.blob_path(sha)
+    # raw 1200x1200 charts are cropped/cleaned; 1200x680 blobs already are
+    if store.shape(sha) == (1200, 1200):
+        clean_path = store.cleaned_path(sha)
+        if not os.path.exists(clean_path):
+            clean_chart_image(image_path, write_name=clean_path)
+        if not os.path.exists(clean_path):
+            return None
+        image_path = clean_path
+    route_data = map_route_locations(image_path, chart["touchdowns"], palette)
+    store.save_results(sha, route_data, chart["touchdowns"])
+    return route_data
+
+@profiling.timed('image.process_next_gen')
+def process_next_gen_data(charts, base_folder="Route_Charts", clean_folder="Cleaned_Route_Charts", palette="default", store=None):
+    logger.info("Processing Next Gen data...")
+    routes = pd.DataFrame(columns=["game_id", "team", "season", "week", "name", "position", "route_type", "x", "y"])
 
     for chart in charts:
         team = chart["team"]
@@ -243,17 +302,21 @@ def process_next_gen_data(charts, base_folder="Route_Charts", clean_folder="Clea
         week = chart["week"]
         name = f"{chart['lastName']}_{chart['firstName']}_{chart['position']}"
 
-        image_path = os.path.join(base_folder, team, season, week, "images", f"{name}.jpeg")
-        clean_chart_image(image_path, clean_folder)
+        if store is not None:
+            route_data = _store_route_data(store, chart, palette)
+        else:
+            image_path = os.path.join(base_folder, team, season, week, "images", f"{name}.jpeg")
+            clean_chart_image(image_path, clean_folder)
 
-        clean_image_path = os.path.join(clean_folder, team, season, week, "images", f"{name}.jpeg")
-        
-        if os.path.exists(clean_image_path):
-            route_data = map_route_locations(clean_image_path, chart["touchdowns"])
+            clean_image_path = os.path.join(clean_folder, team, season, week, "images", f"{name}.jpeg")
+            route_data = map_route_locations(clean_image_path, chart["touchdowns"], palette) if os.path.exists(clean_image_path) else None
+
+        if route_data is not None:
             
             game_data = pd.DataFrame({
                 "game_id": [chart["gameId"]],
                 "team": [team],
+                "season": [season],
                 "week": [week],
                 "name": [f"{chart['firstName']} {chart['lastName']}"],
                 "position": [chart["position"]]
@@ -262,23 +325,48 @@ def process_next_gen_data(charts, base_folder="Route_Charts", clean_folder="Clea
             game_data = pd.concat([game_data] * len(route_data), ignore_index=True)
             route_df = pd.concat([game_data, route_data], axis=1)
             routes = routes.append(route_df, ignore_index=True)
+            profiling.count('charts_processed')
+            profiling.count('route_points', len(route_data))
 
-    print("Done processing.")
+    logger.info("Done processing.")
     return routes
 
-def load_next_gen_data():
+# With a memory-mapped route store present, pass_data is a RouteStore and
+# per-player lookups are slices instead of scans of the full CSV.
+@profiling.timed('load.next_gen')
+def load_next_gen_data(use_store=True):
     try:
-        pass_data = pd.read_csv('../data/next_gen/all_pass_locations.csv')
         game_data = pd.read_csv('../data/next_gen/pass_and_game_data.csv')
+        if use_store and os.path.exists(os.path.join(ROUTE_STORE_PATH, 'meta.json')):
+            return RouteStore(ROUTE_STORE_PATH), game_data
+        pass_data = pd.read_csv('../data/next_gen/all_pass_locations.csv')
         return pass_data, game_data
     except FileNotFoundError:
-        print("Next Gen data files not found. Please run the scraping and processing functions first.")
+        logger.warning("Next Gen data files not found. Please run the scraping and processing functions first.")
         return None, None
 
+# Binned target-location grids; see src/features/route_heatmaps.py
+@profiling.timed('load.route_heatmaps')
+def load_route_heatmaps():
+    if not os.path.exists(os.path.join(HEATMAP_PATH, 'meta.json')):
+        logger.warning("Route heatmaps not found. Please run the processing functions first.")
+        return None
+    return RouteHeatmaps.load(HEATMAP_PATH)
+
+@profiling.timed('load.route_similarity')
+def load_route_similarity():
+    if not os.path.exists(SIMILARITY_PATH):
+        logger.warning("Route similarity index not found. Please run the processing functions first.")
+        return None
+    return RouteSimilarityIndex.load(SIMILARITY_PATH)
+
 def analyze_next_gen_data(pass_data, game_data, player_name):
     if pass_data is None or game_data is None:
         return None, None
-    player_passes = pass_data[pass_data['name'] == player_name]
+    if isinstance(pass_data, RouteStore):
+        player_passes = pass_data.player(player_name)
+    else:
+        player_passes = pass_data[pass_data['name'] == player_name]
     player_games = game_data[game_data['name'] == player_name]
     return player_passes, player_games
 
@@ -288,14 +376,19 @@ def main():
     weeks = ["1", "2", "3", ..., "17", "wild-card", "divisional", "conference", "super-bowl"]  # Add all weeks
 
     charts = scrape_next_gen_data(teams, seasons, weeks)
-    save_chart_images(charts)
-    routes = process_next_gen_data(charts)
+    store = ChartStore(CHART_STORE_PATH)
+    save_chart_images(charts, store=store)
+    routes = process_next_gen_data(charts, store=store)
 
     # Save the processed data
     routes.to_csv("../data/next_gen/all_pass_locations.csv", index=False)
+    build_route_store(routes, ROUTE_STORE_PATH)
+    heatmaps = build_route_heatmaps(RouteStore(ROUTE_STORE_PATH))
+    heatmaps.save(HEATMAP_PATH)
+    RouteSimilarityIndex.from_heatmaps(heatmaps).save(SIMILARITY_PATH)
     
     # You may want to create game_data separately or extract it from the routes DataFrame
-    game_data = routes[["game_id", "team", "week", "name", "position"]].drop_duplicates()
+    game_data = routes[["game_id", "team", "season", "week", "name", "position"]].drop_duplicates()
     game_data.to_csv("../data/next_gen/pass_and_game_data.csv", index=False)
 
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
-import nfl_data_py as nfl
+import logging
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
+from src.features.cache import cached_frame, read_cached, write_cached
+from src.features.contracts import CONTRACT_COLUMNS, LEAGUE_SALARY_CAP, contracts_in_force
+from src.features.dtypes import optimize_dtypes
+from src.features.incremental import load_store, refresh_dataset
+from src.utils import profiling
 
+logger = logging.getLogger(__name__)
+
+@profiling.timed('load.seasonal')
 def get_seasonal_data(year):
+    import nfl_data_py as nfl
     year_list = [int(year)]
     df = nfl.import_seasonal_data(year_list)
     id_df = nfl.import_ids()[['gsis_id', 'name']]
@@ -11,58 +18,113 @@ def get_seasonal_data(year):
 
     salary_df = nfl.import_contracts()
     if 'year_signed' not in salary_df.columns:
-        print("'year_signed' column not found in salary data")
+        logger.warning("'year_signed' column not found in salary data")
     df = pd.merge(df, salary_df[['player', 'year_signed', 'value']], left_on=['name', 'season'], right_on=['player', 'year_signed'], how='left', suffixes=('_left', '_right'))
 
     cols = df.columns.tolist()
     cols = cols[-1:] + cols[:-2]
     return df[cols].sort_values('name')
 
-def get_wr_data(years):
-    seasonal_data = nfl.import_seasonal_data(years)
-    
-    wr_data = seasonal_data[
-        (seasonal_data['receptions'].notna()) & 
-        (seasonal_data['receiving_yards'].notna()) & 
-        (seasonal_data['targets'].notna()) &
-        (seasonal_data['receptions'] > 0)
+def _years_key(years):
+    years = sorted(int(y) for y in years)
+    if years == list(range(years[0], years[-1] + 1)):
+        return f"{years[0]}-{years[-1]}"
+    return '_'.join(str(y) for y in years)
+
+# wr_data joins contracts and player ids, which nflverse updates daily, so
+# a cached build is only reused for WR_DATA_MAX_AGE seconds
+WR_DATA_MAX_AGE = 24 * 3600
+
+@profiling.timed('load.wr_data')
+def get_wr_data(years, cache=True, refresh=False, max_age=WR_DATA_MAX_AGE):
+    if cache:
+        return cached_frame('wr_data', _years_key(years), lambda: _load_wr_data(years), refresh=refresh,
+                            max_age=max_age)
+    return _load_wr_data(years)
+
+def _receiver_rows(seasonal, player_ids):
+    # seasons with at least one reception, with the player's name and build
+    wr_data = seasonal[
+        (seasonal['receptions'].notna()) & 
+        (seasonal['receiving_yards'].notna()) & 
+        (seasonal['targets'].notna()) &
+        (seasonal['receptions'] > 0)
     ]
-
-    player_ids = nfl.import_ids()
     wr_data = pd.merge(wr_data, player_ids[['gsis_id', 'name', 'weight', 'height', 'age']], left_on='player_id', right_on='gsis_id', how='left')
+    wr_data['availability'] = wr_data['games'] / 17
+    return wr_data
+
+def _load_wr_data(years):
+    import nfl_data_py as nfl
+    seasonal_data = nfl.import_seasonal_data(years)
+    wr_data = _receiver_rows(seasonal_data, nfl.import_ids())
     
     salary_data = nfl.import_contracts()
     wr_data = pd.merge(wr_data, salary_data[['player', 'year_signed', 'value', 'apy', 'team']], 
                        left_on=['name', 'season'], right_on=['player', 'year_signed'], how='left')
+    profiling.count('rows_merged', len(wr_data))
 
-    wr_data['availability'] = wr_data['games'] / 17
     wr_data = wr_data.dropna(subset=['apy'])  # Remove players without salary data
     
-    return wr_data
-
-# Example usage
-years = range(2013, 2024)
-wr_data = get_wr_data(years)
-print(wr_data.head())
-
-def get_weekly_data(year):
-    return nfl.import_weekly_data([int(year)])
-
-def get_play_by_play_data(year):
-    return nfl.import_pbp_data([int(year)])
-
-def get_weekly_roster_data(year):
+    return optimize_dtypes(wr_data.reset_index(drop=True), 'wr')
+
+# every receiver of a regular season, with or without a contract signed
+# that year (get_wr_data keeps only the rows with one)
+@profiling.timed('load.receiver_season')
+def get_receiver_season(year, refresh=False):
+    import nfl_data_py as nfl
+    seasonal = get_regular_seasons([year], refresh)
+    return optimize_dtypes(_receiver_rows(seasonal, nfl.import_ids()), 'wr')
+
+# incremental=True ingests only new weeks into the local store (see
+# src/features/incremental.py) and returns the stored season
+@profiling.timed('load.weekly')
+def get_weekly_data(year, cache=True, refresh=False, incremental=False):
+    import nfl_data_py as nfl
+    if incremental:
+        refresh_dataset('weekly', year)
+        return load_store('weekly', year)
+    load = lambda: optimize_dtypes(nfl.import_weekly_data([int(year)]), 'weekly')
+    if cache:
+        return cached_frame('weekly', int(year), load, refresh=refresh)
+    return load()
+
+@profiling.timed('load.play_by_play')
+def get_play_by_play_data(year, cache=True, refresh=False, incremental=False):
+    import nfl_data_py as nfl
+    if incremental:
+        refresh_dataset('pbp', year)
+        return load_store('pbp', year)
+    load = lambda: optimize_dtypes(nfl.import_pbp_data([int(year)]), 'pbp')
+    if cache:
+        return cached_frame('pbp', int(year), load, refresh=refresh)
+    return load()
+
+@profiling.timed('load.weekly_roster')
+def get_weekly_roster_data(year, incremental=False):
+    import nfl_data_py as nfl
+    if incremental:
+        refresh_dataset('rosters', year)
+        return load_store('rosters', year)
     return nfl.import_weekly_rosters([int(year)])
 
+@profiling.timed('load.ngs')
 def get_ngs_data(stat_type, year):
+    import nfl_data_py as nfl
     return nfl.import_ngs_data(stat_type, [int(year)])
 
+@profiling.timed('load.ftn')
 def get_ftn_data(year):
+    import nfl_data_py as nfl
     return nfl.import_ftn_data([int(year)])
 
+@profiling.timed('scrape.salary_cap')
 def get_salary_cap_data():
+    import requests
+    from bs4 import BeautifulSoup
     url = 'https://overthecap.com/salary-cap-space'
     response = requests.get(url)
+    profiling.count('pages_fetched')
     soup = BeautifulSoup(response.content, 'html.parser')
     tables = soup.find_all('table')
 
@@ -86,7 +148,9 @@ def get_salary_cap_data():
 
     return None
 
+@profiling.timed('load.combined')
 def get_combined_data(year):
+    import nfl_data_py as nfl
     seasonal_data = nfl.import_seasonal_data([year])
     ids = nfl.import_ids()[['gsis_id', 'name']]
     seasonal_data = pd.merge(seasonal_data, ids, left_on='player_id', right_on='gsis_id', how='left')
@@ -96,6 +160,7 @@ def get_combined_data(year):
 
     combined_data = pd.merge(seasonal_data, salary_data, left_on=['name', 'season'], right_on=['player', 'year_signed'], how='left', suffixes=('_season', '_salary'))
     combined_data = pd.merge(combined_data, salary_cap_data, left_on='team', right_on='Team', how='left')
+    profiling.count('rows_merged', len(combined_data))
 
     return combined_data
 
@@ -104,17 +169,58 @@ def filter_qbs_early_career(data, years=3):
     early_career_qbs = qbs[qbs['season'] - qbs['draft_year'] <= years]
     return early_career_qbs
 
-def calculate_roi(data):
-    data['cap_pct'] = data['value'] / data['Cap Space']
-    data['roi'] = data['passing_yards'] / data['value']
-    return data
+def calculate_roi(data, cost='apy', cap='salary_cap'):
+    # passing yards per $M and cost as a share of the cap, on a new frame
+    return data.assign(cap_pct=data[cost] / data[cap], roi=data['passing_yards'] / data[cost])
+
+@profiling.timed('load.regular_seasons')
+def get_regular_seasons(years, refresh=False):
+    # one cached file per season; the missing seasons are fetched together
+    import nfl_data_py as nfl
+    years = [int(y) for y in years]
+    frames = {} if refresh else {year: read_cached('seasonal_reg', year) for year in years}
+    missing = [year for year in years if frames.get(year) is None]
+    if missing:
+        fetched = nfl.import_seasonal_data(missing, s_type='REG')
+        for year, frame in fetched.groupby('season'):
+            frames[int(year)] = frame.reset_index(drop=True)
+            write_cached(frames[int(year)], 'seasonal_reg', int(year))
+    return pd.concat([frames[year] for year in years if frames.get(year) is not None], ignore_index=True)
+
+QB_PANEL_COLUMNS = [
+    'gsis_id', 'season', 'name', 'draft_year', 'years_since_draft', 'passing_yards', 'attempts',
+    'yards_per_attempt', 'any_a', 'apy', 'year_signed', 'rookie_contract', 'salary_cap', 'cap_pct', 'roi',
+]
+
+@profiling.timed('analysis.qb_roi_panel')
+def build_qb_roi_panel(years=range(2000, 2025), early_career=3, refresh=False):
+    # early-career QB seasons keyed by (gsis_id, season): contract in force,
+    # share of the league cap, passing yards per $M and passing efficiency
+    import nfl_data_py as nfl
+    seasonal = get_regular_seasons(years, refresh)
+    ids = cached_frame('ids', 'players', lambda: nfl.import_ids()[['gsis_id', 'name', 'position', 'draft_year']], refresh=refresh)
+    contracts = cached_frame('contracts', 'terms', lambda: nfl.import_contracts()[CONTRACT_COLUMNS], refresh=refresh)
+
+    qbs = ids[ids['position'] == 'QB'].dropna(subset=['gsis_id']).drop_duplicates('gsis_id')
+    panel = seasonal.merge(qbs, left_on='player_id', right_on='gsis_id', how='inner')
+    panel = filter_qbs_early_career(panel, early_career)
+    panel = contracts_in_force(panel, contracts)
+    panel['years_since_draft'] = panel['season'] - panel['draft_year']
+    panel['rookie_contract'] = panel['year_signed'] == panel['draft_year']
+    panel['salary_cap'] = panel['season'].map(LEAGUE_SALARY_CAP)
+    panel = calculate_roi(panel)
+
+    attempts = panel['attempts'].where(panel['attempts'] > 0)
+    dropbacks = (panel['attempts'] + panel['sacks']).where(panel['attempts'] > 0)
+    panel['yards_per_attempt'] = panel['passing_yards'] / attempts
+    panel['any_a'] = (panel['passing_yards'] + 20 * panel['passing_tds'] - 45 * panel['interceptions']
+                      - panel['sack_yards']) / dropbacks
+    profiling.count('rows_merged', len(panel))
+    return panel[QB_PANEL_COLUMNS].set_index(['gsis_id', 'season']).sort_index()
 
 def main():
-    year = 2023
-    combined_data = get_combined_data(year)
-    early_career_qbs = filter_qbs_early_career(combined_data)
-    roi_data = calculate_roi(early_career_qbs)
-    print(roi_data[['name', 'team', 'season', 'passing_yards', 'value', 'cap_pct', 'roi']])
+    panel = build_qb_roi_panel()
+    print(panel[['name', 'passing_yards', 'apy', 'cap_pct', 'roi', 'any_a']].to_string())
 
 if __name__ == "__main__":
     main()
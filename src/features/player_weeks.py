@@ -0,0 +1,129 @@
+import argparse
+import logging
+import os
+import numpy as np
+import pandas as pd
+from src.features.nfl_data import get_ngs_data, get_weekly_data, get_weekly_roster_data
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Wide player-week table: weekly stats with Next Gen Stats (passing,
+# rushing, receiving) and the weekly roster entry aligned on
+# (player_id, season, week).
+#
+# Weekly stats are the spine: one row per player-week. Player IDs from all
+# sources are mapped to one integer code per season, and every other source
+# is attached with an as-of join on (code, week). A player missing from a
+# source in some week (NGS only lists qualifying players) gets that
+# source's latest earlier week in the same season; <prefix>_week records
+# which week was used, and max_staleness caps how far back it may reach.
+# Seasons are built and written one at a time, so memory is bounded by a
+# single season.
+#
+#   table = player_week_table(2023)
+#   build_player_weeks(range(2014, 2024))     # data/player_weeks/<season>.parquet
+#   python -m src.features.player_weeks 2014 2023
+
+PLAYER_WEEKS_DIR = os.environ.get('NFL_QUANT_PLAYER_WEEKS_DIR', os.path.join('data', 'player_weeks'))
+NGS_TYPES = ['passing', 'rushing', 'receiving']
+ROSTER_COLUMNS = ['team', 'position', 'depth_chart_position', 'status', 'jersey_number']
+# identifying columns of the NGS frames, dropped in favour of the spine's
+NGS_ID_COLUMNS = ['season', 'season_type', 'week', 'player_gsis_id', 'player_jersey_number']
+
+
+def _player_codes(frames):
+    # one integer code per player ID seen in any source this season
+    ids = [frame[column].dropna().astype(str).to_numpy() for frame, column in frames]
+    return pd.Index(pd.unique(np.concatenate(ids)))
+
+
+def _keyed(frame, id_column, codes, columns, prefix):
+    # (player_key, week, <prefix>_week, <prefix>_<columns>) sorted on week,
+    # one row per player-week
+    keyed = pd.DataFrame({
+        'player_key': codes.get_indexer(frame[id_column].astype(str)).astype(np.int32),
+        'week': frame['week'].to_numpy(dtype=np.int64),
+    })
+    keyed[f"{prefix}_week"] = keyed['week']
+    for column in columns:
+        keyed[f"{prefix}_{column}"] = frame[column].to_numpy()
+    keyed = keyed[keyed['player_key'] >= 0]
+    keyed = keyed.drop_duplicates(['player_key', 'week'], keep='last')
+    return keyed.sort_values('week', kind='stable')
+
+
+def _asof(spine, right, max_staleness):
+    return pd.merge_asof(spine, right, on='week', by='player_key', direction='backward',
+                         tolerance=max_staleness)
+
+
+@profiling.timed('load.player_week_table')
+def player_week_table(season, max_staleness=None, weekly=None, ngs=None, rosters=None):
+    # weekly / ngs ({stat_type: frame}) / rosters default to the loaders in
+    # nfl_data; pass frames to join data that is already in memory
+    weekly = get_weekly_data(season) if weekly is None else weekly
+    if ngs is None:
+        ngs = {stat_type: get_ngs_data(stat_type, season) for stat_type in NGS_TYPES}
+    rosters = get_weekly_roster_data(season) if rosters is None else rosters
+    # NGS week 0 rows are season totals, not a week
+    ngs = {stat_type: frame[frame['week'] > 0] for stat_type, frame in ngs.items()}
+    roster_id = 'gsis_id' if 'gsis_id' in rosters else 'player_id'
+
+    sources = [(weekly, 'player_id'), (rosters, roster_id)] + [(frame, 'player_gsis_id') for frame in ngs.values()]
+    codes = _player_codes(sources)
+
+    spine = weekly[weekly['player_id'].notna()].reset_index(drop=True)
+    spine['player_key'] = codes.get_indexer(spine['player_id'].astype(str)).astype(np.int32)
+    spine['week'] = spine['week'].astype(np.int64)
+    table = spine.sort_values('week', kind='stable')
+
+    for stat_type, frame in ngs.items():
+        columns = [c for c in frame.select_dtypes('number').columns if c not in NGS_ID_COLUMNS]
+        table = _asof(table, _keyed(frame, 'player_gsis_id', codes, columns, f"ngs_{stat_type}"), max_staleness)
+    columns = [c for c in ROSTER_COLUMNS if c in rosters]
+    table = _asof(table, _keyed(rosters, roster_id, codes, columns, 'roster'), max_staleness)
+
+    profiling.count('rows_merged', len(table))
+    table = table.sort_values(['player_key', 'week'], kind='stable').drop(columns='player_key')
+    return table.reset_index(drop=True)
+
+
+@profiling.timed('load.player_weeks')
+def build_player_weeks(years, out_dir=None, max_staleness=None):
+    # one parquet file per season; returns the paths written
+    out_dir = out_dir or PLAYER_WEEKS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for season in years:
+        table = player_week_table(season, max_staleness)
+        path = os.path.join(out_dir, f"{int(season)}.parquet")
+        tmp_path = path + '.tmp'
+        table.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        logger.info("Wrote %d player-weeks for %s to %s", len(table), season, path)
+        paths.append(path)
+        del table
+    return paths
+
+
+def load_player_weeks(years, out_dir=None, columns=None):
+    out_dir = out_dir or PLAYER_WEEKS_DIR
+    return pd.concat(
+        [pd.read_parquet(os.path.join(out_dir, f"{int(season)}.parquet"), columns=columns) for season in years],
+        ignore_index=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the wide player-week table, one file per season.")
+    parser.add_argument('first_season', type=int)
+    parser.add_argument('last_season', type=int)
+    parser.add_argument('--max-staleness', type=int, default=None, help="weeks an as-of match may reach back")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+    build_player_weeks(range(args.first_season, args.last_season + 1), args.out, args.max_staleness)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.features.route_store import RouteStore
+from src.utils import profiling
+
+# Pre-binned 2-D heatmaps of Next Gen route points.
+#
+# Points are binned once into a fixed field grid (1-yard cells, x across the
+# field from the middle, y downfield from the line of scrimmage) and stored
+# sparsely per (name, team, season, week, route_type) key: one row per
+# non-empty cell with its count. A season heatmap, a team roll-up or a
+# receiver comparison is then a bincount over the selected entries rather
+# than a rescan of the route points, and adding a new week only appends
+# entries.
+#
+#   heatmaps = build_route_heatmaps(routes)
+#   heatmaps.grid(name='Justin Jefferson', season='2023')
+#   heatmaps.rollup('team', route_type='COMPLETE')
+
+HEATMAP_VERSION = 1
+KEY_COLUMNS = ['name', 'team', 'season', 'week', 'route_type']
+
+# field extent in yards; points outside are clamped into the edge cells
+GRID = {'x_min': -27.0, 'x_max': 27.0, 'y_min': -10.0, 'y_max': 75.0, 'cell': 1.0}
+
+# named field zones (x_min, x_max, y_min, y_max) in yards, used by zone_totals
+ZONES = {
+    'behind_los': (-27, 27, -10, 0),
+    'short_left': (-27, -9, 0, 10),
+    'short_middle': (-9, 9, 0, 10),
+    'short_right': (9, 27, 0, 10),
+    'intermediate_left': (-27, -9, 10, 20),
+    'intermediate_middle': (-9, 9, 10, 20),
+    'intermediate_right': (9, 27, 10, 20),
+    'deep_left': (-27, -9, 20, 75),
+    'deep_middle': (-9, 9, 20, 75),
+    'deep_right': (9, 27, 20, 75),
+}
+
+
+def grid_shape(grid=GRID):
+    nx = int(round((grid['x_max'] - grid['x_min']) / grid['cell']))
+    ny = int(round((grid['y_max'] - grid['y_min']) / grid['cell']))
+    return ny, nx
+
+
+def bin_points(x, y, grid=GRID):
+    # flat cell index (row-major, y then x) for each point
+    ny, nx = grid_shape(grid)
+    ix = np.floor((np.asarray(x, dtype=np.float64) - grid['x_min']) / grid['cell'])
+    iy = np.floor((np.asarray(y, dtype=np.float64) - grid['y_min']) / grid['cell'])
+    ix = np.clip(ix, 0, nx - 1).astype(np.int64)
+    iy = np.clip(iy, 0, ny - 1).astype(np.int64)
+    return iy * nx + ix
+
+
+def _encode(values, lookup):
+    inverse, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapping = np.array([lookup.setdefault(str(u), len(lookup)) for u in uniques], dtype=np.int64)
+    return mapping[inverse]
+
+
+def _reduce(columns, counts=None):
+    # sum counts over identical rows of integer code columns; rows are
+    # packed into one int64 so the reduction is a single np.unique
+    names = list(columns)
+    dims = [int(columns[name].max()) + 1 for name in names]
+    packed = np.ravel_multi_index([columns[name] for name in names], dims)
+    unique, inverse = np.unique(packed, return_inverse=True)
+    summed = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+    reduced = dict(zip(names, np.unravel_index(unique, dims)))
+    reduced['count'] = summed
+    return reduced
+
+
+def _chunks(routes, chunksize):
+    if isinstance(routes, RouteStore):
+        columns = [c for c in KEY_COLUMNS + ['x', 'y'] if c in routes.columns]
+        for start in range(0, len(routes), chunksize):
+            yield routes.slice(start, min(start + chunksize, len(routes)), columns)
+    elif isinstance(routes, pd.DataFrame):
+        yield routes
+    else:
+        yield from routes
+
+
+@profiling.timed('heatmaps.build')
+def build_route_heatmaps(routes, grid=None, chunksize=1_000_000):
+    # routes: a route-point DataFrame, an iterable of chunks, or a RouteStore
+    grid = dict(grid or GRID)
+    lookups = {col: {} for col in KEY_COLUMNS}
+    parts = []
+    for chunk in _chunks(routes, chunksize):
+        chunk = chunk.dropna(subset=['x', 'y'])
+        if not len(chunk):
+            continue
+        codes = {
+            col: _encode(chunk[col] if col in chunk.columns else pd.Series([''] * len(chunk)), lookups[col])
+            for col in KEY_COLUMNS
+        }
+        codes['cell'] = bin_points(chunk['x'].to_numpy(), chunk['y'].to_numpy(), grid)
+        parts.append(_reduce(codes))
+        profiling.count('heatmap_points', len(chunk))
+
+    if not parts:
+        raise ValueError("No route points to bin")
+    entries = parts[0]
+    if len(parts) > 1:
+        columns = {col: np.concatenate([part[col] for part in parts]) for col in KEY_COLUMNS + ['cell']}
+        entries = _reduce(columns, np.concatenate([part['count'] for part in parts]))
+
+    categories = {col: list(lookups[col]) for col in KEY_COLUMNS}
+    return RouteHeatmaps._from_entries(entries, categories, grid)
+
+
+class RouteHeatmaps:
+    def __init__(self, key_codes, categories, key_index, cells, counts, grid=None):
+        # key_codes: column -> code array, one row per key
+        # key_index, cells, counts: one row per non-empty (key, cell)
+        self.key_codes = key_codes
+        self.categories = categories
+        self.key_index = key_index
+        self.cells = cells
+        self.counts = counts
+        self.grid_spec = dict(grid or GRID)
+        self.shape = grid_shape(self.grid_spec)
+        self.n_cells = self.shape[0] * self.shape[1]
+
+    @classmethod
+    def _from_entries(cls, entries, categories, grid):
+        # entries: column -> array for KEY_COLUMNS codes, cell and count,
+        # already reduced to one row per (key, cell)
+        dims = [len(categories[col]) for col in KEY_COLUMNS]
+        packed = np.ravel_multi_index([entries[col] for col in KEY_COLUMNS], dims)
+        unique, key_id = np.unique(packed, return_inverse=True)
+        order = np.lexsort((entries['cell'], key_id))
+        n_cells = grid_shape(grid)[0] * grid_shape(grid)[1]
+        key_codes = {
+            col: codes.astype(np.min_scalar_type(max(len(categories[col]) - 1, 0)))
+            for col, codes in zip(KEY_COLUMNS, np.unravel_index(unique, dims))
+        }
+        counts = entries['count'][order]
+        return cls(
+            key_codes, categories,
+            key_id[order].astype(np.int32),
+            entries['cell'][order].astype(np.min_scalar_type(n_cells - 1)),
+            counts.astype(np.uint16 if counts.max() <= np.iinfo(np.uint16).max else np.uint32),
+            grid,
+        )
+
+    def __len__(self):
+        return len(self.key_index)
+
+    @property
+    def n_keys(self):
+        return len(self.key_codes[KEY_COLUMNS[0]])
+
+    def keys(self):
+        return pd.DataFrame({
+            col: pd.Categorical.from_codes(self.key_codes[col].astype(np.int64), categories=self.categories[col])
+            for col in KEY_COLUMNS
+        })
+
+    def key_mask(self, **filters):
+        # filters: column=value or column=[values]; values compare as strings
+        mask = np.ones(self.n_keys, dtype=bool)
+        for col, wanted in filters.items():
+            if col not in self.key_codes:
+                raise KeyError(f"Unknown heatmap key column: {col}")
+            if isinstance(wanted, (str, int, np.integer)):
+                wanted = [wanted]
+            lookup = {value: i for i, value in enumerate(self.categories[col])}
+            codes = [lookup[str(w)] for w in wanted if str(w) in lookup]
+            mask &= np.isin(self.key_codes[col], codes)
+        return mask
+
+    def grid(self, **filters):
+        # summed counts over all keys matching filters, shape (ny, nx)
+        entries = self.key_mask(**filters)[self.key_index] if filters else slice(None)
+        flat = np.bincount(self.cells[entries].astype(np.int64), weights=self.counts[entries], minlength=self.n_cells)
+        return flat.astype(np.int64).reshape(self.shape)
+
+    def rollup(self, by, **filters):
+        # one grid per distinct value of the `by` column(s): returns
+        # (labels DataFrame, array of shape (n_groups, ny, nx))
+        by = [by] if isinstance(by, str) else list(by)
+        key_mask = self.key_mask(**filters)
+        group_of_key, labels = pd.MultiIndex.from_arrays(
+            [self.key_codes[col][key_mask] for col in by], names=by
+        ).factorize()
+        key_group = np.full(self.n_keys, -1, dtype=np.int64)
+        key_group[key_mask] = group_of_key
+
+        entry_group = key_group[self.key_index]
+        keep = entry_group >= 0
+        flat = np.bincount(
+            entry_group[keep] * self.n_cells + self.cells[keep],
+            weights=self.counts[keep], minlength=len(labels) * self.n_cells,
+        )
+        labels = pd.DataFrame({
+            col: np.asarray(self.categories[col], dtype=object)[labels.get_level_values(i).to_numpy().astype(np.int64)]
+            for i, col in enumerate(by)
+        })
+        return labels, flat.astype(np.int64).reshape((len(labels),) + self.shape)
+
+    def compare(self, a, b, by='name', normalize=True, **filters):
+        # grid of a minus grid of b; normalized grids compare target shares
+        grid_a = self.grid(**{by: a}, **filters).astype(np.float64)
+        grid_b = self.grid(**{by: b}, **filters).astype(np.float64)
+        if normalize:
+            grid_a /= max(grid_a.sum(), 1)
+            grid_b /= max(grid_b.sum(), 1)
+        return grid_a - grid_b
+
+    def zone_totals(self, grid, zones=None):
+        # counts per named field zone for a grid from grid()/rollup()
+        zones = zones or ZONES
+        spec = self.grid_spec
+        ny, nx = self.shape
+        totals = {}
+        for zone, (x0, x1, y0, y1) in zones.items():
+            c0 = int(np.clip(round((x0 - spec['x_min']) / spec['cell']), 0, nx))
+            c1 = int(np.clip(round((x1 - spec['x_min']) / spec['cell']), 0, nx))
+            r0 = int(np.clip(round((y0 - spec['y_min']) / spec['cell']), 0, ny))
+            r1 = int(np.clip(round((y1 - spec['y_min']) / spec['cell']), 0, ny))
+            totals[zone] = grid[..., r0:r1, c0:c1].sum(axis=(-2, -1))
+        return totals
+
+    def add(self, other):
+        # combine with heatmaps built from other points (e.g. a new week)
+        if other.grid_spec != self.grid_spec:
+            raise ValueError("Cannot add heatmaps built on different grids")
+        lookups = {col: {} for col in KEY_COLUMNS}
+        parts = []
+        for heatmaps in (self, other):
+            remapped = {}
+            for col in KEY_COLUMNS:
+                mapping = np.array([lookups[col].setdefault(v, len(lookups[col])) for v in heatmaps.categories[col]], dtype=np.int64)
+                remapped[col] = mapping[heatmaps.key_codes[col].astype(np.int64)][heatmaps.key_index]
+            remapped['cell'] = heatmaps.cells.astype(np.int64)
+            remapped['count'] = heatmaps.counts.astype(np.int64)
+            parts.append(remapped)
+        columns = {col: np.concatenate([part[col] for part in parts]) for col in KEY_COLUMNS + ['cell']}
+        entries = _reduce(columns, np.concatenate([part['count'] for part in parts]))
+        categories = {col: list(lookups[col]) for col in KEY_COLUMNS}
+        return RouteHeatmaps._from_entries(entries, categories, self.grid_spec)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for col in KEY_COLUMNS:
+            np.save(os.path.join(path, f"key_{col}.npy"), self.key_codes[col])
+        for name in ('key_index', 'cells', 'counts'):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        meta = {'version': HEATMAP_VERSION, 'grid': self.grid_spec, 'categories': self.categories}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != HEATMAP_VERSION:
+            raise ValueError(f"Heatmaps at {path} have version {meta['version']}, expected {HEATMAP_VERSION}")
+        key_codes = {col: np.load(os.path.join(path, f"key_{col}.npy")) for col in KEY_COLUMNS}
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ('key_index', 'cells', 'counts')]
+        return cls(key_codes, meta['categories'], *arrays, grid=meta['grid'])
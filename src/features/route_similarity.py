@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+# "Who runs routes like this player": nearest neighbours over route-location
+# embeddings.
+#
+# Each player-season's route heatmaps (src/features/route_heatmaps.py) are
+# pooled into 3-yard blocks, one plane per route type, and flattened into a
+# fixed-length vector. Rows keep their raw pooled counts, and the embedding
+# is the square root of the row's point distribution, L2-normalized. Cosine
+# similarity between two embeddings is then the Bhattacharyya coefficient
+# of their target-location distributions. A query is one float32
+# matrix-vector product plus an argpartition. New weeks add their counts to
+# the affected rows, so only those rows are re-normalized.
+#
+#   index = RouteSimilarityIndex.from_heatmaps(heatmaps)
+#   index.query('Justin Jefferson', '2023', k=10)
+#   index.update(new_week_heatmaps)
+
+ROUTE_TYPES = ['COMPLETE', 'YAC', 'INCOMPLETE']
+POOL = 3
+
+
+def pool_grids(grids, pool=POOL):
+    # (n, ny, nx) counts -> (n, ceil(ny/pool), ceil(nx/pool)) block sums
+    n, ny, nx = grids.shape
+    py, px = -ny % pool, -nx % pool
+    if py or px:
+        grids = np.pad(grids, ((0, 0), (0, py), (0, px)))
+    return grids.reshape(n, (ny + py) // pool, pool, (nx + px) // pool, pool).sum(axis=(2, 4))
+
+
+def _normalize(counts):
+    totals = counts.sum(axis=1, keepdims=True)
+    vectors = np.sqrt(counts / np.maximum(totals, 1))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _profile_counts(heatmaps, by, route_types, pool):
+    # one row of pooled counts per distinct `by` value, route-type planes side by side
+    labels, grids = heatmaps.rollup(list(by) + ['route_type'], route_type=route_types)
+    pooled = pool_grids(grids, pool).reshape(len(labels), -1).astype(np.float32)
+    rows, row_labels = pd.MultiIndex.from_frame(labels[list(by)]).factorize()
+    plane = pd.Index(route_types).get_indexer(labels['route_type'])
+    counts = np.zeros((len(row_labels), len(route_types), pooled.shape[1]), dtype=np.float32)
+    np.add.at(counts, (rows, plane), pooled)
+    row_labels = pd.DataFrame({col: row_labels.get_level_values(i) for i, col in enumerate(by)})
+    return row_labels, counts.reshape(len(row_labels), -1)
+
+
+class RouteSimilarityIndex:
+    def __init__(self, labels, counts, by=('name', 'season'), route_types=None, pool=POOL):
+        self.by = list(by)
+        self.route_types = list(route_types or ROUTE_TYPES)
+        self.pool = pool
+        self.labels = labels.reset_index(drop=True)
+        self.labels['points'] = counts.sum(axis=1).astype(np.int64)
+        self.counts = counts
+        self.vectors = _normalize(counts)
+        self._rows = {key: i for i, key in enumerate(self.labels[self.by].itertuples(index=False, name=None))}
+
+    @classmethod
+    @profiling.timed('route_similarity.build')
+    def from_heatmaps(cls, heatmaps, by=('name', 'season'), route_types=None, pool=POOL):
+        route_types = list(route_types or ROUTE_TYPES)
+        labels, counts = _profile_counts(heatmaps, by, route_types, pool)
+        return cls(labels, counts, by, route_types, pool)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def row(self, *key):
+        return self._rows.get(tuple(str(k) for k in key))
+
+    @profiling.timed('route_similarity.update')
+    def update(self, heatmaps):
+        # add the counts from newly ingested weeks; returns the rows touched
+        labels, counts = _profile_counts(heatmaps, self.by, self.route_types, self.pool)
+        keys = list(labels[self.by].itertuples(index=False, name=None))
+        rows = np.array([self._rows.get(key, -1) for key in keys], dtype=np.int64)
+
+        existing = rows >= 0
+        self.counts[rows[existing]] += counts[existing]
+        new = np.flatnonzero(~existing)
+        if len(new):
+            start = len(self.labels)
+            self.counts = np.concatenate([self.counts, counts[new]])
+            self.vectors = np.concatenate([self.vectors, np.zeros((len(new), self.vectors.shape[1]), dtype=np.float32)])
+            self.labels = pd.concat([self.labels, labels.iloc[new].assign(points=0)], ignore_index=True)
+            for offset, i in enumerate(new):
+                self._rows[keys[i]] = start + offset
+            rows[new] = np.arange(start, start + len(new))
+
+        self.vectors[rows] = _normalize(self.counts[rows])
+        self.labels.loc[rows, 'points'] = self.counts[rows].sum(axis=1).astype(np.int64)
+        return rows
+
+    def search(self, vectors, k=10, mask=None):
+        # top-k rows by cosine similarity for each query vector:
+        # returns (indices, similarities), each shaped (n_queries, k)
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        scores = vectors @ self.vectors.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def query(self, *key, k=10, min_points=0, **filters):
+        # most similar player-seasons to `key` (values of self.by), e.g.
+        # query('Justin Jefferson', '2023', k=10, season='2023')
+        row = self.row(*key)
+        if row is None:
+            raise KeyError(f"No route profile for {key}")
+        mask = self.labels['points'].to_numpy() >= min_points
+        for col, wanted in filters.items():
+            wanted = [wanted] if isinstance(wanted, (str, int, np.integer)) else wanted
+            mask &= self.labels[col].astype(str).isin([str(w) for w in wanted]).to_numpy()
+        mask[row] = False
+        profiling.count('route_similarity_queries')
+        indices, scores = self.search(self.vectors[row], k, mask)
+        keep = np.isfinite(scores[0])
+        result = self.labels.iloc[indices[0][keep]].reset_index(drop=True)
+        result['similarity'] = scores[0][keep]
+        return result
+
+    def save(self, path):
+        np.savez(
+            path, counts=self.counts, by=np.array(self.by), route_types=np.array(self.route_types),
+            pool=self.pool, **{f"label_{col}": np.asarray(self.labels[col].astype(str), dtype=str) for col in self.by},
+        )
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            by = [str(col) for col in data['by']]
+            labels = pd.DataFrame({col: data[f"label_{col}"].astype(object) for col in by})
+            return cls(labels, data['counts'], by, [str(t) for t in data['route_types']], int(data['pool']))
@@ -0,0 +1,196 @@
+import bisect
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+# Columnar, memory-mapped store for Next Gen route points.
+#
+# Rows are sorted by (player, game) and every column is a flat .npy file
+# opened with mmap_mode='r'. String columns are dictionary-encoded; the
+# player dictionary is kept sorted so a lookup is a bisect over the names
+# followed by a slice between two offsets, and a game lookup inside a
+# player's block is a searchsorted. Opening a store reads only meta.json and
+# the offsets array; route points are paged in when a slice is touched.
+# Numeric columns (game_id, season, week) come back as int64/float64 values,
+# as pd.read_csv gives them; text columns come back as categoricals.
+#
+#   build_route_store(routes, 'data/next_gen/route_store')
+#   store = RouteStore('data/next_gen/route_store')
+#   store.player('Justin Jefferson')
+
+STORE_VERSION = 1
+CODED_COLUMNS = ['name', 'game_id', 'team', 'season', 'week', 'position', 'route_type']
+VALUE_COLUMNS = {'x': np.float32, 'y': np.float32}
+
+
+def _code_dtype(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _sort_categories(values, numeric=True):
+    # numeric game ids / seasons sort numerically, everything else as text
+    if not numeric:
+        return sorted(values)
+    try:
+        return sorted(values, key=lambda v: (0, float(v)))
+    except (TypeError, ValueError):
+        return sorted(values, key=str)
+
+
+def _numeric_dtype(categories):
+    # the dtype read_csv infers for a column of these values; None for text
+    try:
+        [float(v) for v in categories]
+    except (TypeError, ValueError):
+        return None
+    if all(v.lstrip('-').isdigit() for v in categories):
+        return np.int64
+    return np.float64
+
+
+@profiling.timed('route_store.build')
+def build_route_store(routes, path):
+    # routes: a DataFrame or an iterable of DataFrame chunks (e.g.
+    # pd.read_csv(..., chunksize=...)), so large CSVs never load at once
+    if isinstance(routes, pd.DataFrame):
+        routes = [routes]
+
+    lookups = {}
+    codes = {}
+    values = {col: [] for col in VALUE_COLUMNS}
+    columns = None
+    for chunk in routes:
+        if columns is None:
+            columns = [c for c in CODED_COLUMNS if c in chunk.columns]
+            lookups = {col: {} for col in columns}
+            codes = {col: [] for col in columns}
+        for col in columns:
+            lookup = lookups[col]
+            inverse, uniques = pd.factorize(chunk[col], use_na_sentinel=False)
+            mapping = np.array([lookup.setdefault(str(u), len(lookup)) for u in uniques], dtype=np.int64)
+            codes[col].append(mapping[inverse])
+        for col, dtype in VALUE_COLUMNS.items():
+            values[col].append(chunk[col].to_numpy(dtype=dtype))
+
+    if columns is None:
+        raise ValueError("No route rows to store")
+
+    os.makedirs(path, exist_ok=True)
+    categories = {}
+    arrays = {}
+    for col in columns:
+        # renumber codes so that code order == sorted category order
+        first_seen = list(lookups[col])
+        # player names stay in plain string order so lookups can bisect them
+        ordered = _sort_categories(first_seen, numeric=col != 'name')
+        remap = np.empty(len(first_seen), dtype=np.int64)
+        position = {value: i for i, value in enumerate(ordered)}
+        for old, value in enumerate(first_seen):
+            remap[old] = position[value]
+        arrays[col] = remap[np.concatenate(codes[col])].astype(_code_dtype(len(ordered)))
+        categories[col] = ordered
+    for col in VALUE_COLUMNS:
+        arrays[col] = np.concatenate(values[col])
+
+    order = np.lexsort((arrays['game_id'], arrays['name'])) if 'game_id' in arrays else np.argsort(arrays['name'], kind='stable')
+    for col, array in arrays.items():
+        np.save(os.path.join(path, f"{col}.npy"), array[order])
+
+    counts = np.bincount(arrays['name'], minlength=len(categories['name']))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    np.save(os.path.join(path, 'offsets.npy'), offsets)
+
+    meta = {
+        'version': STORE_VERSION,
+        'rows': int(len(order)),
+        'columns': columns + list(VALUE_COLUMNS),
+        'categories': categories,
+    }
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    return path
+
+
+class RouteStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != STORE_VERSION:
+            raise ValueError(f"Route store at {path} has version {meta['version']}, expected {STORE_VERSION}")
+        self.columns = meta['columns']
+        self.categories = meta['categories']
+        self.names = self.categories['name']
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        # code -> value for the numeric coded columns
+        self._values = {}
+        for col, categories in self.categories.items():
+            dtype = _numeric_dtype(categories) if col != 'name' else None
+            if dtype is np.int64:
+                self._values[col] = np.array([int(v) for v in categories], dtype=dtype)
+            elif dtype is np.float64:
+                self._values[col] = np.array([float(v) for v in categories], dtype=dtype)
+        self._arrays = {}
+        self._game_codes = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _column(self, col):
+        if col not in self._arrays:
+            self._arrays[col] = np.load(os.path.join(self.path, f"{col}.npy"), mmap_mode='r')
+        return self._arrays[col]
+
+    def player_range(self, name):
+        i = bisect.bisect_left(self.names, name)
+        if i == len(self.names) or self.names[i] != name:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def _game_range(self, start, stop, game_id):
+        if 'game_id' not in self.categories:
+            return start, stop
+        if self._game_codes is None:
+            self._game_codes = {value: i for i, value in enumerate(self.categories['game_id'])}
+        code = self._game_codes.get(str(game_id))
+        if code is None:
+            return start, start
+        block = self._column('game_id')[start:stop]
+        return start + int(np.searchsorted(block, code, 'left')), start + int(np.searchsorted(block, code, 'right'))
+
+    def slice(self, start, stop, columns=None):
+        columns = columns or self.columns
+        data = {}
+        for col in columns:
+            array = self._column(col)[start:stop]
+            if col in self._values:
+                data[col] = self._values[col][np.asarray(array)]
+            elif col in self.categories:
+                data[col] = pd.Categorical.from_codes(np.asarray(array), categories=self.categories[col])
+            else:
+                data[col] = np.asarray(array)
+        return pd.DataFrame(data, columns=columns)
+
+    def player(self, name, game_id=None, columns=None):
+        start, stop = self.player_range(name)
+        if game_id is not None:
+            start, stop = self._game_range(start, stop, game_id)
+        profiling.count('route_points_read', stop - start)
+        return self.slice(start, stop, columns)
+
+    def player_points(self, name):
+        # raw (x, y) arrays for a player without building a DataFrame
+        start, stop = self.player_range(name)
+        return self._column('x')[start:stop], self._column('y')[start:stop]
+
+    def to_frame(self, columns=None):
+        return self.slice(0, len(self), columns)
+
+
+def build_route_store_from_csv(csv_path, path, chunksize=1_000_000):
+    return build_route_store(pd.read_csv(csv_path, chunksize=chunksize), path)
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Read-only datasets shared between app processes.
+#
+# publish_frame writes a frame's column buffers into one file under
+# SHARED_DIR (tmpfs /dev/shm by default, so the file is shared memory) and
+# a small JSON manifest naming the current version. Every process that
+# attaches maps the same file read-only, and its columns are NumPy views
+# of the mapping: the pages exist once however many workers attach, and a
+# worker that tries to write into a shared column gets a ValueError.
+#
+#   numeric / bool / datetime64   one buffer
+#   nullable Int / Float / bool   values + mask buffers
+#   categorical                   codes buffer; categories pickled alongside
+#   object (strings)              stored as categorical codes, so only the
+#                                 distinct values are copied into a worker
+#
+# Publishing again writes a new version file and swaps the manifest with
+# os.replace; files of older versions are unlinked, and their memory is
+# freed once the last worker still mapping them lets go of the frame.
+# SharedDatasets.get re-attaches when the manifest changes, so workers pick
+# up a refresh on their next request. Objects such as fitted models are
+# stored pickled (publish_object); they are unpickled once per worker.
+#
+#   python -m src.features.shared_frames --pbp-seasons 2019 2023
+#   shared = SharedDatasets()
+#   wr_data = shared.get('wr_data')
+
+SHARED_DIR = os.environ.get(
+    'NFL_QUANT_SHARED_DIR',
+    os.path.join('/dev/shm', 'nfl_quant') if os.path.isdir('/dev/shm') else os.path.join('data', 'shared'),
+)
+ALIGNMENT = 64
+_MASKED_ARRAYS = {'Int': pd.arrays.IntegerArray, 'UInt': pd.arrays.IntegerArray, 'Float': pd.arrays.FloatingArray,
+                  'boolean': pd.arrays.BooleanArray}
+
+
+def _manifest_path(name, root):
+    return os.path.join(root, f"{name}.json")
+
+
+def _read_manifest(name, root):
+    with open(_manifest_path(name, root)) as f:
+        return json.load(f)
+
+
+def _encode(series):
+    # (kind, {buffer name: array}, extra manifest fields, pickled categories)
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category', {'codes': series.cat.codes.to_numpy()}, {'ordered': bool(dtype.ordered)}, list(dtype.categories)
+    if isinstance(series.array, tuple(_MASKED_ARRAYS.values())):
+        data = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        return 'masked', {'data': data, 'mask': series.isna().to_numpy()}, {'dtype': str(dtype)}, None
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return 'numpy', {'data': series.to_numpy()}, {}, None
+    codes, uniques = pd.factorize(series)
+    codes = codes.astype(np.int32 if len(uniques) > np.iinfo(np.int16).max else np.int16)
+    return 'category', {'codes': codes}, {'ordered': False}, list(uniques)
+
+
+def _decode(column, buffer):
+    arrays = {
+        key: np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+        for key, (offset, dtype, count) in column['buffers'].items()
+    }
+    if column['kind'] == 'numpy':
+        return arrays['data']
+    if column['kind'] == 'masked':
+        kind = next(prefix for prefix in _MASKED_ARRAYS if column['dtype'].startswith(prefix))
+        return _MASKED_ARRAYS[kind](arrays['data'], arrays['mask'])
+    offset, size = column['categories']
+    categories = pickle.loads(buffer[offset:offset + size].tobytes())
+    return pd.Categorical.from_codes(arrays['codes'], categories, ordered=column['ordered'])
+
+
+def _next_version(name, root):
+    try:
+        return _read_manifest(name, root)['version'] + 1
+    except FileNotFoundError:
+        return 1
+
+
+def _swap_manifest(name, root, manifest):
+    path = _manifest_path(name, root)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+    # workers still mapping an old version keep it until they drop it
+    for stale in glob.glob(os.path.join(root, f"{glob.escape(name)}.*.bin")):
+        if os.path.basename(stale) != manifest['file']:
+            os.remove(stale)
+
+
+@profiling.timed('shared.publish')
+def publish_frame(name, frame, root=None):
+    # returns the published version; the frame's index is not kept
+    root = root or SHARED_DIR
+    os.makedirs(root, exist_ok=True)
+    version = _next_version(name, root)
+    file_name = f"{name}.{version}.bin"
+    columns, position = [], 0
+
+    with open(os.path.join(root, file_name), 'wb') as f:
+        def write(data):
+            nonlocal position
+            padding = -position % ALIGNMENT
+            f.write(b'\0' * padding)
+            f.write(data)
+            start = position + padding
+            position = start + len(data)
+            return start
+
+        for column_name in frame.columns:
+            kind, arrays, extra, categories = _encode(frame[column_name])
+            column = {'name': column_name, 'kind': kind, 'buffers': {}, **extra}
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                column['buffers'][key] = (write(array.view(np.uint8).data), array.dtype.str, len(array))
+            if categories is not None:
+                blob = pickle.dumps(categories, protocol=pickle.HIGHEST_PROTOCOL)
+                column['categories'] = (write(blob), len(blob))
+            columns.append(column)
+        # np.memmap cannot map an empty file
+        f.write(b'\0' * (ALIGNMENT - position % ALIGNMENT))
+
+    _swap_manifest(name, root, {'kind': 'frame', 'version': version, 'file': file_name, 'rows': len(frame),
+                                'columns': columns})
+    logger.info("Published %s v%d (%d rows) to %s", name, version, len(frame), root)
+    return version
+
+
+def publish_object(name, obj, root=None):
+    root = root or SHARED_DIR
+    os.makedirs(root, exist_ok=True)
+    version = _next_version(name, root)
+    file_name = f"{name}.{version}.bin"
+    with open(os.path.join(root, file_name), 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    _swap_manifest(name, root, {'kind': 'object', 'version': version, 'file': file_name})
+    logger.info("Published %s v%d to %s", name, version, root)
+    return version
+
+
+def attach(name, root=None, retries=3):
+    # (value, version) of the current version of name
+    root = root or SHARED_DIR
+    for _ in range(retries):
+        manifest = _read_manifest(name, root)
+        path = os.path.join(root, manifest['file'])
+        try:
+            if manifest['kind'] == 'object':
+                with open(path, 'rb') as f:
+                    return pickle.load(f), manifest['version']
+            buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        except FileNotFoundError:
+            # replaced between reading the manifest and opening the file
+            continue
+        frame = pd.DataFrame({column['name']: _decode(column, buffer) for column in manifest['columns']},
+                             index=pd.RangeIndex(manifest['rows']), copy=False)
+        profiling.count('shared_attaches')
+        return frame, manifest['version']
+    raise FileNotFoundError(f"{name} kept changing while attaching from {root}")
+
+
+class SharedDatasets:
+    # one per process; get() re-attaches when a newer version is published
+    def __init__(self, root=None):
+        self.root = root or SHARED_DIR
+        self._attached = {}    # name -> (manifest mtime, version, value)
+
+    def __contains__(self, name):
+        return os.path.exists(_manifest_path(name, self.root))
+
+    def version(self, name):
+        return _read_manifest(name, self.root)['version']
+
+    def get(self, name):
+        mtime = os.stat(_manifest_path(name, self.root)).st_mtime_ns
+        attached = self._attached.get(name)
+        if attached is None or attached[0] != mtime:
+            value, version = attach(name, self.root)
+            if attached is not None:
+                logger.info("Swapped in %s v%d", name, version)
+            self._attached[name] = attached = (mtime, version, value)
+        return attached[2]
+
+
+def publish_datasets(pbp_seasons, wr_seasons, root=None):
+    # the app's large read-only inputs: PBP, WR data and the fitted APY model
+    from src.features.dtypes import optimize_dtypes
+    from src.features.nfl_data import get_play_by_play_data, get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics, fit_best_model
+    pbp = pd.concat([get_play_by_play_data(season) for season in pbp_seasons], ignore_index=True)
+    publish_frame('pbp', optimize_dtypes(pbp, 'pbp'), root)
+    del pbp
+    wr_data = calculate_advanced_metrics(get_wr_data(wr_seasons))
+    publish_frame('wr_data', wr_data, root)
+    publish_object('apy_model', fit_best_model(wr_data), root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the app's datasets to shared memory.")
+    parser.add_argument('--pbp-seasons', type=int, nargs=2, default=[2019, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--wr-seasons', type=int, nargs=2, default=[2013, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--root', default=None, help=f"default {SHARED_DIR}")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    publish_datasets(range(args.pbp_seasons[0], args.pbp_seasons[1] + 1),
+                     range(args.wr_seasons[0], args.wr_seasons[1] + 1), args.root)
+
+
+if __name__ == "__main__":
+    main()
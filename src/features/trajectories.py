@@ -0,0 +1,163 @@
+import logging
+import numpy as np
+import pandas as pd
+from src.features.cache import read_cached, write_cached
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Multi-season player trajectories.
+#
+# One row per player-season with, for each per-game rate:
+#
+#   <rate>_2y, <rate>_3y   games-weighted rate over the last 2 / 3 seasons
+#                          (calendar seasons; a missed season counts as 0 games)
+#   <rate>_yoy             change from the previous season, when the player
+#                          played it
+#   <rate>_age_delta       expected change into next season at the player's
+#                          next age, from a trailing age curve
+#   <rate>_age_adjusted    <rate>_3y + <rate>_age_delta
+#
+# Everything is computed over the whole frame sorted by (player_id, season)
+# with groupby shifts, so there is no per-player loop. The age curve is the
+# mean year-over-year change by age over the last AGING_SEASONS seasons of
+# transitions (the delta method); season s only sees transitions up to s.
+#
+# A season's features depend on at most HISTORY seasons of raw stats, so
+# they are cached one parquet file per season and a new season is built
+# from the seasons before it without touching the cached ones.
+#
+#   trajectories = get_trajectories(range(2013, 2024))
+#   wr_data = add_trajectories(wr_data, trajectories)
+
+# per-game rate -> counting stat, as in calculate_advanced_metrics
+RATES = {
+    'receiving_yards_per_game': 'receiving_yards',
+    'receptions_per_game': 'receptions',
+    'touchdowns_per_game': 'receiving_tds',
+    'targets_per_game': 'targets',
+}
+WINDOWS = (2, 3)
+AGING_SEASONS = 5
+MIN_AGING_SAMPLES = 30
+AGE_RANGE = (21, 35)    # ages outside are pooled into the end buckets
+HISTORY = max(max(WINDOWS), AGING_SEASONS + 1)
+SEASON_START = (9, 1)   # ages are as of Sept 1 of the season
+FIRST_SEASON = 1999     # nfl_data_py has no seasonal stats before this
+
+
+def _age_at_season(birthdate, season):
+    birthdate = pd.to_datetime(birthdate, errors='coerce')
+    born_after_start = (birthdate.dt.month * 100 + birthdate.dt.day) > SEASON_START[0] * 100 + SEASON_START[1]
+    return season - birthdate.dt.year - born_after_start.astype(float)
+
+
+def _load_seasons(years):
+    # raw player-seasons: player_id, season, games, counting stats, age
+    import nfl_data_py as nfl
+    seasonal = nfl.import_seasonal_data([int(y) for y in years], s_type='REG')
+    seasons = seasonal[['player_id', 'season', 'games'] + list(RATES.values())]
+    seasons = seasons[seasons['games'] > 0]
+    ids = nfl.import_ids()
+    if 'birthdate' in ids.columns:
+        seasons = seasons.merge(ids[['gsis_id', 'birthdate']].drop_duplicates('gsis_id'),
+                                left_on='player_id', right_on='gsis_id', how='left')
+        seasons['age'] = _age_at_season(seasons.pop('birthdate'), seasons['season'])
+        seasons = seasons.drop(columns='gsis_id')
+    else:
+        logger.warning("No birthdates in the player ids; trajectories have no age curve")
+        seasons = seasons.assign(age=np.nan)
+    profiling.count('rows_merged', len(seasons))
+    return seasons.reset_index(drop=True)
+
+
+def _aging_curve(df, rates, aging_seasons):
+    # (age, season) -> mean yoy change of each rate over the trailing
+    # aging_seasons seasons of transitions into that age
+    seasons = np.arange(df['season'].min(), df['season'].max() + 1)
+    transitions = df.dropna(subset=['age', rates[0] + '_yoy'])
+    if transitions.empty:
+        return pd.DataFrame(columns=['season', 'age'] + rates, dtype='float64')
+    curves = {}
+    for rate in rates:
+        sums = transitions.pivot_table(index='season', columns='age', values=rate + '_yoy',
+                                       aggfunc=['sum', 'count'])
+        sums = sums.reindex(seasons, fill_value=0).rolling(aging_seasons, min_periods=1).sum()
+        mean = sums['sum'] / sums['count'].where(sums['count'] >= MIN_AGING_SAMPLES)
+        curves[rate] = mean.stack(dropna=False).rename(rate)
+    return pd.concat(curves, axis=1).rename_axis(['season', 'age']).reset_index()
+
+
+@profiling.timed('features.trajectories')
+def trajectory_features(seasons, windows=WINDOWS, aging_seasons=AGING_SEASONS):
+    # seasons: one row per player-season with player_id, season, games, the
+    # counting stats in RATES and age (may be NaN)
+    rates = list(RATES)
+    df = seasons.sort_values(['player_id', 'season'], kind='mergesort').reset_index(drop=True)
+    season = df['season'].astype('int64')
+    grouped = df.groupby('player_id', sort=False)
+    counts = ['games'] + list(RATES.values())
+    for rate, stat in RATES.items():
+        df[rate] = df[stat] / df['games']
+
+    # shifted copies of the counting stats and seasons, k seasons back in the
+    # player's own history
+    shifted = {0: (season, df[counts])}
+    for k in range(1, max(windows)):
+        shifted[k] = (grouped['season'].shift(k), grouped[counts].shift(k))
+
+    for window in windows:
+        totals = df[counts].astype('float64').copy()
+        for k in range(1, window):
+            prev_season, prev = shifted[k]
+            in_window = (season - prev_season) < window
+            totals += prev.astype('float64').where(in_window, 0).to_numpy()
+        for rate, stat in RATES.items():
+            df[f"{rate}_{window}y"] = totals[stat] / totals['games']
+
+    prev_season, prev = shifted[1]
+    consecutive = (season - prev_season) == 1
+    for rate, stat in RATES.items():
+        df[f"{rate}_yoy"] = (df[rate] - prev[stat] / prev['games']).where(consecutive)
+
+    df['age'] = df['age'].astype('float64')
+    df['_curve_age'] = df['age'].clip(*AGE_RANGE)
+    curve = _aging_curve(df.assign(age=df['_curve_age']), rates, aging_seasons)
+    # the change expected from this season to the next is the curve at next age
+    lookup = pd.DataFrame({'season': season, 'age': (df['_curve_age'] + 1).clip(*AGE_RANGE)})
+    expected = lookup.merge(curve, on=['season', 'age'], how='left')
+    longest = max(windows)
+    for rate in rates:
+        df[f"{rate}_age_delta"] = expected[rate].fillna(0).to_numpy()
+        df[f"{rate}_age_adjusted"] = df[f"{rate}_{longest}y"] + df[f"{rate}_age_delta"]
+    return df.drop(columns='_curve_age')
+
+
+@profiling.timed('features.get_trajectories')
+def get_trajectories(years, refresh=False, cache_dir=None):
+    # cached per season; the missing seasons are built in one pass over the
+    # raw seasons they need
+    years = sorted(int(y) for y in years)
+    frames = {}
+    if not refresh:
+        for year in years:
+            cached = read_cached('trajectories', year, cache_dir)
+            if cached is not None:
+                frames[year] = cached
+    missing = [year for year in years if year not in frames]
+    if missing:
+        profiling.count('cache_misses', len(missing))
+        raw = _load_seasons(range(max(FIRST_SEASON, missing[0] - HISTORY + 1), missing[-1] + 1))
+        features = trajectory_features(raw)
+        for year in missing:
+            frames[year] = features[features['season'] == year].reset_index(drop=True)
+            write_cached(frames[year], 'trajectories', year, cache_dir)
+        logger.info("Built trajectories for %d seasons", len(missing))
+    return pd.concat([frames[year] for year in years], ignore_index=True)
+
+
+def add_trajectories(frame, trajectories):
+    # trajectory columns joined onto a frame with player_id and season
+    # (e.g. wr_data); columns the frame already has are not duplicated
+    columns = [c for c in trajectories.columns if c not in frame.columns or c in ('player_id', 'season')]
+    return frame.merge(trajectories[columns], on=['player_id', 'season'], how='left')
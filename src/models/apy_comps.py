@@ -0,0 +1,138 @@
+import argparse
+import numpy as np
+import pandas as pd
+from src.models.apy_model import FEATURES, TARGET
+from src.utils import profiling
+
+# Contract comparables for WR valuation.
+#
+# Every historical WR season with a contract signed that season (the rows of
+# get_wr_data) is placed in prepare_for_regression's standardized feature
+# space. A query returns the k nearest player-seasons by Euclidean distance
+# together with the APY each of them signed for. Squared row norms are kept
+# with the index, so a batch of queries is one matrix product. Season, age
+# and same-player filters are boolean masks over that distance block.
+#
+#   comps = ApyComps(wr_data, scaler)
+#   comps.query(wr_data[wr_data['season'] == 2023], k=5, age_window=2)
+#
+# The nightly run queries every receiver of the season (get_receiver_season),
+# not only the ones who signed a contract that year.
+#
+#   python -m src.models.apy_comps 2023 --out data/comps_2023.parquet
+
+COMP_COLUMNS = ['name', 'season', 'age', 'team', 'year_signed', TARGET]
+
+# queries per distance block; bounds memory at block * index rows floats
+QUERY_BLOCK = 1024
+
+
+class ApyComps:
+    def __init__(self, wr_data, scaler, features=None):
+        self.features = list(features or FEATURES)
+        rows = wr_data.dropna(subset=self.features + [TARGET]).reset_index(drop=True)
+        self.meta = rows[[c for c in COMP_COLUMNS if c in rows.columns]].copy()
+        self.X = scaler.transform(rows[self.features].astype(np.float64)).astype(np.float32)
+        self.sq_norms = np.einsum('ij,ij->i', self.X, self.X)
+        self.scaler = scaler
+        self._season = rows['season'].to_numpy(dtype=np.float64)
+        self._age = rows['age'].to_numpy(dtype=np.float64)
+        self._names, self._name_codes = np.unique(rows['name'].astype(str).to_numpy(), return_inverse=True)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def _name_code(self, names):
+        codes = np.searchsorted(self._names, names)
+        codes = np.clip(codes, 0, len(self._names) - 1)
+        return np.where(self._names[codes] == names, codes, -1)
+
+    @profiling.timed('apy_comps.query')
+    def query(self, players, k=5, prior_seasons=True, season_window=None, age_window=None, exclude_self=True):
+        # players: frame with the model features plus season/age/name
+        # prior_seasons: only comps signed before the player's season
+        # season_window / age_window: max |difference| allowed
+        players = players.dropna(subset=self.features).reset_index(drop=True)
+        Q = self.scaler.transform(players[self.features].astype(np.float64)).astype(np.float32)
+        q_season = players['season'].to_numpy(dtype=np.float64)
+        q_age = players['age'].to_numpy(dtype=np.float64) if 'age' in players else np.full(len(players), np.nan)
+        q_name = self._name_code(players['name'].astype(str).to_numpy()) if 'name' in players else np.full(len(players), -1)
+        k = min(k, len(self))
+
+        indices = np.empty((len(players), k), dtype=np.int64)
+        distances = np.empty((len(players), k), dtype=np.float32)
+        for start in range(0, len(players), QUERY_BLOCK):
+            block = slice(start, start + QUERY_BLOCK)
+            d2 = (Q[block] ** 2).sum(axis=1)[:, None] + self.sq_norms[None, :] - 2 * Q[block] @ self.X.T
+            allowed = np.ones(d2.shape, dtype=bool)
+            if prior_seasons:
+                allowed &= self._season[None, :] < q_season[block, None]
+            if season_window is not None:
+                allowed &= np.abs(self._season[None, :] - q_season[block, None]) <= season_window
+            if age_window is not None:
+                allowed &= np.abs(self._age[None, :] - q_age[block, None]) <= age_window
+            if exclude_self:
+                allowed &= self._name_codes[None, :] != q_name[block, None]
+            d2[~allowed] = np.inf
+
+            top = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            top_d2 = np.take_along_axis(d2, top, axis=1)
+            order = np.argsort(top_d2, axis=1, kind='stable')
+            indices[block] = np.take_along_axis(top, order, axis=1)
+            distances[block] = np.sqrt(np.maximum(np.take_along_axis(top_d2, order, axis=1), 0))
+        profiling.count('apy_comp_queries', len(players))
+
+        # long format: one row per (player, comp rank); unmatched slots dropped
+        found = np.isfinite(distances)
+        player_row, rank = np.nonzero(found)
+        comps = self.meta.iloc[indices[found]].add_prefix('comp_').reset_index(drop=True)
+        result = players.loc[player_row, [c for c in ('name', 'season', 'age', TARGET) if c in players]].reset_index(drop=True)
+        result['rank'] = rank + 1
+        result['distance'] = distances[found]
+        return pd.concat([result, comps], axis=1)
+
+
+def comp_values(comps):
+    # per player-season summary of the comps' APY at signing
+    keys = ['name', 'season']
+    grouped = comps.groupby(keys, sort=False)[f'comp_{TARGET}']
+    summary = grouped.agg(comp_apy_median='median', comp_apy_mean='mean', n_comps='size').reset_index()
+    if TARGET in comps:
+        summary = summary.merge(comps.drop_duplicates(keys)[keys + [TARGET]], on=keys, how='left')
+    return summary
+
+
+@profiling.timed('apy_comps.nightly')
+def comps_for_season(wr_data, scaler, season, k=5, players=None, **filters):
+    # comps for every receiver with a season row in `season`; players
+    # defaults to the season's regular-season stat rows, contract or not
+    from src.features.nfl_data import get_receiver_season
+    from src.models.apy_model import calculate_advanced_metrics
+    engine = ApyComps(wr_data, scaler)
+    if players is None:
+        players = calculate_advanced_metrics(get_receiver_season(season))
+    return engine.query(players, k=k, **filters)
+
+
+def main():
+    from src.features.nfl_data import get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics, prepare_for_regression
+
+    parser = argparse.ArgumentParser(description="Contract comps for every receiver in a season.")
+    parser.add_argument('season', type=int)
+    parser.add_argument('--first-season', type=int, default=2013)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--age-window', type=float, default=None)
+    parser.add_argument('--out', default=None, help="parquet path for the comps table")
+    args = parser.parse_args()
+
+    wr_data = calculate_advanced_metrics(get_wr_data(range(args.first_season, args.season + 1)))
+    _, scaler, _ = prepare_for_regression(wr_data)
+    comps = comps_for_season(wr_data, scaler, args.season, k=args.k, age_window=args.age_window)
+    if args.out:
+        comps.to_parquet(args.out, index=False)
+    print(comp_values(comps).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# WR APY regression used by the app. sklearn and xgboost are imported inside
+# the functions that need them so importing this module stays cheap.
+
+FEATURES = [
+    'receiving_yards_per_game', 'receptions_per_game', 'touchdowns_per_game',
+    'targets_per_game', 'age', 'weight', 'height', 'availability'
+]
+TARGET = 'apy'
+
+# hyperparameters used when no tuned configuration has been written by
+# src/models/tuning.py
+DEFAULT_PARAMS = {
+    'Lasso': {'alpha': 0.1},
+    'Random Forest': {'n_estimators': 100},
+    'XGBoost': {'n_estimators': 100},
+}
+BEST_PARAMS_PATH = os.environ.get('NFL_QUANT_APY_PARAMS', os.path.join('data', 'models', 'apy_params.json'))
+
+
+def calculate_advanced_metrics(df):
+    df['receiving_yards_per_game'] = df['receiving_yards'] / df['games']
+    df['receptions_per_game'] = df['receptions'] / df['games']
+    df['touchdowns_per_game'] = df['receiving_tds'] / df['games']
+    df['targets_per_game'] = df['targets'] / df['games']
+    return df
+
+@profiling.timed('model.prepare')
+def prepare_for_regression(df):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    features = list(FEATURES)
+    target = TARGET
+
+    df_clean = df.dropna(subset=features + [target])
+
+    X = df_clean[features]
+    y = df_clean[target]
+
+    # Normalize features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    X_scaled = pd.DataFrame(X_scaled, columns=X.columns)
+
+    return train_test_split(X_scaled, y, test_size=0.2, random_state=42), scaler, features
+
+def make_model(name, params=None, **fixed):
+    # fixed: settings that are not tuned, e.g. n_jobs for pool workers
+    params = dict(DEFAULT_PARAMS[name] if params is None else params, **fixed)
+    if name == 'Lasso':
+        from sklearn.linear_model import Lasso
+        return Lasso(random_state=42, **params)
+    if name == 'Random Forest':
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(random_state=42, **params)
+    if name == 'XGBoost':
+        from xgboost import XGBRegressor
+        return XGBRegressor(random_state=42, **params)
+    raise ValueError(f"Unknown model {name!r}")
+
+def load_best_params(path=None):
+    # model name -> params, tuned values over DEFAULT_PARAMS where present
+    path = path or BEST_PARAMS_PATH
+    params = {name: dict(p) for name, p in DEFAULT_PARAMS.items()}
+    if os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+        for name, entry in tuned['models'].items():
+            params[name] = entry['params']
+        logger.info("Using tuned APY model parameters from %s", path)
+    return params
+
+def run_regression_models(X_train, X_test, y_train, y_test, params=None):
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    params = load_best_params() if params is None else params
+    models = {name: make_model(name, params.get(name)) for name in DEFAULT_PARAMS}
+
+    results = {}
+
+    for name, model in models.items():
+        with profiling.stage(f'model.fit.{name}'):
+            model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+        mse = mean_squared_error(y_test, y_pred)
+        r2 = r2_score(y_test, y_pred)
+        results[name] = {'model': model, 'MSE': mse, 'R2': r2}
+
+    return results
+
+def fit_best_model(wr_data, params=None):
+    # (best model by test R2, scaler, features), as used by the app and the
+    # HTTP service
+    (X_train, X_test, y_train, y_test), scaler, selected_features = prepare_for_regression(wr_data)
+    with profiling.stage('model.train'):
+        regression_results = run_regression_models(X_train, X_test, y_train, y_test, params)
+    best_model_name = max(regression_results, key=lambda x: regression_results[x]['R2'])
+    return regression_results[best_model_name]['model'], scaler, selected_features
+
+@profiling.timed('model.evaluate_player')
+def evaluate_player(player_name, player_data, best_model, scaler, selected_features):
+    player = player_data[player_data['name'] == player_name].iloc[-1]  # Get the most recent season data
+
+    player_features = player[selected_features].values.reshape(1, -1)
+    player_features_scaled = scaler.transform(player_features)
+    predicted_apy = best_model.predict(player_features_scaled)[0]
+
+    actual_apy = player['apy']
+
+    return {
+        'player': player_name,
+        'actual_apy': actual_apy,
+        'predicted_apy': predicted_apy,
+        'difference': predicted_apy - actual_apy,
+        'features': {feature: player[feature] for feature in selected_features}
+    }
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Per-feature contributions to APY predictions, computed for every player
+# season in one batch and cached per model version.
+#
+#   XGBoost        booster.predict(pred_contribs=True) (exact TreeSHAP)
+#   Random Forest  Saabas tree-path attributions averaged over the trees
+#   Lasso          coefficient * scaled feature value
+#
+# For each row the contributions plus 'bias' add up to the model's
+# prediction. Tables are stored as ATTRIBUTION_DIR/<model>_<data>.parquet,
+# where <model> hashes the fitted model and scaler and <data> the input
+# rows, so retraining or new seasons never read a stale table.
+#
+#   cache = AttributionCache.build(best_model, scaler, wr_data, features)
+#   cache.explain('Justin Jefferson')    # Series: feature -> $M contribution
+
+ATTRIBUTION_DIR = os.environ.get('NFL_QUANT_ATTRIBUTION_DIR', os.path.join('data', 'models', 'attributions'))
+KEY_COLUMNS = ['name', 'season']
+
+
+def model_version(model, scaler, features):
+    digest = hashlib.sha256(pickle.dumps((model, scaler, list(features))))
+    return digest.hexdigest()[:16]
+
+
+def _xgboost_contributions(model, X, features):
+    import xgboost as xgb
+    booster = model.get_booster()
+    matrix = xgb.DMatrix(X, feature_names=booster.feature_names)
+    contribs = booster.predict(matrix, pred_contribs=True)
+    return contribs[:, :-1], contribs[:, -1]
+
+
+def _tree_path_contributions(tree, X, n_features):
+    # Saabas: each split credits its feature with the change in node value
+    # between parent and child along the sample's decision path
+    from scipy import sparse
+    t = tree.tree_
+    values = t.value[:, 0, 0]
+    parent = np.full(t.node_count, -1)
+    for children in (t.children_left, t.children_right):
+        internal = np.flatnonzero(children >= 0)
+        parent[children[internal]] = internal
+    nodes = np.flatnonzero(parent >= 0)
+    deltas = sparse.csr_matrix(
+        (values[nodes] - values[parent[nodes]], (nodes, t.feature[parent[nodes]])),
+        shape=(t.node_count, n_features),
+    )
+    return np.asarray((tree.decision_path(X) @ deltas).todense()), values[0]
+
+
+def _forest_contributions(model, X, n_features):
+    contribs = np.zeros((len(X), n_features))
+    bias = 0.0
+    for tree in model.estimators_:
+        tree_contribs, tree_bias = _tree_path_contributions(tree, X, n_features)
+        contribs += tree_contribs
+        bias += tree_bias
+    return contribs / len(model.estimators_), np.full(len(X), bias / len(model.estimators_))
+
+
+def _linear_contributions(model, X):
+    return X * model.coef_, np.full(len(X), float(model.intercept_))
+
+
+@profiling.timed('model.attributions')
+def feature_contributions(model, X, features):
+    # (contributions (n, n_features), bias (n,)) for scaled inputs X
+    X = np.asarray(X, dtype=np.float64)
+    kind = type(model).__name__
+    if kind.startswith('XGB'):
+        return _xgboost_contributions(model, X, features)
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+        return _forest_contributions(model, X, len(features))
+    if hasattr(model, 'coef_'):
+        return _linear_contributions(model, X)
+    raise TypeError(f"No attribution method for {kind}")
+
+
+class AttributionCache:
+    def __init__(self, table, features, version):
+        self.table = table.reset_index(drop=True)
+        self.features = list(features)
+        self.version = version
+        # name -> latest row, the season evaluate_player values
+        self._latest = {name: i for i, name in enumerate(self.table['name'])}
+
+    @classmethod
+    def build(cls, model, scaler, wr_data, features, root=None):
+        # reads the stored table for this model/data version, or computes
+        # and stores it
+        rows = wr_data.dropna(subset=list(features))
+        version = model_version(model, scaler, features)
+        data = hashlib.sha256(pd.util.hash_pandas_object(rows[KEY_COLUMNS + list(features)], index=False).values.tobytes())
+        path = os.path.join(root or ATTRIBUTION_DIR, f"{version}_{data.hexdigest()[:16]}.parquet")
+        if os.path.exists(path):
+            profiling.count('attribution_tables_reused')
+            return cls(pd.read_parquet(path), features, version)
+
+        X = scaler.transform(rows[list(features)])
+        contribs, bias = feature_contributions(model, X, features)
+        table = pd.DataFrame(contribs, columns=list(features))
+        table.insert(0, 'season', rows['season'].to_numpy())
+        table.insert(0, 'name', rows['name'].to_numpy())
+        table['bias'] = bias
+        table['predicted_apy'] = contribs.sum(axis=1) + bias
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        table.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        logger.info("Stored %d attribution rows at %s", len(table), path)
+        return cls(table, features, version)
+
+    def __contains__(self, name):
+        return name in self._latest
+
+    def explain(self, name):
+        # contributions for the player's most recent season, largest first
+        row = self.table.iloc[self._latest[name]]
+        contribs = row[self.features].astype(float)
+        return contribs.reindex(contribs.abs().sort_values(ascending=False).index)
+
+    def row(self, name):
+        return self.table.iloc[self._latest[name]]
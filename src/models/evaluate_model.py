@@ -1,9 +1,9 @@
 
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 def evaluate_model(model, X_test, y_test):
+    from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+    import seaborn as sns
+    import matplotlib.pyplot as plt
     y_pred = model.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
     report = classification_report(y_test, y_pred)
@@ -0,0 +1,213 @@
+import argparse
+import logging
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from src.models.apy_model import FEATURES, TARGET, load_best_params, make_model
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# In-season APY valuations, updated week by week.
+#
+# The model starts from a fit on historical season totals (the same
+# FEATURES and scaling as apy_model), so before any games it gives the
+# season-total valuation. start_season fixes the receivers' static
+# attributes and the APY of the contract each has in force. Every
+# update(weekly) then:
+#
+#   1. adds only the weeks it has not seen to running season-to-date totals
+#   2. recomputes the per-game features of the receivers who played
+#   3. takes a small learning step on those of them with a contract:
+#        sgd       SGDRegressor.partial_fit on their rows
+#        xgboost   UPDATE_ROUNDS more boosting rounds on their rows,
+#                  continuing from the previous booster (xgb_model=)
+#   4. re-predicts every receiver
+#
+# A week costs a groupby over that week's rows and a few small fits, not a
+# retrain. The state is pickled between runs, so the weekly job loads it,
+# ingests the new week and saves it again:
+#
+#   python -m src.models.online_apy 2024
+#   model = OnlineApyModel.load(online_model_path(2024))
+#   model.predictions()
+
+ONLINE_DIR = os.environ.get('NFL_QUANT_ONLINE_DIR', os.path.join('data', 'models', 'online'))
+KINDS = ('sgd', 'xgboost')
+STATS = ['receptions', 'receiving_yards', 'receiving_tds', 'targets']
+STATIC = ['name', 'age', 'weight', 'height']
+# boosting rounds per weekly update, with a smaller step than the base fit
+# so that a week's noise does not override the historical fit
+UPDATE_ROUNDS = 5
+UPDATE_LEARNING_RATE = 0.05
+
+
+def online_model_path(season, kind='sgd', root=None):
+    return os.path.join(root or ONLINE_DIR, f"apy_{kind}_{int(season)}.pkl")
+
+
+def season_players(season):
+    # player_id, name, age, weight, height and the APY in force in season
+    import nfl_data_py as nfl
+    from src.features.contracts import contracts_in_force
+    ids = nfl.import_ids()[['gsis_id', 'name', 'age', 'weight', 'height']].dropna(subset=['gsis_id'])
+    ids = ids.drop_duplicates('gsis_id').assign(season=int(season))
+    players = contracts_in_force(ids, nfl.import_contracts())
+    return players.rename(columns={'gsis_id': 'player_id'})[['player_id'] + STATIC + [TARGET]]
+
+
+class OnlineApyModel:
+    def __init__(self, model, scaler, kind):
+        self.model = model
+        self.scaler = scaler
+        self.kind = kind
+        self.season = None
+        self.players = None     # indexed by player_id: STATIC + apy
+        self.totals = None      # indexed by player_id: games + STATS to date
+        self.weeks = set()
+
+    @classmethod
+    @profiling.timed('model.online.fit')
+    def fit(cls, wr_data, kind='sgd', params=None):
+        # base model on historical season totals (calculate_advanced_metrics)
+        from sklearn.preprocessing import StandardScaler
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        clean = wr_data.dropna(subset=FEATURES + [TARGET])
+        # float64 throughout: SGDRegressor keeps the dtype of its first fit
+        X = clean[FEATURES].to_numpy(dtype='float64')
+        scaler = StandardScaler().fit(X)
+        X, y = scaler.transform(X), clean[TARGET].to_numpy(dtype='float64')
+        if kind == 'sgd':
+            from sklearn.linear_model import SGDRegressor
+            model = SGDRegressor(alpha=1e-4, random_state=42)
+        else:
+            model = make_model('XGBoost', (params or load_best_params())['XGBoost'])
+        model.fit(X, y)
+        return cls(model, scaler, kind)
+
+    def start_season(self, season, players):
+        # players: player_id, name, age, weight, height, apy (NaN without a
+        # contract), e.g. season_players(season)
+        self.season = int(season)
+        self.players = players.drop_duplicates('player_id').set_index('player_id')[STATIC + [TARGET]]
+        self.totals = pd.DataFrame(columns=['games'] + STATS, dtype='float64').rename_axis('player_id')
+        self.weeks = set()
+        return self
+
+    def _features(self, player_ids):
+        totals = self.totals.loc[player_ids]
+        static = self.players.reindex(player_ids)
+        features = pd.DataFrame(index=totals.index)
+        features['receiving_yards_per_game'] = totals['receiving_yards'] / totals['games']
+        features['receptions_per_game'] = totals['receptions'] / totals['games']
+        features['touchdowns_per_game'] = totals['receiving_tds'] / totals['games']
+        features['targets_per_game'] = totals['targets'] / totals['games']
+        for column in ('age', 'weight', 'height'):
+            features[column] = static[column].to_numpy(dtype=float)
+        # share of the games played so far, on the scale of games / 17
+        features['availability'] = totals['games'] / max(self.weeks)
+        return features[FEATURES], static[TARGET].to_numpy(dtype=float)
+
+    def _learn(self, X, y):
+        if self.kind == 'sgd':
+            self.model.partial_fit(X, y)
+        else:
+            base = {name: self.model.get_params()[name] for name in ('n_estimators', 'learning_rate')}
+            self.model.set_params(n_estimators=UPDATE_ROUNDS, learning_rate=UPDATE_LEARNING_RATE)
+            self.model.fit(X, y, xgb_model=self.model.get_booster())
+            self.model.set_params(**base)
+
+    @profiling.timed('model.online.update')
+    def update(self, weekly):
+        # weekly: weekly stat rows (get_weekly_data); weeks already ingested
+        # are skipped, so the whole season so far can be passed each time
+        if self.season is None:
+            raise ValueError("start_season must be called before update")
+        weekly = weekly[(weekly['season'] == self.season) & ~weekly['week'].isin(self.weeks)]
+        if 'season_type' in weekly.columns:
+            weekly = weekly[weekly['season_type'] == 'REG']
+        weekly = weekly[weekly['player_id'].isin(self.players.index) & (weekly['targets'] > 0)]
+        if weekly.empty:
+            return []
+        grouped = weekly.groupby('player_id', sort=False, observed=True)
+        week = grouped[STATS].sum().assign(games=grouped.size())
+        # plain string ids, so totals align across weeks whatever the
+        # categories of each week's player_id
+        week.index = week.index.astype(str)
+        self.totals = self.totals.add(week, fill_value=0)
+        new_weeks = sorted(int(w) for w in weekly['week'].unique())
+        self.weeks.update(new_weeks)
+        profiling.count('online_rows', len(weekly))
+
+        features, apy = self._features(week.index)
+        labelled = ~np.isnan(apy) & features.notna().all(axis=1).to_numpy()
+        if labelled.any():
+            with profiling.stage(f'model.online.learn.{self.kind}'):
+                self._learn(self.scaler.transform(features[labelled].to_numpy()), apy[labelled])
+        logger.info("Ingested %s week(s) %s: %d players, %d labelled", self.season, new_weeks, len(week),
+                    labelled.sum())
+        return new_weeks
+
+    def predictions(self):
+        # every receiver with a game this season: features to date and the
+        # current predicted APY
+        if self.totals is None or self.totals.empty:
+            return pd.DataFrame(columns=['player_id', 'name'] + FEATURES + [TARGET, 'predicted_apy'])
+        features, apy = self._features(self.totals.index)
+        features = features.dropna()
+        predicted = self.model.predict(self.scaler.transform(features.to_numpy()))
+        result = features.assign(apy=self.players[TARGET].reindex(features.index).to_numpy(),
+                                 predicted_apy=predicted)
+        result.insert(0, 'name', self.players['name'].reindex(features.index).to_numpy())
+        return result.reset_index()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def weekly_update(season, kind='sgd', history=range(2013, 2024), root=None):
+    # load (or fit and start) the season's model, ingest the weeks it has
+    # not seen and save it; returns the model
+    from src.features.nfl_data import get_weekly_data, get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics
+    path = online_model_path(season, kind, root)
+    if os.path.exists(path):
+        model = OnlineApyModel.load(path)
+    else:
+        model = OnlineApyModel.fit(calculate_advanced_metrics(get_wr_data(history)), kind)
+        model.start_season(season, season_players(season))
+    if model.update(get_weekly_data(season, incremental=True)):
+        model.save(path)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new weeks into the in-season APY model.")
+    parser.add_argument('season', type=int)
+    parser.add_argument('--kind', choices=KINDS, default='sgd')
+    parser.add_argument('--history', type=int, nargs=2, default=[2013, 2023], metavar=('FIRST', 'LAST'),
+                        help="seasons the base model is fitted on, when the season has no model yet")
+    parser.add_argument('--out', default=None, help="write the predictions as parquet")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    model = weekly_update(args.season, args.kind, range(args.history[0], args.history[1] + 1))
+    predictions = model.predictions().sort_values('predicted_apy', ascending=False)
+    if args.out:
+        predictions.to_parquet(args.out, index=False)
+    print(predictions.head(25).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
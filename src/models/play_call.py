@@ -0,0 +1,177 @@
+import argparse
+import logging
+import os
+import re
+import tempfile
+import numpy as np
+import pandas as pd
+from src.features.cache import cached_frame
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Run/pass prediction from the pre-snap situation, trained on every season
+# of play-by-play without holding more than one season in memory.
+#
+# Each season is reduced once to a small feature partition (FEATURES as
+# float32 plus the label, cached under data/cache/play_call/), so the full
+# PBP frame of a season is only loaded to build its partition. Training
+# streams the partitions through an xgboost DataIter into an
+# ExtMemQuantileDMatrix: XGBoost sketches the quantiles batch by batch and
+# keeps the binned pages in an on-disk cache, so peak RAM is one partition
+# plus the histogram pages rather than every play since 1999.
+#
+#   booster = train_play_call_model(range(1999, 2023), valid_seasons=[2023])
+#   predictions = predict_season(booster, 2023)      # one row per run/pass play
+#   python -m src.models.play_call --seasons 1999 2022 --valid 2023
+
+MODEL_PATH = os.environ.get('NFL_QUANT_PLAY_CALL_MODEL', os.path.join('data', 'models', 'play_call.ubj'))
+PERSONNEL_POSITIONS = ['RB', 'TE', 'WR']
+FEATURES = [
+    'down', 'ydstogo', 'yardline_100', 'score_differential', 'game_seconds_remaining',
+    'half_seconds_remaining', 'qtr', 'posteam_timeouts_remaining', 'defteam_timeouts_remaining',
+    'shotgun', 'no_huddle', 'personnel_rb', 'personnel_te', 'personnel_wr',
+]
+KEYS = ['game_id', 'play_id']
+LABEL = 'is_pass'
+DEFAULT_PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': ['logloss', 'error'],
+    'tree_method': 'hist',
+    'max_depth': 6,
+    'eta': 0.1,
+    'subsample': 0.8,
+    'min_child_weight': 5,
+}
+ROUNDS = 300
+
+
+def personnel_counts(personnel):
+    # '1 RB, 1 TE, 3 WR' -> RB/TE/WR counts; parsed once per distinct value
+    values = personnel.astype('category')
+    categories = values.cat.categories
+    counts = {}
+    for position in PERSONNEL_POSITIONS:
+        parsed = [re.search(rf"(\d+) {position}", str(c)) for c in categories]
+        table = np.array([float(m.group(1)) if m else 0.0 for m in parsed] + [np.nan], dtype='float32')
+        # code -1 (missing) picks the trailing NaN
+        counts[f"personnel_{position.lower()}"] = table[values.cat.codes.to_numpy()]
+    return pd.DataFrame(counts, index=personnel.index)
+
+
+def play_call_features(pbp):
+    # run and pass plays only: KEYS, FEATURES as float32 and the label
+    plays = pbp[pbp['play_type'].isin(['run', 'pass'])]
+    columns = {key: plays[key].astype(str).to_numpy() if key == 'game_id' else plays[key].to_numpy(dtype='float64')
+               for key in KEYS}
+    for feature in FEATURES:
+        if feature.startswith('personnel_'):
+            continue
+        if feature in plays:
+            columns[feature] = plays[feature].to_numpy(dtype='float32', na_value=np.nan)
+        else:
+            columns[feature] = np.full(len(plays), np.nan, dtype='float32')
+    if 'offense_personnel' in plays:
+        columns.update({k: v.to_numpy() for k, v in personnel_counts(plays['offense_personnel']).items()})
+    else:
+        columns.update({f"personnel_{p.lower()}": np.full(len(plays), np.nan, dtype='float32')
+                        for p in PERSONNEL_POSITIONS})
+    columns[LABEL] = (plays['play_type'] == 'pass').to_numpy(dtype='float32')
+    return pd.DataFrame(columns)[KEYS + FEATURES + [LABEL]]
+
+
+def season_partition(season, refresh=False, cache_dir=None):
+    # one season's feature partition; the season's PBP is loaded only on a
+    # cache miss and dropped once reduced
+    def build():
+        from src.features.nfl_data import get_play_by_play_data
+        return play_call_features(get_play_by_play_data(season))
+    return cached_frame('play_call', int(season), build, refresh=refresh, cache_dir=cache_dir)
+
+
+def _season_iter(seasons, cache_prefix, cache_dir=None):
+    import xgboost as xgb
+
+    class SeasonIter(xgb.DataIter):
+        # feeds one season partition per batch
+        def __init__(self):
+            self._position = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._position == len(seasons):
+                return False
+            partition = season_partition(seasons[self._position], cache_dir=cache_dir)
+            input_data(data=partition[FEATURES].to_numpy(), label=partition[LABEL].to_numpy())
+            profiling.count('play_call_batches')
+            self._position += 1
+            return True
+
+        def reset(self):
+            self._position = 0
+
+    return SeasonIter()
+
+
+@profiling.timed('model.play_call.train')
+def train_play_call_model(seasons, valid_seasons=(), params=None, rounds=ROUNDS, cache_dir=None, workdir=None):
+    # booster trained over all seasons out of core; valid_seasons are
+    # scored each round. workdir holds the external-memory pages
+    import xgboost as xgb
+    seasons, valid_seasons = [int(s) for s in seasons], [int(s) for s in valid_seasons]
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    with tempfile.TemporaryDirectory(dir=workdir) as pages:
+        train = xgb.ExtMemQuantileDMatrix(_season_iter(seasons, os.path.join(pages, 'train'), cache_dir),
+                                          max_bin=params.get('max_bin', 256))
+        evals = [(train, 'train')]
+        if valid_seasons:
+            evals.append((xgb.ExtMemQuantileDMatrix(_season_iter(valid_seasons, os.path.join(pages, 'valid'), cache_dir),
+                                                    ref=train), 'valid'))
+        history = {}
+        booster = xgb.train(params, train, rounds, evals=evals, evals_result=history, verbose_eval=False)
+        # the matrices remove their page files when freed, which has to
+        # happen before the directory is removed
+        del train, evals
+    for name, metrics in history.items():
+        logger.info("%s: %s", name, ', '.join(f"{metric} {values[-1]:.4f}" for metric, values in metrics.items()))
+    booster.set_attr(seasons=f"{seasons[0]}-{seasons[-1]}", features=','.join(FEATURES))
+    return booster
+
+
+def load_play_call_model(path=None):
+    import xgboost as xgb
+    booster = xgb.Booster()
+    booster.load_model(path or MODEL_PATH)
+    return booster
+
+
+@profiling.timed('model.play_call.predict')
+def predict_season(booster, season, cache_dir=None):
+    # pass probability for every run/pass play of a season in one call
+    partition = season_partition(season, cache_dir=cache_dir)
+    predictions = partition[KEYS + [LABEL]].copy()
+    predictions['pass_probability'] = booster.inplace_predict(partition[FEATURES].to_numpy())
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the run/pass model over PBP seasons, out of core.")
+    parser.add_argument('--seasons', type=int, nargs=2, default=[1999, 2022], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--valid', type=int, nargs='*', default=[2023], help="held-out seasons")
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--out', default=MODEL_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    booster = train_play_call_model(range(args.seasons[0], args.seasons[1] + 1), args.valid, rounds=args.rounds)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    booster.save_model(args.out)
+    logger.info("Saved play-call model to %s", args.out)
+    for season in args.valid:
+        predictions = predict_season(booster, season)
+        accuracy = ((predictions['pass_probability'] > 0.5) == predictions[LABEL].astype(bool)).mean()
+        logger.info("%d: %d plays, accuracy %.3f", season, len(predictions), accuracy)
+
+
+if __name__ == "__main__":
+    main()
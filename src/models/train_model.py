@@ -1,7 +1,7 @@
 
-from sklearn.linear_model import LogisticRegression
 
 def train_logistic_regression(X_train, y_train):
+    from sklearn.linear_model import LogisticRegression
     model = LogisticRegression()
     model.fit(X_train, y_train)
     return model
@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import numpy as np
+import pandas as pd
+from src.models.apy_model import BEST_PARAMS_PATH, DEFAULT_PARAMS, make_model
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Successive-halving hyperparameter search for the APY models.
+#
+# Each model samples n_configs configurations from its search space. Every
+# rung fits the surviving configurations on a growing fraction of the
+# training rows (min_fraction, min_fraction * eta, ..., 1) and scores them
+# by R2 on a fixed validation split; the best 1/eta move on. Trials of a
+# rung, across all models, run in a process pool whose workers receive the
+# data once at start-up.
+#
+# Every finished trial is appended to TUNING_DIR/trials.jsonl under a key of
+# (model, params, fraction, data hash). Configurations are drawn from a
+# seeded generator, so rerunning an interrupted search asks for the same
+# trials and reads the finished ones from the cache. The winner per model is
+# written to BEST_PARAMS_PATH, which run_regression_models (and so the app)
+# loads.
+#
+#   python -m src.models.tuning --workers 4
+#   python -m src.models.tuning --models XGBoost --configs 81
+
+TUNING_DIR = os.environ.get('NFL_QUANT_TUNING_DIR', os.path.join('data', 'tuning'))
+
+# name -> param -> (kind, low, high) or list of choices
+SEARCH_SPACES = {
+    'Lasso': {
+        'alpha': ('log', 1e-4, 10.0),
+    },
+    'Random Forest': {
+        'n_estimators': ('int', 50, 400),
+        'max_depth': [None, 4, 6, 8, 12, 16],
+        'min_samples_leaf': ('int', 1, 10),
+        'max_features': [1.0, 0.5, 'sqrt'],
+    },
+    'XGBoost': {
+        'n_estimators': ('int', 50, 600),
+        'max_depth': ('int', 2, 8),
+        'learning_rate': ('log', 0.01, 0.3),
+        'subsample': ('float', 0.6, 1.0),
+        'colsample_bytree': ('float', 0.5, 1.0),
+        'min_child_weight': ('int', 1, 10),
+        'reg_lambda': ('log', 0.1, 10.0),
+    },
+}
+
+# settings for every trial fit; pool workers each get one core
+TRIAL_SETTINGS = {
+    'Random Forest': {'n_jobs': 1},
+    'XGBoost': {'n_jobs': 1},
+}
+
+
+def sample_configs(space, n, seed=0):
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n):
+        params = {}
+        for name, spec in space.items():
+            if isinstance(spec, list):
+                params[name] = spec[rng.integers(len(spec))]
+            elif spec[0] == 'int':
+                params[name] = int(rng.integers(spec[1], spec[2] + 1))
+            elif spec[0] == 'log':
+                params[name] = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+            else:
+                params[name] = float(rng.uniform(spec[1], spec[2]))
+        configs.append(params)
+    return configs
+
+
+def data_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(pd.DataFrame(X).reset_index(drop=True), index=True).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def trial_key(model, params, fraction, dataset):
+    payload = json.dumps([model, params, round(fraction, 6), dataset], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class TrialCache:
+    # append-only JSONL of finished trials; reopening it resumes a search
+    def __init__(self, path):
+        self.path = path
+        self.trials = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    # a run killed mid-write leaves at most one partial line
+                    try:
+                        trial = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.trials[trial['key']] = trial
+
+    def __contains__(self, key):
+        return key in self.trials
+
+    def __getitem__(self, key):
+        return self.trials[key]
+
+    def add(self, trial):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(trial) + '\n')
+        self.trials[trial['key']] = trial
+
+
+_WORKER_DATA = None
+
+
+def _init_worker(X_fit, y_fit, X_val, y_val):
+    global _WORKER_DATA
+    _WORKER_DATA = (X_fit, y_fit, X_val, y_val)
+
+
+def _run_trial(model, params, fraction):
+    from sklearn.metrics import r2_score
+    import time
+    X_fit, y_fit, X_val, y_val = _WORKER_DATA
+    n = max(int(round(fraction * len(X_fit))), 2)
+    start = time.perf_counter()
+    estimator = make_model(model, params, **TRIAL_SETTINGS.get(model, {}))
+    estimator.fit(X_fit[:n], y_fit[:n])
+    score = r2_score(y_val, estimator.predict(X_val))
+    return {'score': float(score), 'rows': n, 'seconds': time.perf_counter() - start}
+
+
+def _rungs(min_fraction, eta):
+    # 1, 1/eta, 1/eta**2, ... down to min_fraction, smallest first
+    fractions = [1.0]
+    while fractions[-1] / eta >= min_fraction:
+        fractions.append(fractions[-1] / eta)
+    return fractions[::-1]
+
+
+@profiling.timed('model.tune')
+def successive_halving(X_train, y_train, models=None, n_configs=27, eta=3, min_fraction=0.1,
+                       val_fraction=0.2, workers=None, cache_dir=None, seed=42):
+    # returns {model: {'params', 'score', 'configs', 'data'}}, best configuration per model
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    models = list(models or SEARCH_SPACES)
+    X = np.asarray(X_train, dtype=np.float64)
+    y = np.asarray(y_train, dtype=np.float64)
+    dataset = data_hash(X, y)
+    cache = TrialCache(os.path.join(cache_dir or TUNING_DIR, 'trials.jsonl'))
+
+    # fixed shuffle, so every rung's subsample is a prefix of the next one's
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_val = max(int(len(X) * val_fraction), 1)
+    val, fit = order[:n_val], order[n_val:]
+
+    # the current defaults always compete, so tuning never does worse than them
+    candidates = {
+        model: [DEFAULT_PARAMS[model]] + sample_configs(SEARCH_SPACES[model], n_configs - 1, seed)
+        for model in models
+    }
+    fractions = _rungs(min_fraction, eta)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X[fit], y[fit], X[val], y[val])) as pool:
+        for rung, fraction in enumerate(fractions):
+            pending, submitted = {}, {}
+            for model, configs in candidates.items():
+                for params in configs:
+                    key = trial_key(model, params, fraction, dataset)
+                    if key in cache:
+                        profiling.count('tuning_trials_cached')
+                    elif key not in submitted:
+                        future = pool.submit(_run_trial, model, params, fraction)
+                        pending[future] = key
+                        submitted[key] = (model, params)
+            # cached as each trial finishes, so an interrupted rung keeps its progress
+            for future in as_completed(pending):
+                key = pending[future]
+                model, params = submitted[key]
+                cache.add(dict(future.result(), key=key, model=model, params=params, fraction=fraction, data=dataset))
+                profiling.count('tuning_trials_run')
+            logger.info("Rung %d/%d (%.0f%% of rows): %d trials run, %d from cache",
+                        rung + 1, len(fractions), 100 * fraction, len(pending),
+                        sum(len(c) for c in candidates.values()) - len(pending))
+
+            for model, configs in candidates.items():
+                ranked = sorted(configs, key=lambda p: -cache[trial_key(model, p, fraction, dataset)]['score'])
+                keep = max(1, math.ceil(len(ranked) / eta)) if rung < len(fractions) - 1 else 1
+                candidates[model] = ranked[:keep]
+
+    best = {}
+    for model, (params,) in candidates.items():
+        score = cache[trial_key(model, params, 1.0, dataset)]['score']
+        best[model] = {'params': params, 'score': score, 'configs': n_configs, 'data': dataset}
+    return best
+
+
+def write_best_params(best, path=None):
+    path = path or BEST_PARAMS_PATH
+    existing = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)['models']
+    # tuning a subset of models keeps the others' earlier results
+    existing.update({name: {'params': e['params'], 'score': e['score'], 'data': e['data']} for name, e in best.items()})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'models': existing}, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    from src.features.nfl_data import get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics, prepare_for_regression
+
+    parser = argparse.ArgumentParser(description="Tune the APY models by successive halving.")
+    parser.add_argument('--first-season', type=int, default=2013)
+    parser.add_argument('--last-season', type=int, default=2023)
+    parser.add_argument('--models', nargs='+', choices=list(SEARCH_SPACES), default=None)
+    parser.add_argument('--configs', type=int, default=27, help="configurations sampled per model")
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=BEST_PARAMS_PATH)
+    args = parser.parse_args()
+
+    wr_data = calculate_advanced_metrics(get_wr_data(range(args.first_season, args.last_season + 1)))
+    (X_train, _, y_train, _), _, _ = prepare_for_regression(wr_data)
+    best = successive_halving(X_train, y_train, models=args.models, n_configs=args.configs,
+                              eta=args.eta, workers=args.workers)
+    write_best_params(best, args.out)
+    for name, entry in best.items():
+        print(f"{name}: R2 {entry['score']:.3f} {entry['params']}")
+
+
+if __name__ == "__main__":
+    main()
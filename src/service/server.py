@@ -0,0 +1,300 @@
+import argparse
+import inspect
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from src.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# Local JSON service over the app's analyses, for tools that cannot use the
+# Streamlit pages.
+#
+#   GET /health
+#   GET /tendencies?personnel=1 RB, 1 TE, 3 WR&season=2023&team=KC
+#   GET /fourth-down?first_season=2019&last_season=2023
+#   GET /fourth-down/simulate?score_differential=-3&yardline_100=38&ydstogo=2&game_seconds_remaining=420
+#   GET /player-quality?name=Justin Jefferson
+#   GET /apy?name=Justin Jefferson&comps=5
+#
+# Datasets are loaded and models fitted once at startup (load_service).
+# Tendency and 4th-down tables are answered from additive count tables
+# built at startup. Responses are kept in an LRU keyed by path and sorted
+# query parameters, so a repeated query is a dictionary lookup and a write
+# of the stored bytes. The simulator is CPU-bound and runs in a process
+# pool whose workers receive the drive model once, so it never blocks the
+# request threads' interpreter.
+#
+#   python -m src.service.server --port 8765 --workers 2
+#   curl 'localhost:8765/apy?name=Justin%20Jefferson'
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 4096
+SIMULATED_GAMES = 20000
+UNCACHED = {'/health'}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _jsonable(value):
+    if isinstance(value, pd.DataFrame):
+        return [_jsonable(row) for row in value.to_dict('records')]
+    if isinstance(value, pd.Series):
+        return _jsonable(value.to_dict())
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is pd.NA or value is pd.NaT or (isinstance(value, float) and not np.isfinite(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+class ResponseCache:
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_WORKER_DRIVE_MODEL = None
+
+
+def _init_worker(drive_model):
+    global _WORKER_DRIVE_MODEL
+    _WORKER_DRIVE_MODEL = drive_model
+
+
+def _simulate(situation, games, seed):
+    from src.analysis.drive_simulator import simulate_decisions
+    return simulate_decisions(_WORKER_DRIVE_MODEL, situation, n=games, seed=seed)
+
+
+class AnalyticsService:
+    def __init__(self, pbp=None, wr_data=None, apy_model=None, drive_model=None, workers=0, cache_size=CACHE_SIZE):
+        # apy_model: (model, scaler, features) from fit_best_model
+        from src.analysis.fourth_down_analysis import fourth_down_counts
+        from src.analysis.offensive_tendencies import tendency_counts
+        self.tendency_counts = tendency_counts(pbp) if pbp is not None else None
+        self.fourth_down_counts = fourth_down_counts(pbp) if pbp is not None else None
+        self.wr_data = wr_data
+        self.apy_model = apy_model
+        self.comps = None
+        if wr_data is not None and apy_model is not None:
+            from src.models.apy_comps import ApyComps
+            self.comps = ApyComps(wr_data, apy_model[1], apy_model[2])
+        self.drive_model = drive_model
+        self.cache = ResponseCache(cache_size)
+        self.pool = None
+        if drive_model is not None and workers:
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(drive_model,))
+        self.routes = {
+            '/health': self.health,
+            '/tendencies': self.tendencies,
+            '/fourth-down': self.fourth_down,
+            '/fourth-down/simulate': self.simulate,
+            '/player-quality': self.player_quality,
+            '/apy': self.apy,
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def handle(self, path, params):
+        # (status, JSON bytes); params maps name -> value
+        if path not in self.routes:
+            return 404, json.dumps({'error': f"unknown path {path}"}).encode()
+        key = (path, tuple(sorted(params.items())))
+        body = self.cache.get(key) if path not in UNCACHED else None
+        if body is not None:
+            profiling.count('service_cache_hits')
+            return 200, body
+        route = self.routes[path]
+        try:
+            inspect.signature(route).bind(**params)
+        except TypeError as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+        try:
+            with profiling.stage(f"service{path.replace('/', '.')}"):
+                body = json.dumps(_jsonable(route(**params))).encode()
+        except ServiceError as e:
+            return e.status, json.dumps({'error': str(e)}).encode()
+        except ValueError as e:
+            # a parameter that does not parse, e.g. season=abc
+            return 400, json.dumps({'error': str(e)}).encode()
+        except Exception:
+            logger.exception("Request to %s failed", path)
+            return 500, json.dumps({'error': 'internal error'}).encode()
+        self.cache.put(key, body)
+        return 200, body
+
+    def _require(self, dataset, name):
+        if dataset is None:
+            raise ServiceError(503, f"{name} not loaded")
+        return dataset
+
+    def _wr_rows(self, name):
+        wr_data = self._require(self.wr_data, 'WR data')
+        rows = wr_data[wr_data['name'] == name]
+        if rows.empty:
+            raise ServiceError(404, f"no WR named {name!r}")
+        return rows
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'pbp': self.tendency_counts is not None,
+            'wr_data': self.wr_data is not None,
+            'apy_model': self.apy_model is not None,
+            'drive_model': self.drive_model is not None,
+            'cached_responses': len(self.cache),
+        }
+
+    def tendencies(self, personnel='1 RB, 1 TE, 3 WR', season=None, team=None):
+        from src.analysis.offensive_tendencies import tendencies_from_counts
+        counts = self._require(self.tendency_counts, 'play-by-play')
+        if season is not None:
+            counts = counts[counts['season'] == int(season)]
+        if team is not None:
+            counts = counts[counts['posteam'] == team]
+        tendencies, down_tendencies, _ = tendencies_from_counts(counts, personnel)
+        return {'tendencies': tendencies, 'by_down': down_tendencies.reset_index()}
+
+    def fourth_down(self, first_season=None, last_season=None):
+        from src.analysis.fourth_down_analysis import fourth_down_tables
+        counts = self._require(self.fourth_down_counts, 'play-by-play')
+        if first_season is not None:
+            counts = counts[counts['season'] >= int(first_season)]
+        if last_season is not None:
+            counts = counts[counts['season'] <= int(last_season)]
+        decisions, success_rates = fourth_down_tables(counts)
+        return {'decisions': decisions, 'success_rates': success_rates}
+
+    def simulate(self, score_differential, yardline_100, ydstogo, game_seconds_remaining, games=SIMULATED_GAMES,
+                 seed=0):
+        self._require(self.drive_model, 'drive model')
+        situation = {'score_differential': int(score_differential), 'yardline_100': int(yardline_100),
+                     'ydstogo': int(ydstogo), 'game_seconds_remaining': float(game_seconds_remaining)}
+        games, seed = int(games), int(seed)
+        if self.pool is not None:
+            return self.pool.submit(_simulate, situation, games, seed).result()
+        from src.analysis.drive_simulator import simulate_decisions
+        return simulate_decisions(self.drive_model, situation, n=games, seed=seed)
+
+    def player_quality(self, name):
+        from src.analysis.player_quality import assess_player_quality
+        rows = self._wr_rows(name)
+        latest = rows.iloc[[-1]]
+        season = latest['season'].iloc[0]
+        position = self.wr_data[self.wr_data['season'] == season]
+        return {'player': name, 'season': season, 'percentiles': assess_player_quality(latest, position)}
+
+    def apy(self, name, comps=5):
+        from src.models.apy_model import evaluate_player
+        model, scaler, features = self._require(self.apy_model, 'APY model')
+        rows = self._wr_rows(name)
+        evaluation = evaluate_player(name, rows, model, scaler, features)
+        evaluation['comps'] = self.comps.query(rows.iloc[[-1]], k=int(comps), age_window=2)
+        return evaluation
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, so clients can reuse one connection; without
+        # TCP_NODELAY the separate header and body writes wait ~40 ms on
+        # delayed ACKs
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            status, body = service.handle(url.path.rstrip('/') or '/', params)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT):
+    # port=0 picks a free port; see server.server_address
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def load_service(pbp_seasons=range(2019, 2024), wr_seasons=range(2013, 2024), workers=2, cache_size=CACHE_SIZE):
+    from src.analysis.drive_simulator import DriveModel
+    from src.features.nfl_data import get_play_by_play_data, get_wr_data
+    from src.models.apy_model import calculate_advanced_metrics, fit_best_model
+    pbp = pd.concat([get_play_by_play_data(season) for season in pbp_seasons], ignore_index=True)
+    wr_data = calculate_advanced_metrics(get_wr_data(wr_seasons))
+    service = AnalyticsService(pbp, wr_data, fit_best_model(wr_data), DriveModel.fit(pbp), workers, cache_size)
+    logger.info("Loaded %d plays and %d WR seasons", len(pbp), len(wr_data))
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the analyses as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--pbp-seasons', type=int, nargs=2, default=[2019, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--wr-seasons', type=int, nargs=2, default=[2013, 2023], metavar=('FIRST', 'LAST'))
+    parser.add_argument('--workers', type=int, default=2, help="processes for the simulator endpoint")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="responses kept in the LRU")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    service = load_service(range(args.pbp_seasons[0], args.pbp_seasons[1] + 1),
+                           range(args.wr_seasons[0], args.wr_seasons[1] + 1), args.workers, args.cache_size)
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Synthetic-but-realistic inputs for the tests and the benchmark suite,
+# kept under src/ so that both import it without depending on each other.
+# Column names and value ranges follow what nfl_data_py and the Next Gen
+# route charts return, so the code under test runs unmodified and offline.
+
+TEAMS = [
+    'ARI', 'ATL', 'BAL', 'BUF', 'CAR', 'CHI', 'CIN', 'CLE', 'DAL', 'DEN', 'DET',
+    'GB', 'HOU', 'IND', 'JAX', 'KC', 'LA', 'LAC', 'LV', 'MIA', 'MIN', 'NE', 'NO',
+    'NYG', 'NYJ', 'PHI', 'PIT', 'SEA', 'SF', 'TB', 'TEN', 'WAS'
+]
+PLAY_TYPES = ['pass', 'run', 'punt', 'field_goal', 'no_play', 'qb_kneel', 'qb_spike', 'kickoff', 'extra_point']
+PLAY_TYPE_WEIGHTS = [0.42, 0.30, 0.05, 0.03, 0.08, 0.01, 0.005, 0.06, 0.045]
+PERSONNEL = [
+    '1 RB, 1 TE, 3 WR', '1 RB, 2 TE, 2 WR', '2 RB, 1 TE, 2 WR', '1 RB, 3 TE, 1 WR',
+    '0 RB, 1 TE, 4 WR', '2 RB, 2 TE, 1 WR', '6 OL, 1 RB, 2 TE, 1 WR'
+]
+PERSONNEL_WEIGHTS = [0.6, 0.2, 0.07, 0.04, 0.04, 0.03, 0.02]
+POSITIONS = ['WR', 'TE', 'RB', 'QB']
+PLAYS_PER_SEASON = 48000
+GAMES_PER_SEASON = 272
+
+# BGR colours used by the Next Gen route charts
+CHART_BACKGROUND = (38, 38, 38)
+CHART_COMPLETE = (255, 255, 255)
+CHART_YAC = (60, 200, 60)
+CHART_INCOMPLETE = (129, 129, 129)
+
+
+def make_pbp(n_seasons, first_season=2013, plays_per_season=PLAYS_PER_SEASON, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in range(first_season, first_season + n_seasons):
+        n = plays_per_season
+        game_idx = rng.integers(0, GAMES_PER_SEASON, n)
+        week = game_idx // 16 + 1
+        home = np.array(TEAMS)[game_idx % 32]
+        away = np.array(TEAMS)[(game_idx * 7 + 3) % 32]
+        game_id = pd.Series([f"{season}_{w:02d}_{a}_{h}" for w, a, h in zip(week, away, home)])
+        posteam_home = rng.random(n) < 0.5
+        down = rng.choice([1.0, 2.0, 3.0, 4.0, np.nan], n, p=[0.36, 0.27, 0.18, 0.06, 0.13])
+        play_type = rng.choice(PLAY_TYPES, n, p=PLAY_TYPE_WEIGHTS)
+        yards_gained = np.clip(np.round(rng.normal(4.5, 8.0, n)), -15, 99)
+        game_seconds_remaining = rng.integers(0, 3600, n).astype(float)
+        frames.append(pd.DataFrame({
+            'play_id': np.arange(n, dtype=float) + 1,
+            'game_id': game_id,
+            'season': season,
+            'week': week,
+            'season_type': 'REG',
+            'home_team': home,
+            'away_team': away,
+            'posteam': np.where(posteam_home, home, away),
+            'defteam': np.where(posteam_home, away, home),
+            'qtr': np.clip(4 - game_seconds_remaining // 900, 1, 4),
+            'game_seconds_remaining': game_seconds_remaining,
+            'half_seconds_remaining': game_seconds_remaining % 1800,
+            'down': down,
+            'ydstogo': rng.integers(1, 21, n).astype(float),
+            'yardline_100': rng.integers(1, 100, n).astype(float),
+            'play_type': play_type,
+            'offense_personnel': rng.choice(PERSONNEL, n, p=PERSONNEL_WEIGHTS),
+            'defense_personnel': rng.choice(['4 DL, 2 LB, 5 DB', '3 DL, 3 LB, 5 DB', '4 DL, 3 LB, 4 DB'], n),
+            'offense_formation': rng.choice(['SHOTGUN', 'SINGLEBACK', 'I_FORM', 'EMPTY', 'PISTOL'], n),
+            'shotgun': (rng.random(n) < 0.6).astype(float),
+            'no_huddle': (rng.random(n) < 0.08).astype(float),
+            'yards_gained': yards_gained,
+            'success': (yards_gained > 3).astype(float),
+            'epa': rng.normal(0.0, 1.4, n),
+            'wp': rng.random(n),
+            'score_differential': rng.integers(-28, 29, n).astype(float),
+            'posteam_timeouts_remaining': rng.integers(0, 4, n).astype(float),
+            'defteam_timeouts_remaining': rng.integers(0, 4, n).astype(float),
+            'passer_player_name': rng.choice(['J.Allen', 'P.Mahomes', 'J.Hurts', None], n),
+            'desc': 'synthetic play description',
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_optimized_pbp(n_seasons, **kwargs):
+    # make_pbp as the loaders return it, with the compact dtypes
+    from src.features.dtypes import optimize_dtypes
+    return optimize_dtypes(make_pbp(n_seasons, **kwargs), 'pbp')
+
+def make_ftn(pbp, charted_share=0.95, seed=0):
+    # FTN charting rows for most plays in pbp, keyed like nflverse
+    rng = np.random.default_rng(seed)
+    plays = pbp[rng.uniform(size=len(pbp)) < charted_share]
+    n = len(plays)
+    pass_rushers = rng.integers(3, 7, n)
+    return pd.DataFrame({
+        'ftn_game_id': pd.factorize(plays['game_id'])[0] + 5000,
+        'nflverse_game_id': plays['game_id'].astype(str).values,
+        'season': plays['season'].values,
+        'week': plays['week'].values,
+        'ftn_play_id': np.arange(n),
+        'nflverse_play_id': plays['play_id'].astype(int).values,
+        'starting_hash': rng.choice(['L', 'M', 'R'], n, p=[0.4, 0.2, 0.4]),
+        'qb_location': rng.choice(['S', 'U', 'P', '0'], n, p=[0.6, 0.3, 0.08, 0.02]),
+        'n_offense_backfield': rng.integers(0, 4, n),
+        'n_defense_box': rng.integers(4, 9, n),
+        'is_no_huddle': rng.random(n) < 0.08,
+        'is_motion': rng.random(n) < 0.45,
+        'is_play_action': rng.random(n) < 0.2,
+        'is_screen_pass': rng.random(n) < 0.05,
+        'is_rpo': rng.random(n) < 0.07,
+        'is_trick_play': rng.random(n) < 0.01,
+        'is_qb_out_of_pocket': rng.random(n) < 0.1,
+        'read_thrown': rng.choice(['1', '2', '3', 'CHECKDOWN', None], n),
+        'n_blitzers': np.maximum(pass_rushers - 4, 0),
+        'n_pass_rushers': pass_rushers,
+    })
+
+
+def make_player_ids(n_players, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = pd.DataFrame({
+        'gsis_id': [f"00-{i:07d}" for i in range(n_players)],
+        'name': [f"Player {i}" for i in range(n_players)],
+        'position': rng.choice(POSITIONS, n_players, p=[0.45, 0.2, 0.25, 0.1]),
+        'weight': rng.integers(170, 260, n_players).astype(float),
+        'height': rng.integers(68, 78, n_players).astype(float),
+        'age': rng.integers(21, 37, n_players).astype(float),
+        'draft_year': rng.integers(2005, 2024, n_players).astype(float),
+    })
+    # ages are as of the 2023 season
+    ids['birthdate'] = pd.to_datetime((2023 - ids['age']).astype(int).astype(str) + '-06-01')
+    return ids
+
+
+def make_seasonal(player_ids, years, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in years:
+        n = len(player_ids)
+        targets = rng.integers(0, 180, n).astype(float)
+        receptions = np.floor(targets * rng.uniform(0.4, 0.8, n))
+        frames.append(pd.DataFrame({
+            'player_id': player_ids['gsis_id'].values,
+            'season': season,
+            'season_type': 'REG',
+            'games': rng.integers(1, 18, n),
+            'targets': targets,
+            'receptions': receptions,
+            'receiving_yards': receptions * rng.uniform(6, 16, n),
+            'receiving_tds': rng.integers(0, 15, n).astype(float),
+            'passing_yards': rng.integers(0, 5000, n).astype(float),
+            'rushing_yards': rng.integers(0, 1800, n).astype(float),
+            'fantasy_points_ppr': rng.uniform(0, 400, n),
+        }))
+    seasonal = pd.concat(frames, ignore_index=True)
+    # passing columns come from their own stream so the columns above keep
+    # their values
+    rng = np.random.default_rng(seed + 1)
+    n = len(seasonal)
+    seasonal['attempts'] = rng.integers(0, 650, n).astype(float)
+    seasonal['completions'] = np.floor(seasonal['attempts'] * rng.uniform(0.5, 0.72, n))
+    seasonal['passing_tds'] = np.floor(seasonal['attempts'] * rng.uniform(0, 0.07, n))
+    seasonal['interceptions'] = np.floor(seasonal['attempts'] * rng.uniform(0, 0.04, n))
+    seasonal['sacks'] = np.floor(seasonal['attempts'] * rng.uniform(0, 0.09, n))
+    seasonal['sack_yards'] = seasonal['sacks'] * rng.uniform(5, 9, n)
+    return seasonal
+
+
+def make_contracts(player_ids, n_rows, years, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(player_ids), n_rows)
+    value = rng.uniform(0.7, 160.0, n_rows).round(3)
+    years_signed = rng.integers(1, 6, n_rows)
+    return pd.DataFrame({
+        'player': player_ids['name'].values[idx],
+        'gsis_id': player_ids['gsis_id'].values[idx],
+        'position': player_ids['position'].values[idx],
+        'team': rng.choice(TEAMS, n_rows),
+        'year_signed': rng.choice(list(years), n_rows),
+        'years': years_signed,
+        'value': value,
+        'apy': (value / years_signed).round(3),
+        'guaranteed': (value * rng.uniform(0, 0.7, n_rows)).round(3),
+    })
+
+
+def make_weekly(player_ids, years, weeks=18, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in years:
+        for week in range(1, weeks + 1):
+            # roughly three in four players record stats in a given week
+            played = player_ids[rng.uniform(size=len(player_ids)) < 0.75]
+            n = len(played)
+            targets = rng.integers(0, 14, n).astype(float)
+            frames.append(pd.DataFrame({
+                'player_id': played['gsis_id'].values,
+                'player_name': played['name'].values,
+                'position': played['position'].values,
+                'recent_team': rng.choice(TEAMS, n),
+                'season': season,
+                'week': week,
+                'season_type': 'REG',
+                'targets': targets,
+                'receptions': np.floor(targets * rng.uniform(0.4, 0.9, n)),
+                'receiving_yards': targets * rng.uniform(4, 14, n),
+                'fantasy_points_ppr': rng.uniform(0, 35, n),
+            }))
+    weekly = pd.concat(frames, ignore_index=True)
+    # own stream, so the columns above keep their values
+    rng = np.random.default_rng(seed + 1)
+    weekly['receiving_tds'] = rng.binomial(weekly['receptions'].astype(int), 0.08).astype(float)
+    return weekly
+
+
+NGS_COLUMNS = {
+    'passing': ['avg_time_to_throw', 'avg_completed_air_yards', 'aggressiveness', 'completion_percentage_above_expectation'],
+    'rushing': ['efficiency', 'avg_time_to_los', 'rush_yards_over_expected_per_att'],
+    'receiving': ['avg_cushion', 'avg_separation', 'avg_yac_above_expectation', 'percent_share_of_intended_air_yards'],
+}
+
+
+def make_ngs(player_ids, years, stat_type, weeks=18, share=0.5, seed=0):
+    # NGS lists only qualifying players each week, plus week 0 season rows
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in years:
+        for week in range(0, weeks + 1):
+            listed = player_ids[rng.uniform(size=len(player_ids)) < share]
+            frame = pd.DataFrame({
+                'season': season,
+                'season_type': 'REG',
+                'week': week,
+                'player_display_name': listed['name'].values,
+                'player_position': listed['position'].values,
+                'team_abbr': rng.choice(TEAMS, len(listed)),
+                'player_gsis_id': listed['gsis_id'].values,
+                'player_jersey_number': rng.integers(1, 99, len(listed)),
+            })
+            for column in NGS_COLUMNS[stat_type]:
+                frame[column] = rng.normal(size=len(listed))
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_weekly_rosters(player_ids, years, weeks=18, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in years:
+        team = rng.choice(TEAMS, len(player_ids))
+        for week in range(1, weeks + 1):
+            frames.append(pd.DataFrame({
+                'season': season,
+                'team': team,
+                'position': player_ids['position'].values,
+                'depth_chart_position': player_ids['position'].values,
+                'jersey_number': rng.integers(1, 99, len(player_ids)),
+                'status': rng.choice(['ACT', 'RES', 'INA'], len(player_ids), p=[0.85, 0.1, 0.05]),
+                'player_name': player_ids['name'].values,
+                'week': week,
+                'game_type': 'REG',
+                'gsis_id': player_ids['gsis_id'].values,
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_draft_picks(player_ids, drafted_share=0.7, seed=0):
+    # one pick per drafted player; the rest of player_ids went undrafted
+    rng = np.random.default_rng(seed)
+    drafted = player_ids[rng.uniform(size=len(player_ids)) < drafted_share]
+    frames = []
+    for season, group in drafted.groupby(drafted['draft_year'].astype(int)):
+        pick = rng.permutation(np.arange(1, 257))[:len(group)]
+        frames.append(pd.DataFrame({
+            'season': season,
+            'round': np.minimum((pick - 1) // 32 + 1, 7),
+            'pick': pick,
+            'team': rng.choice(TEAMS, len(group)),
+            'gsis_id': group['gsis_id'].values,
+            'pfr_player_name': group['name'].values,
+            'position': group['position'].values,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@contextmanager
+def nfl_sources(seasonal=None, ids=None, contracts=None, pbp=None, weekly=None, draft_picks=None,
+                ngs=None, rosters=None, ftn=None):
+    # Point the nfl_data_py importers at in-memory fixtures for the duration
+    # of a test or benchmark, so loaders run their real merge logic without network.
+    import nfl_data_py as nfl
+
+    replacements = {}
+    if seasonal is not None:
+        replacements['import_seasonal_data'] = lambda years, *args, **kwargs: seasonal[seasonal['season'].isin(list(years))].copy()
+    if ids is not None:
+        replacements['import_ids'] = lambda *args, **kwargs: ids.copy()
+    if contracts is not None:
+        replacements['import_contracts'] = lambda *args, **kwargs: contracts.copy()
+    if pbp is not None:
+        replacements['import_pbp_data'] = lambda years, *args, **kwargs: pbp[pbp['season'].isin(list(years))].copy()
+    if weekly is not None:
+        replacements['import_weekly_data'] = lambda years, *args, **kwargs: weekly[weekly['season'].isin(list(years))].copy()
+
+    if ngs is not None:
+        replacements['import_ngs_data'] = lambda stat_type, years, *args, **kwargs: ngs[stat_type][ngs[stat_type]['season'].isin(list(years))].copy()
+    if rosters is not None:
+        replacements['import_weekly_rosters'] = lambda years, *args, **kwargs: rosters[rosters['season'].isin(list(years))].copy()
+    if ftn is not None:
+        replacements['import_ftn_data'] = lambda years, *args, **kwargs: ftn[ftn['season'].isin(list(years))].copy()
+    if draft_picks is not None:
+        replacements['import_draft_picks'] = lambda years=None: draft_picks[draft_picks['season'].isin(list(years))].copy() if years else draft_picks.copy()
+
+    originals = {name: getattr(nfl, name) for name in replacements}
+    for name, func in replacements.items():
+        setattr(nfl, name, func)
+    try:
+        yield nfl
+    finally:
+        for name, func in originals.items():
+            setattr(nfl, name, func)
+
+
+def _random_route(rng, width, height, los):
+    x = rng.integers(80, width - 80)
+    y = los
+    points = [(x, y)]
+    stem = rng.integers(40, 260)
+    y = max(10, y - stem)
+    points.append((x, y))
+    for _ in range(rng.integers(1, 3)):
+        x = int(np.clip(x + rng.integers(-220, 220), 45, width - 45))
+        y = int(np.clip(y + rng.integers(-160, 40), 10, height - 10))
+        points.append((x, y))
+    return np.array(points, dtype=np.int32)
+
+
+def make_chart_image(seed=0, width=1200, height=680, n_routes=8):
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), CHART_BACKGROUND, dtype=np.uint8)
+    los = 572
+    for i in range(n_routes):
+        route = _random_route(rng, width, height, los)
+        colour = [CHART_COMPLETE, CHART_INCOMPLETE][i % 2]
+        cv2.polylines(img, [route], False, colour, thickness=3, lineType=cv2.LINE_8)
+        if colour == CHART_COMPLETE:
+            end = route[-1]
+            yac_end = (int(np.clip(end[0] + rng.integers(-80, 80), 45, width - 45)),
+                       int(np.clip(end[1] - rng.integers(10, 120), 10, height - 10)))
+            cv2.line(img, (int(end[0]), int(end[1])), yac_end, CHART_YAC, thickness=3, lineType=cv2.LINE_8)
+    return img
+
+
+def write_chart_images(root, n_charts, seed=0, lossless=False):
+    # Lay the charts out the way save_chart_images/clean_chart_image expect
+    # (raw and cleaned trees), and return the matching chart metadata.
+    import cv2
+
+    charts = []
+    for i in range(n_charts):
+        team = TEAMS[i % len(TEAMS)]
+        chart = {
+            'gameId': 2023090700 + i,
+            'team': team,
+            'season': '2023',
+            'week': str(i % 18 + 1),
+            'firstName': f"First{i}",
+            'lastName': f"Last{i}",
+            'position': 'WR',
+            'touchdowns': 0,
+        }
+        name = f"{chart['lastName']}_{chart['firstName']}_{chart['position']}"
+        img = make_chart_image(seed + i)
+        for folder in ('Route_Charts', 'Cleaned_Route_Charts'):
+            img_folder = os.path.join(root, folder, team, chart['season'], chart['week'], 'images')
+            os.makedirs(img_folder, exist_ok=True)
+            path = os.path.join(img_folder, f"{name}.jpeg")
+            if lossless:
+                # PNG bytes behind the .jpeg name keep colours exact; cv2.imread sniffs the format
+                ok, buf = cv2.imencode('.png', img)
+                with open(path, 'wb') as f:
+                    f.write(buf.tobytes())
+            else:
+                cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, 100])
+        charts.append(chart)
+    return charts
+
+
+def make_route_points(n_points, n_players=1500, seed=0):
+    # route-point rows shaped like process_next_gen_data output
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Player {i}" for i in range(n_players)])
+    player = rng.integers(0, n_players, n_points)
+    return pd.DataFrame({
+        'game_id': 2023090700 + rng.integers(0, 285, n_points),
+        'team': np.array(TEAMS)[player % len(TEAMS)],
+        'season': '2023',
+        'week': (rng.integers(1, 19, n_points)).astype(str),
+        'name': names[player],
+        'position': 'WR',
+        'route_type': rng.choice(['COMPLETE', 'YAC', 'INCOMPLETE'], n_points, p=[0.5, 0.2, 0.3]),
+        'x': rng.uniform(-26.7, 26.7, n_points),
+        'y': rng.uniform(-10, 60, n_points),
+    })
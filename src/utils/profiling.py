@@ -0,0 +1,268 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# Lightweight stage-level instrumentation for the scraping, image-processing,
+# loader and model pipelines.
+#
+#   from src.utils import profiling
+#   profiling.enable()    # or NFL_QUANT_PROFILE=1 (add ",profile" / ",memory")
+#   with profiling.stage('load.pbp'):
+#       ...
+#   profiling.count('charts_processed')
+#   print(profiling.summary_table())
+#
+# When profiling is disabled (the default) stage() returns a shared no-op
+# context manager, timed() calls straight through and count() returns
+# immediately, so instrumented hot loops pay a single flag check.
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_enabled = False
+_capture_profile = False
+_capture_memory = False
+_stages = {}
+_counters = {}
+_profiles = {}
+
+
+def enable(profile=False, memory=False):
+    # profile=True captures a cProfile per stage, memory=True a tracemalloc peak
+    global _enabled, _capture_profile, _capture_memory
+    _enabled = True
+    _capture_profile = profile
+    _capture_memory = memory
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def disable():
+    global _enabled, _capture_profile, _capture_memory
+    if _capture_memory:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+    _enabled = False
+    _capture_profile = False
+    _capture_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _profiles.clear()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+_local = threading.local()
+_profiler_owner = None    # the _Stage whose cProfile is running, process-wide
+
+
+def _stage_stack():
+    # stages open in this thread, outermost first
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Stage:
+    # Stages nest (a timed function calling another). Only one cProfile can
+    # run at a time, so the outermost stage owns it and nested stages show up
+    # inside its stats. tracemalloc keeps a single peak, so a nested stage
+    # folds the peak so far into its parent before resetting it, and hands
+    # its own peak back to the parent on exit.
+    def __init__(self, name):
+        self.name = name
+        self._profiler = None
+        self._start = None
+        self._mem_peak = 0
+
+    def __enter__(self):
+        global _profiler_owner
+        stack = _stage_stack()
+        if _capture_memory:
+            import tracemalloc
+            if stack:
+                stack[-1]._mem_peak = max(stack[-1]._mem_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if _capture_profile and not stack:
+            with _lock:
+                if _profiler_owner is None:
+                    _profiler_owner = self
+            if _profiler_owner is self:
+                import cProfile
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _profiler_owner
+        elapsed = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            with _lock:
+                _profiler_owner = None
+        stack = _stage_stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        mem_peak = None
+        if _capture_memory:
+            import tracemalloc
+            mem_peak = max(self._mem_peak, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]._mem_peak = max(stack[-1]._mem_peak, mem_peak)
+        with _lock:
+            stats = _stages.setdefault(self.name, {'calls': 0, 'total_s': 0.0, 'max_s': 0.0, 'mem_peak_bytes': None})
+            stats['calls'] += 1
+            stats['total_s'] += elapsed
+            stats['max_s'] = max(stats['max_s'], elapsed)
+            if mem_peak is not None:
+                stats['mem_peak_bytes'] = max(stats['mem_peak_bytes'] or 0, mem_peak)
+            if self._profiler is not None:
+                if self.name in _profiles:
+                    _profiles[self.name].add(self._profiler)
+                else:
+                    import pstats
+                    _profiles[self.name] = pstats.Stats(self._profiler)
+        log_event('stage', name=self.name, seconds=round(elapsed, 6), level=logging.DEBUG)
+        return False
+
+
+def stage(name):
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def timed(name=None):
+    # Decorator form of stage(); defaults to module.function as the stage name
+    def decorator(func):
+        stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def stages():
+    with _lock:
+        return {name: dict(stats) for name, stats in _stages.items()}
+
+
+def profile_stats(name):
+    # pstats.Stats for a stage captured with enable(profile=True), or None;
+    # only outermost stages are profiled, nested ones are part of their stats
+    return _profiles.get(name)
+
+
+def log_event(event, level=logging.INFO, **fields):
+    # Structured log record: the event name as the message and the fields
+    # attached to the record. Skipped entirely when the level is not enabled.
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level=logging.INFO, structured=True, stream=None):
+    # Attach a handler to the package root logger; every module logs under "src."
+    handler = logging.StreamHandler(stream)
+    if structured:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s %(fields)s', defaults={'fields': ''}))
+    root = logging.getLogger('src')
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
+def summary_rows():
+    rows = []
+    for name, stats in sorted(stages().items(), key=lambda item: -item[1]['total_s']):
+        rows.append({
+            'stage': name,
+            'calls': stats['calls'],
+            'total_s': stats['total_s'],
+            'mean_s': stats['total_s'] / stats['calls'],
+            'max_s': stats['max_s'],
+            'mem_peak_mb': None if stats['mem_peak_bytes'] is None else stats['mem_peak_bytes'] / 2**20,
+        })
+    return rows
+
+
+def summary_table():
+    lines = [f"{'stage':<36}{'calls':>8}{'total (s)':>12}{'mean (s)':>12}{'max (s)':>12}{'mem peak (MB)':>15}"]
+    for row in summary_rows():
+        mem = '' if row['mem_peak_mb'] is None else f"{row['mem_peak_mb']:.1f}"
+        lines.append(f"{row['stage']:<36}{row['calls']:>8}{row['total_s']:>12.4f}{row['mean_s']:>12.4f}{row['max_s']:>12.4f}{mem:>15}")
+    counts = counters()
+    if counts:
+        lines.append('')
+        lines.append(f"{'counter':<36}{'value':>12}")
+        for name in sorted(counts):
+            lines.append(f"{name:<36}{counts[name]:>12,}")
+    return '\n'.join(lines)
+
+
+def dump_summary(path):
+    with open(path, 'w') as f:
+        json.dump({'stages': summary_rows(), 'counters': counters()}, f, indent=2)
+
+
+if os.environ.get('NFL_QUANT_PROFILE'):
+    enable(profile='profile' in os.environ['NFL_QUANT_PROFILE'], memory='memory' in os.environ['NFL_QUANT_PROFILE'])
@@ -0,0 +1,11 @@
+import pytest
+
+from src.features import cache
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    # the parquet cache under tmp_path for one test
+    path = str(tmp_path / 'cache')
+    monkeypatch.setattr(cache, 'CACHE_DIR', path)
+    return path
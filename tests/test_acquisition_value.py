@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.acquisition_value import draft_value_curves, draft_value_seasons
+
+
+def _sources():
+    ids = builders.make_player_ids(400)
+    years = range(2013, 2024)
+    return builders.nfl_sources(
+        seasonal=builders.make_seasonal(ids, years),
+        contracts=builders.make_contracts(ids, 1500, years),
+        draft_picks=builders.make_draft_picks(ids),
+    )
+
+
+def test_extending_the_range_builds_only_new_seasons(tmp_path):
+    with _sources() as nfl:
+        loaded = []
+        import_seasonal = nfl.import_seasonal_data
+        nfl.import_seasonal_data = lambda years, **kwargs: loaded.extend(years) or import_seasonal(years, **kwargs)
+
+        draft_value_seasons(range(2015, 2018), cache_dir=str(tmp_path / 'a'))
+        extended = draft_value_seasons(range(2015, 2020), cache_dir=str(tmp_path / 'a'))
+        assert loaded == [2015, 2016, 2017, 2018, 2019]
+
+        full = draft_value_seasons(range(2015, 2020), cache_dir=str(tmp_path / 'b'))
+        pd.testing.assert_frame_equal(extended, full)
+
+
+def test_round_curves_match_grouped_totals(tmp_path):
+    with _sources():
+        seasons = draft_value_seasons(range(2015, 2020), cache_dir=str(tmp_path))
+        curves = draft_value_curves(range(2015, 2020), by='round', cache_dir=str(tmp_path))
+
+    drafted = seasons[seasons['drafted']]
+    assert drafted['gsis_id'].notna().all()
+    assert not seasons.loc[~seasons['drafted'], 'pick'].notna().any()
+    priced = drafted.dropna(subset=['apy'])
+    expected = priced.groupby('round')['production'].sum() / priced.groupby('round')['apy'].sum()
+    np.testing.assert_allclose(curves.set_index('round')['value_per_dollar'], expected)
+
+
+def test_pick_curves_are_smoothed_within_position(tmp_path):
+    with _sources():
+        raw = draft_value_curves(range(2015, 2020), by=['position', 'pick'], window=1, cache_dir=str(tmp_path))
+        smooth = draft_value_curves(range(2015, 2020), by=['position', 'pick'], window=9, cache_dir=str(tmp_path))
+    assert len(raw) == len(smooth)
+    for curves in (raw, smooth):
+        assert curves.groupby('position')['pick'].apply(lambda p: p.is_monotonic_increasing).all()
+    # smoothing pools neighbouring picks, so each point covers more seasons
+    assert (smooth['player_seasons'] >= raw['player_seasons']).all()
+    assert smooth['value_per_dollar'].std() < raw['value_per_dollar'].std()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from src.testing import builders
+from src.features.nfl_data import get_wr_data
+from src.models import apy_comps
+from src.models.apy_comps import ApyComps, comps_for_season
+from src.models.apy_model import FEATURES, calculate_advanced_metrics
+
+
+def _wr_seasons(n_players=300, years=range(2013, 2024), seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_players * len(years)
+    frame = pd.DataFrame({col: rng.normal(size=n) for col in FEATURES})
+    frame['name'] = [f"Player {i}" for i in range(n_players)] * len(years)
+    frame['season'] = np.repeat(list(years), n_players)
+    frame['age'] = rng.integers(21, 37, n).astype(float)
+    frame['team'] = 'MIN'
+    frame['year_signed'] = frame['season']
+    frame['apy'] = rng.uniform(0.7, 30, n)
+    return frame
+
+
+def test_batch_query_matches_brute_force(monkeypatch):
+    # small blocks so the query is split across several distance blocks
+    monkeypatch.setattr(apy_comps, 'QUERY_BLOCK', 64)
+    wr_data = _wr_seasons()
+    scaler = StandardScaler().fit(wr_data[FEATURES])
+    engine = ApyComps(wr_data, scaler)
+    players = wr_data[wr_data['season'] == 2023]
+    comps = engine.query(players, k=5, age_window=2)
+
+    X = scaler.transform(wr_data[FEATURES])
+    for _, player in players.sample(20, random_state=0).iterrows():
+        allowed = ((wr_data['season'] < player['season'])
+                   & ((wr_data['age'] - player['age']).abs() <= 2)
+                   & (wr_data['name'] != player['name'])).to_numpy()
+        distance = np.linalg.norm(X - scaler.transform(player[FEATURES].to_frame().T.astype(float)), axis=1)
+        expected = np.sort(distance[allowed])[:5]
+        got = comps[comps['name'] == player['name']]
+        assert list(got['rank']) == [1, 2, 3, 4, 5]
+        np.testing.assert_allclose(got['distance'], expected, rtol=1e-4, atol=1e-4)
+        assert (got['comp_season'] < player['season']).all()
+        assert (got['comp_name'] != player['name']).all()
+
+
+def test_nightly_comps_cover_every_receiver_of_the_season(isolated_cache):
+    ids = builders.make_player_ids(500)
+    years = range(2013, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    with builders.nfl_sources(seasonal=seasonal, ids=ids, contracts=builders.make_contracts(ids, 2000, years)):
+        wr_data = calculate_advanced_metrics(get_wr_data(years))
+        scaler = StandardScaler().fit(wr_data.dropna(subset=FEATURES)[FEATURES])
+        comps = comps_for_season(wr_data, scaler, 2023, k=5)
+
+    active = seasonal[(seasonal['season'] == 2023) & (seasonal['receptions'] > 0)]
+    names = ids.set_index('gsis_id').loc[active['player_id'], 'name']
+    signed = set(wr_data.loc[wr_data['season'] == 2023, 'name'].astype(str))
+    assert len(set(names) - signed) > 0
+    per_player = comps.groupby('name', observed=True).size()
+    assert set(per_player.index.astype(str)) == set(names)
+    assert (per_player == 5).all()
+    assert (comps['comp_season'] < 2023).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.models.apy_model import FEATURES, make_model
+from src.models.attributions import AttributionCache, feature_contributions
+
+
+def _wr_rows(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.normal(size=(n, len(FEATURES))), columns=FEATURES)
+    frame['apy'] = frame[FEATURES[:4]].sum(axis=1) * 3 + rng.normal(size=n) + 10
+    frame['name'] = [f"Player {i % 100}" for i in range(n)]
+    frame['season'] = 2013 + np.arange(n) // 100
+    return frame
+
+
+@pytest.mark.parametrize('name', ['Lasso', 'Random Forest', 'XGBoost'])
+def test_contributions_add_up_to_prediction(name):
+    wr_data = _wr_rows()
+    scaler = StandardScaler().fit(wr_data[FEATURES])
+    X = pd.DataFrame(scaler.transform(wr_data[FEATURES]), columns=FEATURES)
+    model = make_model(name, {'n_estimators': 20} if name != 'Lasso' else None).fit(X, wr_data['apy'])
+
+    contribs, bias = feature_contributions(model, X, FEATURES)
+    assert contribs.shape == (len(X), len(FEATURES))
+    np.testing.assert_allclose(contribs.sum(axis=1) + bias, model.predict(X), rtol=1e-4, atol=1e-3)
+
+
+def test_cache_is_reused_for_the_same_model_and_data(tmp_path):
+    wr_data = _wr_rows()
+    scaler = StandardScaler().fit(wr_data[FEATURES])
+    X = pd.DataFrame(scaler.transform(wr_data[FEATURES]), columns=FEATURES)
+    model = make_model('Lasso').fit(X, wr_data['apy'])
+
+    cache = AttributionCache.build(model, scaler, wr_data, FEATURES, root=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+    again = AttributionCache.build(model, scaler, wr_data, FEATURES, root=str(tmp_path))
+    pd.testing.assert_frame_equal(cache.table, again.table)
+
+    # explanations are for the player's latest season, as in evaluate_player
+    latest = cache.row('Player 7')
+    assert latest['season'] == 2015
+    assert set(cache.explain('Player 7').index) == set(FEATURES)
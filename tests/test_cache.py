@@ -0,0 +1,63 @@
+import os
+import time
+
+import pandas as pd
+
+from src.testing import builders
+from src.analysis.fourth_down_analysis import fourth_down_counts
+from src.analysis.offensive_tendencies import tendency_counts
+from src.features.cache import cache_path, cached_frame
+from src.features.dtypes import optimize_dtypes
+from src.features.nfl_data import WR_DATA_MAX_AGE, _years_key, get_wr_data
+from src.models.apy_model import calculate_advanced_metrics
+
+
+def _comparable(table):
+    # categorical keys as values, rows in a fixed order
+    table = table.astype({c: object for c in table.columns if isinstance(table[c].dtype, pd.CategoricalDtype)})
+    return table.sort_values(list(table.columns)).reset_index(drop=True)
+
+
+def test_optimized_frames_round_trip_through_the_cache(isolated_cache):
+    ids = builders.make_player_ids(200)
+    frames = {
+        'pbp': builders.make_pbp(1, plays_per_season=5000),
+        'weekly': builders.make_weekly(ids, [2023], weeks=4),
+    }
+    for schema, raw in frames.items():
+        optimized = optimize_dtypes(raw, schema)
+        cached_frame(schema, 2023, lambda: optimized)
+        # the second call is a cache hit that must not call the loader
+        cached = cached_frame(schema, 2023, lambda: None)
+        pd.testing.assert_series_equal(cached.dtypes, optimized.dtypes)
+        pd.testing.assert_frame_equal(cached, optimized)
+
+    # analysis results from the cached compact frame match the raw frame
+    raw = frames['pbp']
+    cached = cached_frame('pbp', 2023, lambda: None)
+    for counts in (fourth_down_counts, tendency_counts):
+        pd.testing.assert_frame_equal(_comparable(counts(cached)), _comparable(counts(raw)), check_dtype=False)
+
+
+def test_wr_data_is_rebuilt_once_the_cache_entry_expires(isolated_cache):
+    ids = builders.make_player_ids(300)
+    years = range(2018, 2023)
+    with builders.nfl_sources(seasonal=builders.make_seasonal(ids, years), ids=ids,
+                              contracts=builders.make_contracts(ids, 1500, years)) as nfl:
+        loads = []
+        import_seasonal = nfl.import_seasonal_data
+        nfl.import_seasonal_data = lambda years, **kwargs: loads.append(list(years)) or import_seasonal(years, **kwargs)
+
+        first = get_wr_data(years)
+        assert len(first) > 0
+        pd.testing.assert_frame_equal(get_wr_data(years), first)
+        assert len(loads) == 1
+        uncached = get_wr_data(years, cache=False)
+        pd.testing.assert_frame_equal(calculate_advanced_metrics(first), calculate_advanced_metrics(uncached))
+
+        path = cache_path('wr_data', _years_key(years))
+        stale = time.time() - WR_DATA_MAX_AGE - 60
+        os.utime(path, (stale, stale))
+        get_wr_data(years)
+        assert len(loads) == 3
+        assert os.path.getmtime(path) > stale
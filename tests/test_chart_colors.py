@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.testing.builders import make_chart_image
+from src.features.chart_colors import (COMPLETE, INCOMPLETE, YAC, _full_color_lut, build_color_lut, classify_pixels,
+                                       classify_pixels_direct)
+
+
+def _jpeg_chart(seed):
+    _, encoded = cv2.imencode('.jpeg', make_chart_image(seed))
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_lut_matches_cv2_operations_on_charts(seed):
+    img = _jpeg_chart(seed)
+    np.testing.assert_array_equal(classify_pixels(img), classify_pixels_direct(img))
+
+
+def test_lut_matches_cv2_operations_on_random_colours():
+    # width a multiple of 64 keeps cv2 on its vectorized path for every
+    # pixel; the LUT is built on that path
+    img = np.random.default_rng(0).integers(0, 256, (512, 1024, 3), dtype=np.uint8)
+    np.testing.assert_array_equal(classify_pixels(img), classify_pixels_direct(img))
+
+
+def test_two_level_table_reproduces_every_colour():
+    full = _full_color_lut('default')
+    colours = np.stack(np.meshgrid(*[np.arange(256, dtype=np.uint8)] * 3, indexing='ij'), axis=-1)
+    np.testing.assert_array_equal(classify_pixels(colours.reshape(4096, 4096, 3)).reshape(256, 256, 256), full)
+    coarse, blocks = build_color_lut('default')
+    assert coarse.nbytes + blocks.nbytes < 512 * 1024
+
+
+def test_default_palette_matches_legacy_masks():
+    img = _jpeg_chart(0)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    white = cv2.inRange(img, np.array([230, 230, 230]), np.array([255, 255, 255]))
+    green = cv2.inRange(hsv, np.array([40, 100, 100]), np.array([80, 255, 255]))
+    gray = cv2.inRange(img, np.array([126, 126, 126]), np.array([132, 132, 132]))
+    complete = cv2.bitwise_and(img, img, mask=white).clip(0, 1)[:, :, 1]
+    yac = cv2.cvtColor(cv2.bitwise_and(img, img, mask=green), cv2.COLOR_HSV2BGR).clip(0, 1)[:, :, 2]
+    incomplete = cv2.bitwise_and(img, img, mask=gray).clip(0, 1)[:, :, 1]
+
+    labels = classify_pixels(img)
+    np.testing.assert_array_equal(labels & COMPLETE != 0, complete != 0)
+    np.testing.assert_array_equal(labels & YAC != 0, yac != 0)
+    np.testing.assert_array_equal(labels & INCOMPLETE != 0, incomplete != 0)
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+from src.testing.builders import make_chart_image
+from src.features.chart_store import ChartStore
+
+
+def _chart(i, **overrides):
+    chart = {'gameId': 2023090700 + i, 'team': 'PHI', 'season': '2023', 'week': '1',
+             'firstName': 'First', 'lastName': f"Last{i}", 'position': 'WR'}
+    chart.update(overrides)
+    return chart
+
+
+def _jpeg(img, quality=100):
+    return cv2.imencode('.jpeg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def test_identical_bytes_are_stored_once(tmp_path):
+    store = ChartStore(str(tmp_path))
+    data = _jpeg(make_chart_image(0))
+    first = store.put(_chart(0), data)
+    # same player, same week, different game: both charts are kept
+    second = store.put(_chart(0, gameId=2023090799), data)
+    assert first == second
+    assert len(store) == 2 and len(store.blobs) == 1
+
+
+def test_reencoded_chart_is_similar_and_others_are_not(tmp_path):
+    store = ChartStore(str(tmp_path))
+    img = make_chart_image(0)
+    original = store.put(_chart(0), _jpeg(img))
+    copy = store.put(_chart(1), _jpeg(img, quality=85))
+    other = store.put(_chart(2), _jpeg(make_chart_image(1)))
+    assert original != copy
+    assert store.similar(copy) == [original]
+    assert store.similar(other) == []
+
+
+def test_manifest_and_signatures_round_trip(tmp_path):
+    store = ChartStore(str(tmp_path))
+    img = make_chart_image(0)
+    sha = store.put(_chart(0), _jpeg(img))
+    store.put(_chart(1), _jpeg(img, quality=85))
+    store.save()
+
+    reopened = ChartStore(str(tmp_path))
+    assert reopened.sha_for(_chart(0)) == sha
+    assert reopened.shape(sha) == (680, 1200)
+    assert reopened.similar(reopened.sha_for(_chart(1))) == [sha]
+    with open(reopened.blob_path(sha), 'rb') as f:
+        assert np.array_equal(cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR).shape, (680, 1200, 3))
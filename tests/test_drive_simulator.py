@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.analysis.drive_simulator import DriveModel, simulate_decisions
+
+
+def _model():
+    return DriveModel.fit(builders.make_optimized_pbp(2, plays_per_season=30_000))
+
+
+def test_last_play_decisions_match_model_rates():
+    model = _model()
+    # 4th & goal at the 1, down 4, one snap left: only a touchdown wins
+    table = simulate_decisions(model, {'score_differential': -4, 'yardline_100': 1, 'ydstogo': 1,
+                                       'game_seconds_remaining': 5}, n=20000).set_index('decision')
+    fourth_and_short = model.yards[model.offsets[12]:model.offsets[12] + model.counts[12]]
+    expected = (1 - model.turnover_rate) * (fourth_and_short >= 1).mean()
+    assert abs(table.loc['go', 'win_probability'] - expected) < 4 * table.loc['go', 'std_error']
+    assert table.loc['punt', 'win_probability'] == 0
+    assert table.loc['field_goal', 'win_probability'] == 0
+
+    # tied, a 27-yard kick: a miss ends in a tie
+    table = simulate_decisions(model, {'score_differential': 0, 'yardline_100': 10, 'ydstogo': 8,
+                                       'game_seconds_remaining': 5}, decisions=['field_goal'], n=20000)
+    p = model.fg_probability(27)
+    assert abs(table.loc[0, 'win_probability'] - (p + 0.5 * (1 - p))) < 4 * table.loc[0, 'std_error']
+
+
+def test_results_depend_only_on_seed():
+    model = _model()
+    situation = {'score_differential': -3, 'yardline_100': 45, 'ydstogo': 2, 'game_seconds_remaining': 900}
+    serial, margins = simulate_decisions(model, situation, n=25000, seed=7, margins=True)
+    pooled = simulate_decisions(model, situation, n=25000, seed=7, workers=2)
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert set(margins) == {'go', 'punt', 'field_goal'} and len(margins['go']) == 25000
+    assert not serial.equals(simulate_decisions(model, situation, n=25000, seed=8))
+    assert np.isclose(serial['win_probability'], [((m > 0) + 0.5 * (m == 0)).mean() for m in margins.values()]).all()
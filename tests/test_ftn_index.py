@@ -0,0 +1,77 @@
+import numpy as np
+
+from src.testing import builders
+from src.analysis.offensive_tendencies import analyze_3x1_bunch_formation, formation_tendencies
+from src.features.ftn_index import FTN_COLUMNS, FtnIndex, join_ftn, load_ftn_index, play_keys
+
+
+def _plays():
+    pbp = builders.make_optimized_pbp(2, first_season=2022, plays_per_season=20_000)
+    return pbp, builders.make_ftn(pbp)
+
+
+def test_join_matches_merge_on_game_and_play(tmp_path):
+    pbp, ftn = _plays()
+    with builders.nfl_sources(ftn=ftn):
+        joined = join_ftn(pbp, index_dir=str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['2022', '2023']
+
+    expected = pbp[['game_id', 'play_id']].astype({'game_id': str, 'play_id': int}).merge(
+        ftn.rename(columns={'nflverse_game_id': 'game_id', 'nflverse_play_id': 'play_id'}),
+        on=['game_id', 'play_id'], how='left')
+    assert len(joined) == len(pbp)
+    for column in ['qb_location', 'is_motion', 'n_offense_backfield']:
+        got = joined[f"ftn_{column}"].astype(object).where(joined[f"ftn_{column}"].notna(), None)
+        want = expected[column].astype(object).where(expected[column].notna(), None)
+        assert list(got) == list(want)
+
+    # the persisted index round-trips
+    index = load_ftn_index(2023, index_dir=str(tmp_path))
+    keys = play_keys(ftn['nflverse_game_id'], ftn['nflverse_play_id'])
+    assert (index.lookup(keys[ftn['season'].to_numpy() == 2023]) >= 0).all()
+    assert (index.lookup(np.array([-1, 0])) == -1).all()
+
+
+def test_formation_filters_are_masks_over_joined_plays():
+    pbp, ftn = _plays()
+    indexes = {season: FtnIndex.from_ftn(ftn[ftn['season'] == season]) for season in (2022, 2023)}
+    plays = join_ftn(pbp, indexes=indexes)
+
+    personnel = '1 RB, 1 TE, 3 WR'
+    base = formation_tendencies(plays, offense_personnel=personnel)
+    assert base[0] == analyze_3x1_bunch_formation(pbp)[0]
+
+    charted, _, _ = formation_tendencies(plays, offense_personnel=personnel, qb_location='S', is_motion=True)
+    subset = plays[(plays['offense_personnel'] == personnel) & (plays['ftn_qb_location'] == 'S')
+                   & plays['ftn_is_motion'].fillna(False).astype(bool)]
+    assert charted['avg_yards_gained'] == subset['yards_gained'].mean()
+    assert charted['run_percentage'] == (subset['play_type'] == 'run').mean() * 100
+
+
+def test_seasons_before_ftn_charting_get_missing_attributes(tmp_path):
+    pbp = builders.make_optimized_pbp(3, first_season=2021, plays_per_season=10_000)
+    charted = pbp[pbp['season'] >= 2022]
+    ftn = builders.make_ftn(charted)
+    with builders.nfl_sources(ftn=ftn) as nfl:
+        import_ftn = nfl.import_ftn_data
+
+        def import_ftn_data(years, *args, **kwargs):
+            # nfl_data_py refuses seasons before FTN charting began
+            if min(years) < 2022:
+                raise ValueError("Data not available before 2022.")
+            return import_ftn(years, *args, **kwargs)
+
+        nfl.import_ftn_data = import_ftn_data
+        joined = join_ftn(pbp, index_dir=str(tmp_path))
+        expected = join_ftn(charted, index_dir=str(tmp_path))
+
+    ftn_columns = [f"ftn_{column}" for column in FTN_COLUMNS]
+    uncharted = joined[joined['season'] == 2021]
+    assert len(joined) == len(pbp)
+    assert uncharted[ftn_columns].isna().all().all()
+    for column in ftn_columns:
+        assert joined[column].dtype == expected[column].dtype
+        got = joined.loc[expected.index, column]
+        assert list(got.astype(object).where(got.notna(), None)) == \
+            list(expected[column].astype(object).where(expected[column].notna(), None))
+    assert len(FtnIndex.from_ftn(ftn.iloc[:0])) == 0
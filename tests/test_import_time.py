@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+# Importing the package must not download data or pull in the heavy
+# libraries; those load on first use. Run in a fresh interpreter so modules
+# imported by other tests don't hide a regression.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'src.features.nfl_data',
+    'src.features.contracts',
+    'src.features.acquisition_value',
+    'src.features.next_gen_data',
+    'src.features.incremental',
+    'src.features.route_store',
+    'src.features.route_heatmaps',
+    'src.features.chart_colors',
+    'src.features.chart_store',
+    'src.features.route_similarity',
+    'src.features.player_weeks',
+    'src.features.ftn_index',
+    'src.features.shared_frames',
+    'src.features.trajectories',
+    'src.analysis.wr_projection',
+    'src.analysis.offensive_tendencies',
+    'src.analysis.fourth_down_analysis',
+    'src.analysis.situational_query',
+    'src.analysis.drive_simulator',
+    'src.models.apy_model',
+    'src.models.apy_comps',
+    'src.models.tuning',
+    'src.models.attributions',
+    'src.models.online_apy',
+    'src.models.play_call',
+    'src.service.server',
+]
+HEAVY = ['nfl_data_py', 'cv2', 'skimage', 'scipy', 'sklearn', 'xgboost', 'requests', 'bs4', 'matplotlib', 'seaborn']
+
+# seconds on top of the pandas/numpy import, generous for slow CI machines
+IMPORT_BUDGET = 1.0
+
+SCRIPT = """
+import json, sys, time
+import numpy, pandas
+start = time.perf_counter()
+for name in %r:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'loaded': sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def _import_report():
+    out = subprocess.run(
+        [sys.executable, '-c', SCRIPT % (MODULES, HEAVY)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_imports_do_not_load_heavy_dependencies():
+    assert _import_report()['loaded'] == []
+
+
+def test_import_time_budget():
+    assert _import_report()['elapsed'] < IMPORT_BUDGET
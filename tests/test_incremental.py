@@ -0,0 +1,91 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.testing import builders
+from src.features.dtypes import optimize_dtypes
+from src.features.incremental import AGGREGATES, load_aggregate, load_store, refresh_dataset
+
+
+def _full_aggregate(name, season_data):
+    spec = AGGREGATES[name]
+    table = spec['build'](season_data).copy()
+    for key in spec['keys']:
+        if isinstance(table[key].dtype, pd.CategoricalDtype):
+            table[key] = table[key].astype(object)
+    table = table.groupby(spec['keys'], dropna=False, sort=True).sum().reset_index()
+    return table[table[spec['count']] != 0].reset_index(drop=True)
+
+
+def _assert_aggregates_match(dataset, season_data, store_dir):
+    for name, spec in AGGREGATES.items():
+        if spec['dataset'] == dataset:
+            pd.testing.assert_frame_equal(load_aggregate(name, str(store_dir)), _full_aggregate(name, season_data),
+                                          check_dtype=False)
+
+
+def test_week_by_week_aggregates_match_a_full_recompute(tmp_path):
+    pbp = optimize_dtypes(builders.make_pbp(1, first_season=2024, plays_per_season=6000), 'pbp')
+    weekly = optimize_dtypes(builders.make_weekly(builders.make_player_ids(300), [2024], weeks=6), 'weekly')
+    for dataset, season_data in (('pbp', pbp), ('weekly', weekly)):
+        weeks = sorted(season_data['week'].unique())
+        for week in weeks:
+            rows = refresh_dataset(dataset, 2024, str(tmp_path), season_data[season_data['week'] <= week])
+            assert sorted(rows['week'].unique()) == [week]
+        assert refresh_dataset(dataset, 2024, str(tmp_path), season_data).empty
+        _assert_aggregates_match(dataset, season_data, tmp_path)
+
+
+def test_stat_corrections_to_an_earlier_week_are_applied(tmp_path):
+    weekly = builders.make_weekly(builders.make_player_ids(300), [2024], weeks=6)
+    refresh_dataset('weekly', 2024, str(tmp_path), optimize_dtypes(weekly, 'weekly'))
+
+    # same rows and players, one corrected stat line in week 2
+    corrected = weekly.copy()
+    row = corrected.index[corrected['week'] == 2][5]
+    corrected.loc[row, 'receiving_yards'] += 12
+    corrected = optimize_dtypes(corrected, 'weekly')
+    rows = refresh_dataset('weekly', 2024, str(tmp_path), corrected)
+    assert sorted(rows['week'].unique()) == [2]
+    stored = load_store('weekly', 2024, weeks=[2], store_dir=str(tmp_path))
+    assert stored.loc[stored['player_id'] == corrected.loc[row, 'player_id'], 'receiving_yards'].iloc[0] == \
+        corrected.loc[row, 'receiving_yards']
+    _assert_aggregates_match('weekly', corrected, tmp_path)
+
+
+@pytest.mark.parametrize('step', ['journal', 'week_', 'aggregates', 'state.json'])
+@pytest.mark.parametrize('commit', [0, 1])
+def test_an_interrupted_refresh_is_completed_by_the_next_one(tmp_path, monkeypatch, step, commit):
+    weekly = builders.make_weekly(builders.make_player_ids(300), [2024], weeks=6)
+    refresh_dataset('weekly', 2024, str(tmp_path), optimize_dtypes(weekly[weekly['week'] <= 4], 'weekly'))
+
+    # a correction to week 2 and two new weeks; the refresh dies at `step`
+    # while committing the corrected week 2 (commit 0) or the new week 5
+    corrected = weekly.copy()
+    corrected.loc[corrected.index[corrected['week'] == 2][:10], 'receptions'] += 1
+    corrected = optimize_dtypes(corrected, 'weekly')
+    replace = os.replace
+    seen = []
+    interrupted = []
+
+    def flaky_replace(src, dst):
+        if not interrupted and step in str(dst):
+            seen.append(dst)
+            if len(seen) > commit:
+                interrupted.append(dst)
+                raise OSError("interrupted")
+        return replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', flaky_replace)
+    with pytest.raises(OSError):
+        refresh_dataset('weekly', 2024, str(tmp_path), corrected)
+    monkeypatch.setattr(os, 'replace', replace)
+    assert interrupted
+
+    refresh_dataset('weekly', 2024, str(tmp_path), corrected)
+    assert refresh_dataset('weekly', 2024, str(tmp_path), corrected).empty
+    _assert_aggregates_match('weekly', corrected, tmp_path)
+    stored = load_store('weekly', 2024, store_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(stored.reset_index(drop=True), corrected.reset_index(drop=True), check_dtype=False,
+                                  check_categorical=False)
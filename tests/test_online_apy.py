@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.dtypes import optimize_dtypes
+from src.features.nfl_data import get_wr_data
+from src.models.apy_model import calculate_advanced_metrics
+from src.models.online_apy import UPDATE_ROUNDS, OnlineApyModel, season_players
+
+
+def _inputs():
+    ids = builders.make_player_ids(500)
+    years = range(2013, 2024)
+    with builders.nfl_sources(seasonal=builders.make_seasonal(ids, years), ids=ids,
+                              contracts=builders.make_contracts(ids, 2000, years)):
+        wr_data = calculate_advanced_metrics(get_wr_data(years, cache=False))
+        players = season_players(2024)
+    # categorical player_id etc., as get_weekly_data returns them
+    return wr_data, players, optimize_dtypes(builders.make_weekly(ids, [2024], weeks=6), 'weekly')
+
+
+def test_weekly_updates_accumulate_season_to_date_features():
+    wr_data, players, weekly = _inputs()
+    model = OnlineApyModel.fit(wr_data, 'sgd').start_season(2024, players)
+    for week in range(1, 7):
+        # the season so far is passed each week; only the new week is ingested
+        assert model.update(weekly[weekly['week'] <= week]) == [week]
+        if week == 1:
+            # no rows for the player_id categories that did not play
+            first = weekly[(weekly['week'] == 1) & (weekly['targets'] > 0)]
+            assert len(model.totals) == first['player_id'].nunique()
+    coef = model.model.coef_.copy()
+    assert model.update(weekly) == []
+    np.testing.assert_array_equal(model.model.coef_, coef)
+
+    played = weekly[weekly['targets'] > 0]
+    grouped = played.groupby(played['player_id'].astype(str))
+    # only receivers who played have running totals
+    assert sorted(model.totals.index) == sorted(grouped.size().index)
+    assert (model.totals['games'] > 0).all()
+    expected = (grouped['receiving_yards'].sum() / grouped.size()).rename('receiving_yards_per_game')
+    predictions = model.predictions().set_index('player_id')
+    pd.testing.assert_series_equal(predictions['receiving_yards_per_game'], expected.loc[predictions.index])
+    np.testing.assert_allclose(predictions['availability'], grouped.size().loc[predictions.index] / 6)
+    assert predictions['predicted_apy'].notna().all()
+
+
+def test_boosted_model_continues_from_previous_booster(tmp_path):
+    wr_data, players, weekly = _inputs()
+    model = OnlineApyModel.fit(wr_data, 'xgboost').start_season(2024, players)
+    rounds = model.model.get_booster().num_boosted_rounds()
+    model.update(weekly[weekly['week'] == 1])
+    before = model.predictions().set_index('player_id')['predicted_apy']
+    model.update(weekly[weekly['week'] == 2])
+    assert model.model.get_booster().num_boosted_rounds() == rounds + 2 * UPDATE_ROUNDS
+    after = model.predictions().set_index('player_id')['predicted_apy']
+    assert not np.allclose(after.loc[before.index], before)
+
+    path = str(tmp_path / 'model.pkl')
+    model.save(path)
+    pd.testing.assert_frame_equal(OnlineApyModel.load(path).predictions(), model.predictions())
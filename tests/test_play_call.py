@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.dtypes import optimize_dtypes
+from src.models.play_call import (DEFAULT_PARAMS, FEATURES, LABEL, personnel_counts, play_call_features,
+                                  predict_season, train_play_call_model)
+
+
+def test_features_keep_run_and_pass_plays_with_personnel_counts():
+    pbp = builders.make_optimized_pbp(1, plays_per_season=5000)
+    features = play_call_features(pbp)
+    plays = pbp[pbp['play_type'].isin(['run', 'pass'])]
+    assert len(features) == len(plays)
+    np.testing.assert_array_equal(features[LABEL], (plays['play_type'] == 'pass').to_numpy())
+    counts = personnel_counts(pd.Series(['1 RB, 1 TE, 3 WR', None, '2 RB, 2 TE, 1 WR', '1 RB, 0 TE, 4 WR']))
+    np.testing.assert_array_equal(counts['personnel_rb'], [1, np.nan, 2, 1])
+    np.testing.assert_array_equal(counts['personnel_wr'], [3, np.nan, 1, 4])
+
+
+def test_streamed_training_matches_in_memory_training(tmp_path, isolated_cache):
+    import xgboost as xgb
+    pbp = builders.make_pbp(4, plays_per_season=8000)
+    params = {'subsample': 1.0, 'nthread': 1}
+    with builders.nfl_sources(pbp=pbp):
+        booster = train_play_call_model([2013, 2014, 2015], [2016], params=params, rounds=10, workdir=str(tmp_path))
+        predictions = predict_season(booster, 2016)
+
+    train = play_call_features(optimize_dtypes(pbp[pbp['season'] < 2016], 'pbp'))
+    reference = xgb.train(dict(DEFAULT_PARAMS, **params), xgb.QuantileDMatrix(train[FEATURES], train[LABEL]), 10)
+    held_out = play_call_features(optimize_dtypes(pbp[pbp['season'] == 2016], 'pbp'))
+    assert len(predictions) == len(held_out)
+    np.testing.assert_allclose(predictions['pass_probability'],
+                               reference.inplace_predict(held_out[FEATURES].to_numpy()), atol=1e-5)
+
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.player_weeks import player_week_table
+
+
+def _sources(season=2023):
+    ids = builders.make_player_ids(300)
+    weekly = builders.make_weekly(ids, [season])
+    ngs = {stat_type: builders.make_ngs(ids, [season], stat_type, seed=i) for i, stat_type in enumerate(builders.NGS_COLUMNS)}
+    rosters = builders.make_weekly_rosters(ids, [season])
+    return weekly, ngs, rosters
+
+
+def _latest_before(frame, player, week, max_staleness=None):
+    rows = frame[(frame['player_gsis_id'] == player) & (frame['week'] > 0) & (frame['week'] <= week)]
+    if max_staleness is not None:
+        rows = rows[rows['week'] >= week - max_staleness]
+    return rows.iloc[-1] if len(rows) else None
+
+
+def test_ngs_columns_come_from_the_latest_week_at_or_before():
+    weekly, ngs, rosters = _sources()
+    for max_staleness in (None, 2):
+        table = player_week_table(2023, max_staleness, weekly=weekly, ngs=ngs, rosters=rosters)
+        assert len(table) == len(weekly)
+        assert not table.duplicated(['player_id', 'week']).any()
+
+        receiving = ngs['receiving']
+        for _, row in table.sample(200, random_state=0).iterrows():
+            expected = _latest_before(receiving, row['player_id'], row['week'], max_staleness)
+            if expected is None:
+                assert np.isnan(row['ngs_receiving_avg_separation'])
+            else:
+                assert row['ngs_receiving_week'] == expected['week']
+                assert row['ngs_receiving_avg_separation'] == expected['avg_separation']
+
+
+def test_roster_entry_for_the_same_week():
+    weekly, ngs, rosters = _sources()
+    table = player_week_table(2023, weekly=weekly, ngs=ngs, rosters=rosters)
+    expected = weekly.merge(rosters[['gsis_id', 'week', 'status']], left_on=['player_id', 'week'],
+                            right_on=['gsis_id', 'week'], how='left')
+    merged = table.merge(expected[['player_id', 'week', 'status']], on=['player_id', 'week'])
+    pd.testing.assert_series_equal(merged['roster_status'], merged['status'], check_names=False)
+    assert (table['roster_week'] == table['week']).all()
@@ -0,0 +1,95 @@
+import pytest
+
+from src.utils import profiling
+
+
+@pytest.fixture
+def profiled():
+    was_enabled = profiling.is_enabled()
+    profiling.reset()
+    yield profiling
+    profiling.disable()
+    profiling.reset()
+    if was_enabled:
+        profiling.enable()
+
+
+def _work(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def _after_inner():
+    return _work()
+
+
+@profiling.timed('test.inner')
+def _inner():
+    return _work()
+
+
+@profiling.timed('test.outer')
+def _outer():
+    _inner()
+    _inner()
+    return _after_inner()
+
+
+def _profiled_functions(stats):
+    return {func for (_, _, func) in stats.stats}
+
+
+def test_nested_stages_are_timed_and_the_outer_profile_covers_them(profiled):
+    profiled.enable(profile=True)
+    _outer()
+    stages = profiled.stages()
+    assert stages['test.outer']['calls'] == 1
+    assert stages['test.inner']['calls'] == 2
+    assert stages['test.outer']['total_s'] >= stages['test.inner']['total_s']
+    # the outer profiler keeps running once the inner stages exit
+    functions = _profiled_functions(profiled.profile_stats('test.outer'))
+    assert {'_inner', '_after_inner'} <= functions
+    assert profiled.profile_stats('test.inner') is None
+
+    # an inner stage on its own is outermost and owns the profiler
+    _inner()
+    assert '_work' in _profiled_functions(profiled.profile_stats('test.inner'))
+
+
+def test_nested_stage_keeps_the_outer_memory_peak(profiled):
+    profiled.enable(memory=True)
+    with profiled.stage('test.outer'):
+        block = bytearray(20 * 2**20)
+        del block
+        with profiled.stage('test.inner'):
+            small = bytearray(2**20)
+            del small
+    stages = profiled.stages()
+    assert stages['test.outer']['mem_peak_bytes'] >= 20 * 2**20
+    assert stages['test.inner']['mem_peak_bytes'] < 20 * 2**20
+    assert stages['test.outer']['mem_peak_bytes'] >= stages['test.inner']['mem_peak_bytes']
+
+
+def test_counters_and_summary_table(profiled):
+    profiled.enable()
+    profiled.count('charts_processed')
+    profiled.count('charts_processed', 2)
+    profiled.count('rows_merged', 1500)
+    with profiled.stage('load.pbp'):
+        _work()
+    assert profiled.counters() == {'charts_processed': 3, 'rows_merged': 1500}
+    table = profiled.summary_table()
+    lines = table.splitlines()
+    assert lines[0].split()[0] == 'stage'
+    assert any(line.startswith('load.pbp') and line.split()[1] == '1' for line in lines)
+    assert any(line.startswith('rows_merged') and line.split()[1] == '1,500' for line in lines)
+
+
+def test_disabled_profiling_records_nothing(profiled):
+    profiled.disable()
+    assert profiled.stage('load.pbp') is profiled.stage('load.weekly')
+    with profiled.stage('load.pbp'):
+        pass
+    profiled.count('charts_processed')
+    assert _outer() == _work()
+    assert profiled.stages() == {}
+    assert profiled.counters() == {}
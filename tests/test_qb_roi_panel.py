@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.contracts import LEAGUE_SALARY_CAP
+from src.features.nfl_data import build_qb_roi_panel, calculate_roi
+
+
+def test_panel_is_built_once_from_cached_seasons(isolated_cache):
+    ids = builders.make_player_ids(600)
+    years = range(2005, 2024)
+    seasonal = builders.make_seasonal(ids, years)
+    contracts = builders.make_contracts(ids, 3000, years)
+    with builders.nfl_sources(seasonal=seasonal, ids=ids, contracts=contracts) as nfl:
+        calls = []
+        import_seasonal = nfl.import_seasonal_data
+        nfl.import_seasonal_data = lambda years, **kwargs: calls.append(list(years)) or import_seasonal(years, **kwargs)
+        panel = build_qb_roi_panel(years)
+        again = build_qb_roi_panel(years)
+    # all seasons in one fetch, none on the second build
+    assert calls == [list(years)]
+    pd.testing.assert_frame_equal(panel, again)
+
+    assert panel.index.is_unique and panel.index.names == ['gsis_id', 'season']
+    qbs = set(ids.loc[ids['position'] == 'QB', 'gsis_id'])
+    assert set(panel.index.get_level_values('gsis_id')) <= qbs
+    assert (panel['years_since_draft'] <= 3).all()
+
+    seasons = panel.index.get_level_values('season')
+    np.testing.assert_allclose(panel['salary_cap'], seasons.map(LEAGUE_SALARY_CAP))
+    priced = panel.dropna(subset=['apy'])
+    assert len(priced)
+    np.testing.assert_allclose(priced['roi'], priced['passing_yards'] / priced['apy'])
+    np.testing.assert_allclose(priced['cap_pct'], priced['apy'] / priced['salary_cap'])
+    assert (priced['year_signed'] <= priced.index.get_level_values('season')).all()
+
+
+def test_calculate_roi_leaves_its_input_alone():
+    data = pd.DataFrame({'passing_yards': [4000.0], 'apy': [10.0], 'salary_cap': [200.0]})
+    result = calculate_roi(data)
+    assert list(data.columns) == ['passing_yards', 'apy', 'salary_cap']
+    assert result.loc[0, 'roi'] == 400.0 and result.loc[0, 'cap_pct'] == 0.05
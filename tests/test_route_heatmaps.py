@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.route_heatmaps import GRID, ZONES, RouteHeatmaps, build_route_heatmaps, grid_shape
+from src.features.route_store import RouteStore, build_route_store
+
+
+def _points(n=40000, seed=0):
+    points = builders.make_route_points(n, n_players=40, seed=seed)
+    # a few points off the grid, which are clamped into the edge cells
+    points.loc[:9, 'x'] = [-40, 40, 0, 0, -30, 30, 5, -5, 100, -100]
+    points.loc[:9, 'y'] = [0, 0, -20, 90, -15, 80, 75, -10, 200, -200]
+    return points
+
+
+def _histogram(points, grid=GRID):
+    # reference binning: clamp onto the field, then np.histogram2d
+    ny, nx = grid_shape(grid)
+    x = np.clip(points['x'].to_numpy(dtype=np.float64), grid['x_min'], grid['x_max'])
+    y = np.clip(points['y'].to_numpy(dtype=np.float64), grid['y_min'], grid['y_max'])
+    counts, _, _ = np.histogram2d(y, x, bins=[ny, nx],
+                                  range=[[grid['y_min'], grid['y_max']], [grid['x_min'], grid['x_max']]])
+    return counts.astype(np.int64)
+
+
+def test_grids_match_histogram2d():
+    points = _points()
+    heatmaps = build_route_heatmaps(points, chunksize=7000)
+    assert heatmaps.grid().shape == grid_shape()
+    np.testing.assert_array_equal(heatmaps.grid(), _histogram(points))
+    for name in ('Player 0', 'Player 13'):
+        np.testing.assert_array_equal(heatmaps.grid(name=name), _histogram(points[points['name'] == name]))
+    complete = points[(points['team'] == 'KC') & (points['route_type'] == 'COMPLETE')]
+    np.testing.assert_array_equal(heatmaps.grid(team='KC', route_type='COMPLETE'), _histogram(complete))
+    np.testing.assert_array_equal(heatmaps.grid(name='Nobody'), np.zeros(grid_shape(), dtype=np.int64))
+
+
+def test_rollups_and_added_weeks_sum_to_the_season_grid(tmp_path):
+    points = _points()
+    heatmaps = build_route_heatmaps(points)
+    season = heatmaps.grid(season='2023')
+    labels, grids = heatmaps.rollup('week')
+    assert sorted(labels['week'].astype(int)) == list(range(1, 19))
+    np.testing.assert_array_equal(grids.sum(axis=0), season)
+    week = labels.index[labels['week'] == '7'][0]
+    np.testing.assert_array_equal(grids[week], _histogram(points[points['week'] == '7']))
+
+    # weeks binned separately and added give the heatmaps of the whole season
+    early = build_route_heatmaps(points[points['week'].astype(int) <= 9])
+    late = build_route_heatmaps(points[points['week'].astype(int) > 9])
+    combined = early.add(late)
+    assert len(combined) == len(heatmaps)
+    np.testing.assert_array_equal(combined.grid(season='2023'), season)
+    labels, by_team = combined.rollup('team', route_type='YAC')
+    for i, team in enumerate(labels['team']):
+        np.testing.assert_array_equal(by_team[i], heatmaps.grid(team=team, route_type='YAC'))
+
+    # a route store gives the same heatmaps as the frame it was built from
+    store = RouteStore(build_route_store(points, str(tmp_path / 'route_store')))
+    np.testing.assert_array_equal(build_route_heatmaps(store, chunksize=9000).grid(season=2023), season)
+
+
+def test_zone_totals_cover_the_field():
+    points = _points()
+    heatmaps = build_route_heatmaps(points)
+    grid = heatmaps.grid()
+    totals = heatmaps.zone_totals(grid)
+    assert set(totals) == set(ZONES)
+    assert sum(totals.values()) == len(points)
+    x, y = points['x'], points['y']
+    # points past the back of the grid are clamped into the deep zones
+    deep_middle = ((x >= -9) & (x < 9) & (y >= 20)).sum()
+    assert totals['deep_middle'] == deep_middle
+    # over a rollup stack, one total per group
+    labels, grids = heatmaps.rollup('route_type')
+    stacked = heatmaps.zone_totals(grids)
+    assert stacked['short_left'].shape == (len(labels),)
+    assert stacked['short_left'].sum() == totals['short_left']
+
+
+def test_save_and_load_round_trip(tmp_path):
+    heatmaps = build_route_heatmaps(_points())
+    path = heatmaps.save(str(tmp_path / 'heatmaps'))
+    loaded = RouteHeatmaps.load(path)
+    assert len(loaded) == len(heatmaps)
+    assert loaded.grid_spec == heatmaps.grid_spec
+    pd.testing.assert_frame_equal(loaded.keys(), heatmaps.keys())
+    for name in ('key_index', 'cells', 'counts'):
+        assert getattr(loaded, name).dtype == getattr(heatmaps, name).dtype
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(heatmaps, name))
+    np.testing.assert_array_equal(loaded.grid(name='Player 3', week=[1, 2, 3]),
+                                  heatmaps.grid(name='Player 3', week=[1, 2, 3]))
+    np.testing.assert_allclose(loaded.compare('Player 1', 'Player 2'), heatmaps.compare('Player 1', 'Player 2'))
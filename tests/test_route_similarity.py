@@ -0,0 +1,30 @@
+import numpy as np
+
+from src.testing.builders import make_route_points
+from src.features.route_heatmaps import build_route_heatmaps
+from src.features.route_similarity import RouteSimilarityIndex
+
+
+def test_incremental_update_matches_full_build():
+    points = make_route_points(50_000, n_players=60)
+    weeks = points['week'].astype(int)
+    full = RouteSimilarityIndex.from_heatmaps(build_route_heatmaps(points))
+
+    index = RouteSimilarityIndex.from_heatmaps(build_route_heatmaps(points[weeks < 10]))
+    index.update(build_route_heatmaps(points[weeks >= 10]))
+
+    rows = [full.row(*key) for key in index.labels[index.by].itertuples(index=False, name=None)]
+    np.testing.assert_allclose(index.vectors, full.vectors[rows], atol=1e-6)
+    np.testing.assert_array_equal(index.labels['points'], full.labels['points'].to_numpy()[rows])
+
+
+def test_query_ranks_by_cosine_and_excludes_the_player():
+    index = RouteSimilarityIndex.from_heatmaps(build_route_heatmaps(make_route_points(50_000, n_players=60)))
+    result = index.query('Player 3', '2023', k=5)
+    assert len(result) == 5
+    assert 'Player 3' not in set(result['name'])
+    assert result['similarity'].is_monotonic_decreasing
+
+    row = index.row('Player 3', '2023')
+    expected = np.sort(np.delete(index.vectors @ index.vectors[row], row))[::-1][:5]
+    np.testing.assert_allclose(result['similarity'], expected, rtol=1e-6)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.route_store import RouteStore, build_route_store_from_csv
+
+
+def _csv_and_store(tmp_path):
+    points = builders.make_route_points(30000, n_players=60)
+    csv_path = str(tmp_path / 'all_pass_locations.csv')
+    points.to_csv(csv_path, index=False)
+    store = RouteStore(build_route_store_from_csv(csv_path, str(tmp_path / 'route_store'), chunksize=7000))
+    return pd.read_csv(csv_path), store
+
+
+def _assert_same_rows(from_store, from_csv):
+    # store rows are ordered by game within a player; text columns are categoricals
+    expected = from_csv.sort_values('game_id', kind='stable').reset_index(drop=True)[from_store.columns]
+    texts = [c for c in from_store.columns if isinstance(from_store[c].dtype, pd.CategoricalDtype)]
+    pd.testing.assert_frame_equal(from_store.drop(columns=['x', 'y'] + texts), expected.drop(columns=['x', 'y'] + texts))
+    for col in texts:
+        assert from_store[col].astype(object).tolist() == expected[col].tolist()
+    np.testing.assert_allclose(from_store[['x', 'y']].to_numpy(), expected[['x', 'y']].to_numpy(), rtol=1e-6)
+
+
+def test_player_rows_match_the_csv_with_its_dtypes(tmp_path):
+    csv, store = _csv_and_store(tmp_path)
+    assert len(store) == len(csv)
+    for name in ['Player 0', 'Player 17', 'Player 59']:
+        _assert_same_rows(store.player(name), csv[csv['name'] == name])
+    frame = store.to_frame()
+    for col in ('game_id', 'season', 'week'):
+        assert frame[col].dtype == csv[col].dtype
+    assert store.player('Nobody').empty
+
+
+def test_game_lookups_within_a_player(tmp_path):
+    csv, store = _csv_and_store(tmp_path)
+    rows = csv[csv['name'] == 'Player 5']
+    for game_id in rows['game_id'].drop_duplicates().head(5):
+        _assert_same_rows(store.player('Player 5', game_id=game_id), rows[rows['game_id'] == game_id])
+    assert store.player('Player 5', game_id=1).empty
+    start, stop = store.player_range('Player 5')
+    assert stop - start == len(rows)
+    x, y = store.player_points('Player 5')
+    np.testing.assert_allclose(np.sort(x), np.sort(rows['x'].to_numpy()), rtol=1e-6)
@@ -0,0 +1,103 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from src.testing import builders
+from src.analysis.drive_simulator import DriveModel, simulate_decisions
+from src.analysis.offensive_tendencies import tendencies_from_counts, tendency_counts
+from src.analysis.player_quality import assess_player_quality
+from src.features.nfl_data import get_wr_data
+from src.models.apy_model import calculate_advanced_metrics, fit_best_model
+from src.service.server import AnalyticsService, make_server
+
+
+def _get(server, path):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    body = json.loads(response.read())
+    connection.close()
+    return response.status, body
+
+
+def test_service_answers_and_caches_queries():
+    pbp = builders.make_optimized_pbp(2, plays_per_season=20_000)
+    model = DriveModel.fit(pbp)
+    service = AnalyticsService(pbp, drive_model=model, workers=1)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        status, body = _get(server, '/tendencies?personnel=1+RB%2C+2+TE%2C+2+WR&season=2014')
+        assert status == 200
+        counts = tendency_counts(pbp)
+        expected, _, _ = tendencies_from_counts(counts[counts['season'] == 2014], '1 RB, 2 TE, 2 WR')
+        assert body['tendencies'] == {k: pytest.approx(v) for k, v in expected.items()}
+
+        # the same query with its parameters reordered is served from the cache
+        cached = len(service.cache)
+        assert _get(server, '/tendencies?season=2014&personnel=1+RB%2C+2+TE%2C+2+WR') == (status, body)
+        assert len(service.cache) == cached
+
+        status, body = _get(server, '/fourth-down/simulate?score_differential=-3&yardline_100=40&ydstogo=2'
+                                    '&game_seconds_remaining=600&games=3000&seed=1')
+        assert status == 200
+        direct = simulate_decisions(model, {'score_differential': -3, 'yardline_100': 40, 'ydstogo': 2,
+                                            'game_seconds_remaining': 600}, n=3000, seed=1)
+        assert [row['win_probability'] for row in body] == list(direct['win_probability'])
+
+        assert _get(server, '/nowhere')[0] == 404
+        assert _get(server, '/tendencies?season=abc')[0] == 400
+        assert _get(server, '/tendencies?colour=red')[0] == 400
+        assert _get(server, '/apy?name=Nobody')[0] == 503
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+
+def test_player_routes_serialize_model_output():
+    ids = builders.make_player_ids(300)
+    years = range(2016, 2024)
+    with builders.nfl_sources(seasonal=builders.make_seasonal(ids, years), ids=ids,
+                              contracts=builders.make_contracts(ids, 1200, years)):
+        # compact dtypes (categoricals, int16 seasons, float32), as served
+        wr_data = calculate_advanced_metrics(get_wr_data(years, cache=False))
+    apy_model = fit_best_model(wr_data)
+    model, scaler, features = apy_model
+    service = AnalyticsService(wr_data=wr_data, apy_model=apy_model)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    name = wr_data['name'].value_counts().index[0]
+    latest = wr_data[wr_data['name'] == name].iloc[[-1]]
+    try:
+        status, body = _get(server, f"/apy?name={name.replace(' ', '+')}&comps=3")
+        assert status == 200
+        assert body['player'] == name
+        expected = model.predict(scaler.transform(latest[features].to_numpy()))[0]
+        assert body['predicted_apy'] == pytest.approx(expected)
+        assert body['actual_apy'] == pytest.approx(float(latest['apy'].iloc[0]))
+        assert set(body['features']) == set(features)
+        assert len(body['comps']) == 3
+        assert [comp['rank'] for comp in body['comps']] == [1, 2, 3]
+        for comp in body['comps']:
+            assert isinstance(comp['comp_name'], str) and comp['comp_name'] != name
+            assert isinstance(comp['comp_season'], int) and comp['comp_season'] < body['comps'][0]['season']
+
+        status, body = _get(server, f"/player-quality?name={name.replace(' ', '+')}")
+        assert status == 200
+        season = int(latest['season'].iloc[0])
+        assert body['season'] == season
+        expected = assess_player_quality(latest, wr_data[wr_data['season'] == season])
+        assert body['percentiles'] == {k: pytest.approx(v) for k, v in expected.items()}
+        assert set(body['percentiles']) >= {'receptions', 'receiving_yards'}
+
+        assert _get(server, '/player-quality?name=Nobody')[0] == 404
+        assert _get(server, f"/apy?name={name.replace(' ', '+')}&comps=abc")[0] == 400
+        assert _get(server, '/health')[1]['apy_model'] is True
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
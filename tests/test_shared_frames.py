@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.testing import builders
+from src.features.shared_frames import SharedDatasets, attach, publish_frame, publish_object
+
+
+def test_frames_round_trip_as_read_only_views(tmp_path):
+    pbp = builders.make_optimized_pbp(1, plays_per_season=5000)
+    pbp['kickoff'] = pd.Timestamp('2023-09-07') + pd.to_timedelta(np.arange(len(pbp)), unit='s')
+    pbp['passer'] = pbp['passer_player_name'].astype(object)    # strings with None
+    pbp['first_down'] = pd.array(np.where(np.arange(len(pbp)) % 7 == 0, None, pbp['success'] > 0), dtype='boolean')
+    publish_frame('pbp', pbp, tmp_path)
+
+    frame, version = attach('pbp', tmp_path)
+    assert version == 1
+    pd.testing.assert_frame_equal(frame.drop(columns='passer'), pbp.drop(columns='passer'))
+    assert isinstance(frame['passer'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(frame['passer'].astype(object), pbp['passer'])
+    with pytest.raises(ValueError):
+        frame.loc[0, 'epa'] = 1.0
+
+
+def test_republishing_swaps_in_a_new_version(tmp_path):
+    shared = SharedDatasets(tmp_path)
+    assert 'wr_data' not in shared
+    publish_frame('wr_data', pd.DataFrame({'name': ['A', 'B'], 'apy': [1.0, 2.0]}), tmp_path)
+    publish_object('apy_model', {'coef': [1, 2]}, tmp_path)
+    old = shared.get('wr_data')
+    assert shared.get('wr_data') is old and shared.get('apy_model') == {'coef': [1, 2]}
+
+    publish_frame('wr_data', pd.DataFrame({'name': ['A', 'B', 'C'], 'apy': [1.0, 2.0, 3.0]}), tmp_path)
+    assert shared.version('wr_data') == 2
+    assert len(shared.get('wr_data')) == 3
+    # the old version's file is gone, but frames still holding it stay valid
+    assert sorted(f for f in os.listdir(tmp_path) if f.startswith('wr_data')) == ['wr_data.2.bin', 'wr_data.json']
+    assert old['apy'].sum() == 3.0
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.analysis.situational_query import SituationalQuery, normalize_query
+
+
+def _engine():
+    return SituationalQuery(builders.make_optimized_pbp(1, plays_per_season=30_000))
+
+
+def test_query_matches_pandas_filters():
+    engine = _engine()
+    pbp = engine.pbp
+    result = engine.query({'down': 3, 'ydstogo': ('>=', 7)}, situations=['red_zone'], by='posteam',
+                          metrics=['plays', 'success_rate', 'epa', 'pass_rate'])
+
+    plays = pbp[(pbp['down'] == 3) & (pbp['ydstogo'] >= 7) & (pbp['yardline_100'] <= 20)]
+    grouped = plays.groupby('posteam', observed=True)
+    expected = pd.DataFrame({
+        'plays': grouped.size(),
+        'success_rate': grouped['success'].mean(),
+        'epa': grouped['epa'].mean(),
+        'pass_rate': (plays['play_type'] == 'pass').groupby(plays['posteam'], observed=True).mean(),
+    }).reset_index()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False)
+
+    total = engine.query({'offense_personnel': ['1 RB, 1 TE, 3 WR', '1 RB, 2 TE, 2 WR'], 'down': ('in', [1, 2])})
+    assert total.loc[0, 'plays'] == (pbp['offense_personnel'].isin(['1 RB, 1 TE, 3 WR', '1 RB, 2 TE, 2 WR'])
+                                     & pbp['down'].isin([1, 2])).sum()
+
+
+def test_results_and_bitmaps_are_shared_across_queries():
+    engine = _engine()
+    first = engine.query({'down': 3, 'ydstogo': ('>=', 7)}, by=['posteam'], metrics=['plays', 'epa'])
+    assert len(engine._bitmaps) == 2
+    # same query with filters in another order hits the result cache
+    assert normalize_query({'ydstogo': ('>=', 7), 'down': 3}, by='posteam', metrics=['plays', 'epa']) in engine._results
+    pd.testing.assert_frame_equal(engine.query({'ydstogo': ('>=', 7), 'down': 3}, by='posteam', metrics=['plays', 'epa']), first)
+    # an overlapping query only builds its new predicate
+    engine.query({'down': 3, 'ydstogo': ('>=', 7)}, situations=['red_zone'], by='posteam')
+    assert len(engine._bitmaps) == 3
+
+    # callers cannot corrupt the cached result
+    first.loc[0, 'plays'] = -1
+    assert (engine.query({'down': 3, 'ydstogo': ('>=', 7)}, by='posteam', metrics=['plays', 'epa'])['plays'] >= 0).all()
+    mask = engine.mask(normalize_query({'down': 4})[0])
+    assert np.array_equal(mask, (engine.pbp['down'] == 4).fillna(False).to_numpy(dtype=bool))
@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+import pytest
+from skimage.morphology import skeletonize
+
+from src.testing.builders import make_chart_image
+from src.features.next_gen_data import skeletonize_regions
+
+
+def _chart_masks(img):
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    white = cv2.inRange(img, np.array([230, 230, 230]), np.array([255, 255, 255]))
+    green = cv2.inRange(hsv, np.array([40, 100, 100]), np.array([80, 255, 255]))
+    gray = cv2.inRange(img, np.array([126, 126, 126]), np.array([132, 132, 132]))
+    return [white, green, gray]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_full_image_skeleton_on_charts(seed):
+    # JPEG round trip adds the speckle and fringe pixels real charts have
+    _, encoded = cv2.imencode('.jpeg', make_chart_image(seed))
+    masks = _chart_masks(cv2.imdecode(encoded, cv2.IMREAD_COLOR))
+    for mask, skeleton in zip(masks, skeletonize_regions(masks)):
+        np.testing.assert_array_equal(skeleton, skeletonize(mask != 0).astype(np.uint8))
+
+
+def test_matches_full_image_skeleton_on_edge_blobs():
+    # overlapping classes, components touching the image border, and blobs
+    # whose bounding boxes overlap without touching
+    rng = np.random.default_rng(0)
+    masks = [(rng.random((120, 200)) > threshold).astype(np.uint8) for threshold in (0.6, 0.7, 0.8)]
+    for mask, skeleton in zip(masks, skeletonize_regions(masks)):
+        np.testing.assert_array_equal(skeleton, skeletonize(mask != 0).astype(np.uint8))
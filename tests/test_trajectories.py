@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from src.testing import builders
+from src.features.trajectories import RATES, get_trajectories, trajectory_features
+
+
+def _seasons(n_players=300, years=range(2013, 2024)):
+    ids = builders.make_player_ids(n_players)
+    seasonal = builders.make_seasonal(ids, years)
+    # drop a third of the player-seasons so careers have gaps
+    keep = np.random.default_rng(1).random(len(seasonal)) > 0.33
+    seasonal = seasonal[keep].reset_index(drop=True)
+    ages = ids.set_index('gsis_id')['age']
+    seasonal['age'] = ages.loc[seasonal['player_id']].to_numpy() - (2023 - seasonal['season'])
+    return seasonal[['player_id', 'season', 'games', 'age'] + list(RATES.values())]
+
+
+def test_windows_and_deltas_match_a_per_player_loop():
+    seasons = _seasons()
+    features = trajectory_features(seasons).set_index(['player_id', 'season'])
+
+    for player_id, career in seasons.groupby('player_id'):
+        career = career.set_index('season')
+        for season in career.index:
+            row = features.loc[(player_id, season)]
+            for window in (2, 3):
+                played = career.loc[[s for s in career.index if season - window < s <= season]]
+                for rate, stat in RATES.items():
+                    assert np.isclose(row[f"{rate}_{window}y"], played[stat].sum() / played['games'].sum())
+            for rate, stat in RATES.items():
+                if season - 1 in career.index:
+                    previous = career.loc[season - 1, stat] / career.loc[season - 1, 'games']
+                    assert np.isclose(row[f"{rate}_yoy"], career.loc[season, stat] / career.loc[season, 'games'] - previous)
+                else:
+                    assert np.isnan(row[f"{rate}_yoy"])
+
+
+def test_appending_seasons_matches_a_full_build(tmp_path):
+    ids = builders.make_player_ids(400)
+    with builders.nfl_sources(seasonal=builders.make_seasonal(ids, range(2005, 2024)), ids=ids) as nfl:
+        loaded = []
+        import_seasonal = nfl.import_seasonal_data
+        nfl.import_seasonal_data = lambda years, **kwargs: loaded.append(list(years)) or import_seasonal(years, **kwargs)
+
+        get_trajectories(range(2013, 2021), cache_dir=str(tmp_path / 'a'))
+        appended = get_trajectories(range(2013, 2024), cache_dir=str(tmp_path / 'a'))
+        # only the history the new seasons need is loaded again
+        assert loaded[-1] == list(range(2016, 2024))
+        full = get_trajectories(range(2013, 2024), cache_dir=str(tmp_path / 'b'))
+
+    pd.testing.assert_frame_equal(appended, full)
+    assert full['receiving_yards_per_game_age_delta'].ne(0).any()
+    # 2018 features only depend on 2013-2018, however many later seasons exist
+    columns = ['player_id', 'season', 'games', 'age'] + list(RATES.values())
+    early = trajectory_features(full.loc[full['season'] <= 2018, columns])
+    pd.testing.assert_frame_equal(early[early['season'] == 2018].reset_index(drop=True),
+                                  full[full['season'] == 2018].reset_index(drop=True)[early.columns])
+
+
+def test_history_is_not_loaded_before_1999(tmp_path):
+    ids = builders.make_player_ids(200)
+    with builders.nfl_sources(seasonal=builders.make_seasonal(ids, range(1999, 2004)), ids=ids) as nfl:
+        import_seasonal = nfl.import_seasonal_data
+
+        def import_seasonal_data(years, **kwargs):
+            if min(years) < 1999:
+                raise ValueError("Data not available before 1999.")
+            return import_seasonal(years, **kwargs)
+
+        nfl.import_seasonal_data = import_seasonal_data
+        trajectories = get_trajectories(range(1999, 2003), cache_dir=str(tmp_path))
+
+    assert sorted(trajectories['season'].unique()) == [1999, 2000, 2001, 2002]
+    first = trajectories[trajectories['season'] == 1999]
+    assert first['receiving_yards_per_game_yoy'].isna().all()
@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+
+from src.models import apy_model, tuning
+
+
+def _regression_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(apy_model.FEATURES)))
+    y = X @ rng.normal(size=X.shape[1]) + rng.normal(scale=0.5, size=n)
+    return X, y
+
+
+def test_search_resumes_from_trial_cache_and_writes_params(tmp_path):
+    X, y = _regression_data()
+    kwargs = dict(models=['Lasso', 'XGBoost'], n_configs=9, workers=2, cache_dir=str(tmp_path))
+    best = tuning.successive_halving(X, y, **kwargs)
+    trials = tmp_path / 'trials.jsonl'
+    n_trials = len(trials.read_text().splitlines())
+    assert n_trials > 0
+
+    # a rerun (e.g. after an interruption) reads every trial from the cache
+    assert tuning.successive_halving(X, y, **kwargs) == best
+    assert len(trials.read_text().splitlines()) == n_trials
+
+    path = tuning.write_best_params(best, str(tmp_path / 'apy_params.json'))
+    params = apy_model.load_best_params(path)
+    assert params['XGBoost'] == best['XGBoost']['params']
+    assert params['Random Forest'] == apy_model.DEFAULT_PARAMS['Random Forest']
+    assert json.loads(open(path).read())['models']['Lasso']['data'] == best['Lasso']['data']
+
+
+def test_rungs_grow_to_full_data():
+    assert tuning._rungs(0.1, 3) == [1 / 9, 1 / 3, 1.0]
+    assert tuning._rungs(0.5, 3) == [1.0]